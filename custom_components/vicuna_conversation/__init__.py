@@ -30,7 +30,11 @@ from .const import (
     DOMAIN,
     RECOMMENDED_AI_TASK_OPTIONS,
 )
-from .openai_client import async_create_client, async_list_models
+from .openai_client import (
+    async_acquire_client,
+    async_list_models,
+    async_release_client,
+)
 
 __all__ = [
     "DOMAIN",
@@ -50,8 +54,13 @@ async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up OpenAI Conversation from a config entry."""
 
+    # Entries for the same server and transport options share a client and its
+    # connection pool. It is released on unload, which also happens when the
+    # setup fails.
+    client = await async_acquire_client(hass, entry.data, entry.options)
+    entry.async_on_unload(lambda: async_release_client(hass, client))
+
     try:
-        client = await async_create_client(hass, entry.data)
         await async_list_models(client)
     except HomeAssistantError as err:
         if err.translation_key == "invalid_auth":
@@ -12,7 +12,8 @@ from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 from homeassistant.util.json import json_loads
 
-from .entity import CustomOpenAIBaseLLMEntity
+from .entity import CustomOpenAIBaseLLMEntity, StructuredOutputParser
+from .offload import async_offload
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -50,7 +51,14 @@ class CustomOpenAITaskEntity(
         chat_log: conversation.ChatLog,
     ) -> ai_task.GenDataTaskResult:
         """Handle a generate data task."""
-        await self._async_handle_chat_log(chat_log, task.name, task.structure)
+        structured_output = (
+            StructuredOutputParser(self.hass, task.structure)
+            if task.structure
+            else None
+        )
+        await self._async_handle_chat_log(
+            chat_log, task.name, task.structure, structured_output
+        )
 
         if not isinstance(chat_log.content[-1], conversation.AssistantContent):
             raise HomeAssistantError(
@@ -64,8 +72,16 @@ class CustomOpenAITaskEntity(
                 conversation_id=chat_log.conversation_id,
                 data=text,
             )
+        if structured_output is not None and structured_output.complete:
+            # The streamed response was already validated while it arrived
+            return ai_task.GenDataTaskResult(
+                conversation_id=chat_log.conversation_id,
+                data=await structured_output.async_value(),
+            )
         try:
-            data = json_loads(text)
+            data = await async_offload(
+                self.hass, "structured_response", len(text), json_loads, text
+            )
         except JSONDecodeError as err:
             _LOGGER.error(
                 "Failed to parse JSON response: %s. Response: %s",
@@ -0,0 +1,912 @@
+"""Encoding of chat attachments for the OpenAI API."""
+
+from __future__ import annotations
+
+import asyncio
+import base64
+import binascii
+import io
+import mimetypes
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import deque
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import dataclass
+from functools import partial
+from pathlib import Path
+from typing import BinaryIO, cast
+
+import pypdfium2 as pdfium
+from homeassistant.components.ffmpeg import get_ffmpeg_manager
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.util.hass_dict import HassKey
+from openai import AsyncOpenAI, OpenAIError
+from openai.types.chat import ChatCompletionContentPartParam
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from .cache import LRUCache
+from .const import DOMAIN, LOGGER
+from .openai_client import api_error_handler
+
+# Images that fit within this size are sent with low detail, which the model
+# processes as a single tile
+LOW_DETAIL_MAX_SIZE = 512
+
+# Pillow formats and their MIME types for images that are re-encoded
+_IMAGE_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+    "png": ("PNG", "image/png"),
+}
+
+# Size of the longest edge of rendered PDF pages, unless images have a max size
+PDF_RENDER_SIZE = 1024
+
+# PDFium is not thread safe, so documents are only handled by one executor
+# thread at a time
+_PDFIUM_LOCK = threading.Lock()
+
+# Videos are reduced to frames where the scene changes by more than this
+# fraction, or to frames at a fixed interval
+VIDEO_SCENE_THRESHOLD = 0.3
+
+# Max number of scene changes that are extracted from a video before they are
+# sampled down to the max number of frames, at most one in each equal part of
+# the video
+_MAX_VIDEO_CANDIDATES = 64
+
+# Size of the longest edge of video frames, unless images have a max size
+VIDEO_FRAME_SIZE = 1024
+
+# Max seconds that ffmpeg may take to extract the frames of a video
+VIDEO_TIMEOUT = 60
+
+# Videos are decoded by ffmpeg in processes of their own, of which only a few
+# run at the same time
+MAX_VIDEO_PROCESSES = 2
+_VIDEO_PROCESSES: HassKey[asyncio.Semaphore] = HassKey(f"{DOMAIN}_video_processes")
+
+_DURATION = re.compile(r"Duration: (\d+):(\d{2}):(\d{2}(?:\.\d+)?)")
+
+# Max total memory used by the files that are encoded at the same time, across
+# all requests, which bounds the memory used by bursts of attachments
+MAX_ENCODING_SIZE = 32 * 1024 * 1024
+
+# Size of the blocks that files are read and base64 encoded in, which must be
+# a multiple of 3 so the encoded blocks can be concatenated
+_BASE64_BLOCK_SIZE = 3 * 256 * 1024
+
+# Max number of encoded attachments to keep around, and the max total size of
+# their encoded content in characters
+MAX_CACHED_ATTACHMENTS = 64
+MAX_CACHED_ATTACHMENT_SIZE = 64 * 1024 * 1024
+
+# Max number of uploaded attachments to keep around, and the seconds they are
+# kept after they were last used before they are deleted
+MAX_UPLOADED_ATTACHMENTS = 64
+UPLOADED_ATTACHMENT_TTL = 60 * 60
+
+# Seconds after their upload that the server deletes uploaded attachments on
+# its own, so files that are never deleted, such as after a restart, don't
+# pile up. Files are no longer used once less than the TTL is left.
+UPLOADED_ATTACHMENT_MAX_AGE = 24 * 60 * 60
+
+# Max seconds to wait for uploaded attachments to be deleted when they are
+# cleared, before the client is closed
+UPLOADED_ATTACHMENT_DELETE_TIMEOUT = 10
+
+
+@dataclass(frozen=True)
+class AttachmentOptions:
+    """Settings that determine how an attachment is encoded.
+
+    Images are downscaled to the max size and re-encoded in the format, which
+    is one of "jpeg", "webp" or "original" to keep the format of the image.
+    They are sent as they are when neither is set.
+
+    The text of a PDF is extracted up to the max number of pages and
+    characters, and its first pages can be rendered as images as well.
+
+    Videos are sent as up to the max number of frames, selected where the
+    scene changes or at a fixed interval.
+    """
+
+    image_max_size: int = 0
+    image_quality: int = 85
+    image_format: str = "original"
+    pdf_max_pages: int = 20
+    pdf_max_chars: int = 50000
+    pdf_render_pages: int = 0
+    video_max_frames: int = 8
+    video_frame_selection: str = "scene"
+
+    @property
+    def preprocess_images(self) -> bool:
+        """Return True if images are re-encoded before they are sent."""
+        return bool(self.image_max_size) or self.image_format != "original"
+
+    @property
+    def detail(self) -> str:
+        """Return the detail level to request for images."""
+        if not self.image_max_size:
+            return "auto"
+        return "low" if self.image_max_size <= LOW_DETAIL_MAX_SIZE else "high"
+
+
+# Identifies the contents of a file by path, modification time and size, and
+# how it was encoded
+type _AttachmentKey = tuple[str, int, int, AttachmentOptions]
+
+# The content parts a file is encoded as
+type _EncodedFile = tuple[ChatCompletionContentPartParam, ...]
+
+
+def _encoded_size(parts: _EncodedFile) -> int:
+    """Return the approximate size of an encoded attachment in characters."""
+    size = 0
+    for part in parts:
+        if part["type"] == "image_url":
+            size += len(part["image_url"]["url"])
+        elif part["type"] == "text":
+            size += len(part["text"])
+    return size
+
+
+_ATTACHMENT_CACHE: LRUCache[_AttachmentKey, _EncodedFile] = LRUCache(
+    MAX_CACHED_ATTACHMENTS, MAX_CACHED_ATTACHMENT_SIZE, sizeof=_encoded_size
+)
+
+
+def attachment_cache_stats() -> dict[str, int]:
+    """Return the counters of the cache of encoded attachments."""
+    return _ATTACHMENT_CACHE.as_dict()
+
+
+def _attachment_key(
+    file_path: Path, stat: os.stat_result, options: AttachmentOptions
+) -> _AttachmentKey:
+    """Return the cache key of a file."""
+    return (str(file_path), stat.st_mtime_ns, stat.st_size, options)
+
+
+def _guess_mime_type(file_path: Path) -> str:
+    """Return the type of a supported file based on its extension."""
+    mime_type, _ = mimetypes.guess_type(str(file_path))
+    if not mime_type or not mime_type.startswith(
+        ("image/", "video/", "application/pdf")
+    ):
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="unsupported_file_type",
+            translation_placeholders={"file_path": str(file_path)},
+        )
+    return mime_type
+
+
+def _stat_file(file_path: Path) -> os.stat_result:
+    """Return the status of a file that must exist."""
+    try:
+        return file_path.stat()
+    except FileNotFoundError as err:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="file_not_found",
+            translation_placeholders={"file_path": str(file_path)},
+        ) from err
+
+
+def _stat_files(
+    files: list[Path], options: AttachmentOptions
+) -> list[tuple[_AttachmentKey, str]]:
+    """Return the cache keys and MIME types of the files."""
+    return [
+        (
+            _attachment_key(file_path, _stat_file(file_path), options),
+            _guess_mime_type(file_path),
+        )
+        for file_path in files
+    ]
+
+
+def _preprocess_image(
+    file_path: Path, data: bytes, mime_type: str, options: AttachmentOptions
+) -> tuple[bytes, str]:
+    """Downscale and re-encode an image, returning its data and MIME type.
+
+    The original image is returned when it can't be read or re-encoding it
+    doesn't make it smaller.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as source:
+            source_format = (source.format or "").lower()
+            source_size = source.size
+            image = ImageOps.exif_transpose(source)
+            if options.image_max_size:
+                size = (options.image_max_size, options.image_max_size)
+                image.thumbnail(size, Image.Resampling.LANCZOS)
+            image_format = options.image_format
+            if image_format == "original":
+                image_format = (
+                    source_format if source_format in _IMAGE_FORMATS else "jpeg"
+                )
+            pil_format, new_mime_type = _IMAGE_FORMATS[image_format]
+            if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+                image = image.convert("RGB")
+            output = io.BytesIO()
+            image.save(output, pil_format, quality=options.image_quality, optimize=True)
+    except (UnidentifiedImageError, OSError) as err:
+        LOGGER.warning("Sending image %s as it is: %s", file_path, err)
+        return data, mime_type
+
+    encoded = output.getvalue()
+    if len(encoded) >= len(data) and image.size == source_size:
+        LOGGER.debug("Sending image %s as it is, re-encoding saves nothing", file_path)
+        return data, mime_type
+    LOGGER.debug(
+        "Re-encoded image %s from %dx%d %s (%d bytes) to %dx%d %s (%d bytes), "
+        "saving %d bytes",
+        file_path,
+        *source_size,
+        mime_type,
+        len(data),
+        *image.size,
+        new_mime_type,
+        len(encoded),
+        len(data) - len(encoded),
+    )
+    return encoded, new_mime_type
+
+
+class _SizeLimiter:
+    """Limit the total size of the work that is in progress at the same time.
+
+    Work is started in the order it was requested. Work larger than the limit
+    is started on its own.
+    """
+
+    def __init__(self, limit: int) -> None:
+        """Initialize the limiter."""
+        self._limit = limit
+        self._in_progress = 0
+        self._waiters: deque[tuple[int, asyncio.Future[None]]] = deque()
+
+    @asynccontextmanager
+    async def reserve(self, size: int) -> AsyncGenerator[None]:
+        """Wait until work of the size can start and hold it while it runs."""
+        size = min(size, self._limit)
+        if self._waiters or self._in_progress + size > self._limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append((size, waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # The size was reserved before the cancellation arrived
+                    self._release(size)
+                else:
+                    # The waiter may already have been skipped by `_wake`
+                    if (size, waiter) in self._waiters:
+                        self._waiters.remove((size, waiter))
+                    self._wake()
+                raise
+        else:
+            self._in_progress += size
+        try:
+            yield
+        finally:
+            self._release(size)
+
+    def _release(self, size: int) -> None:
+        """Release the size of finished work."""
+        self._in_progress -= size
+        self._wake()
+
+    def _wake(self) -> None:
+        """Start waiting work, in order, as long as it fits.
+
+        Waiters that were cancelled are skipped, as their work stops waiting
+        and must not hold any size.
+        """
+        while self._waiters:
+            size, waiter = self._waiters[0]
+            if waiter.done():
+                self._waiters.popleft()
+                continue
+            if self._in_progress + size > self._limit:
+                break
+            self._waiters.popleft()
+            self._in_progress += size
+            waiter.set_result(None)
+
+
+_ENCODING_LIMITER = _SizeLimiter(MAX_ENCODING_SIZE)
+
+
+def _data_url_prefix(mime_type: str) -> str:
+    """Return the start of a base64 data URL."""
+    return f"data:{mime_type};base64,"
+
+
+def _encoding_size(size: int, mime_type: str, options: AttachmentOptions) -> int:
+    """Return the memory used to encode a file of a size, approximately.
+
+    Images are built as a base64 data URL in bytes and then decoded to a
+    string, which each take 4 bytes for every 3 bytes of the image, and
+    preprocessed images are also held as the file and its re-encoded copy.
+    PDFs are held as the file while their text is extracted.
+    """
+    if mime_type == "application/pdf":
+        return size
+    url_size = len(_data_url_prefix(mime_type)) + (size + 2) // 3 * 4
+    if options.preprocess_images:
+        return 2 * size + 2 * url_size
+    return 2 * url_size
+
+
+def _data_url(file: BinaryIO, mime_type: str) -> str:
+    """Return a file as a base64 data URL, reading it in blocks."""
+    url = bytearray(_data_url_prefix(mime_type).encode("ascii"))
+    while block := file.read(_BASE64_BLOCK_SIZE):
+        url += binascii.b2a_base64(block, newline=False)
+    return url.decode("ascii")
+
+
+def _image_url_part(url: str, detail: str) -> ChatCompletionContentPartParam:
+    """Return the content part of an image URL."""
+    return {"type": "image_url", "image_url": {"url": url, "detail": detail}}
+
+
+def _image_part(
+    base64_image: str, mime_type: str, detail: str
+) -> ChatCompletionContentPartParam:
+    """Return the content part of a base64 encoded image."""
+    return _image_url_part(f"{_data_url_prefix(mime_type)}{base64_image}", detail)
+
+
+def _encode_pdf(
+    file_path: Path, data: bytes, options: AttachmentOptions
+) -> _EncodedFile:
+    """Extract the text of a PDF and render its first pages."""
+    pages: list[str] = []
+    images: list[ChatCompletionContentPartParam] = []
+    chars = 0
+    render_size = options.image_max_size or PDF_RENDER_SIZE
+    image_format = (
+        options.image_format if options.image_format != "original" else "jpeg"
+    )
+    pil_format, mime_type = _IMAGE_FORMATS[image_format]
+    with _PDFIUM_LOCK:
+        try:
+            document = pdfium.PdfDocument(data)
+        except pdfium.PdfiumError as err:
+            raise HomeAssistantError(
+                translation_domain=DOMAIN,
+                translation_key="pdf_read_error",
+                translation_placeholders={
+                    "file_path": str(file_path),
+                    "message": str(err),
+                },
+            ) from err
+        try:
+            page_count = len(document)
+            for index in range(min(page_count, options.pdf_max_pages)):
+                page = document[index]
+                try:
+                    if chars < options.pdf_max_chars:
+                        text_page = page.get_textpage()
+                        text = text_page.get_text_bounded().strip()
+                        text_page.close()
+                        text = text[: options.pdf_max_chars - chars]
+                        chars += len(text)
+                        pages.append(f"--- Page {index + 1} ---\n{text}")
+                    if index < options.pdf_render_pages:
+                        scale = render_size / max(page.get_size())
+                        image = page.render(scale=scale).to_pil()
+                        if pil_format == "JPEG" and image.mode not in ("RGB", "L"):
+                            image = image.convert("RGB")
+                        output = io.BytesIO()
+                        image.save(output, pil_format, quality=options.image_quality)
+                        images.append(
+                            _image_part(
+                                base64.b64encode(output.getvalue()).decode("ascii"),
+                                mime_type,
+                                options.detail,
+                            )
+                        )
+                finally:
+                    page.close()
+                if (
+                    chars >= options.pdf_max_chars
+                    and index + 1 >= options.pdf_render_pages
+                ):
+                    break
+        finally:
+            document.close()
+
+    LOGGER.debug(
+        "Extracted %d characters from %d of %d pages and rendered %d pages of %s",
+        chars,
+        len(pages),
+        page_count,
+        len(images),
+        file_path,
+    )
+    header = f"[File: {file_path.name}, {page_count} pages]"
+    if len(pages) < page_count or chars >= options.pdf_max_chars:
+        header += (
+            f"\n[Content is truncated to {len(pages)} pages and {chars} characters]"
+        )
+    return ({"type": "text", "text": "\n".join([header, *pages])}, *images)
+
+
+def _video_error(file_path: Path, message: str) -> HomeAssistantError:
+    """Return the error raised when a video can't be read."""
+    return HomeAssistantError(
+        translation_domain=DOMAIN,
+        translation_key="video_read_error",
+        translation_placeholders={"file_path": str(file_path), "message": message},
+    )
+
+
+def _run_ffmpeg(ffmpeg_binary: str, file_path: Path, args: list[str]) -> str:
+    """Run ffmpeg on a video and return what it logged."""
+    try:
+        process = subprocess.run(
+            [ffmpeg_binary, "-hide_banner", "-nostdin", "-i", str(file_path), *args],
+            capture_output=True,
+            check=False,
+            timeout=VIDEO_TIMEOUT,
+        )
+    except (OSError, subprocess.TimeoutExpired) as err:
+        raise _video_error(file_path, str(err)) from err
+    log = process.stderr.decode(errors="replace")
+    if process.returncode and args:
+        raise _video_error(file_path, log.strip().rsplit("\n", 1)[-1])
+    return log
+
+
+def _video_duration(log: str) -> float | None:
+    """Return the duration in seconds that ffmpeg logged for a video."""
+    if (match := _DURATION.search(log)) is None:
+        return None
+    hours, minutes, seconds = match.groups()
+    return int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+
+def _encode_video(
+    file_path: Path, ffmpeg_binary: str, options: AttachmentOptions
+) -> _EncodedFile:
+    """Extract frames of a video, selected by scene change or interval.
+
+    Scene changes are extracted at most once in each equal part of the video
+    and then sampled evenly, so frames come from the whole video rather than
+    just its start.
+    """
+    size = options.image_max_size or VIDEO_FRAME_SIZE
+    scale = (
+        f"scale='min(iw,{size})':'min(ih,{size})':force_original_aspect_ratio=decrease"
+    )
+    image_format = (
+        options.image_format if options.image_format != "original" else "jpeg"
+    )
+    pil_format, mime_type = _IMAGE_FORMATS[image_format]
+    with tempfile.TemporaryDirectory() as frame_dir:
+        # Without arguments ffmpeg only reads the video to log its duration
+        duration = _video_duration(_run_ffmpeg(ffmpeg_binary, file_path, []))
+        if options.video_frame_selection == "interval":
+            rate = options.video_max_frames / duration if duration else 1
+            select = f"fps={rate:.6f}"
+            max_candidates = options.video_max_frames
+        else:
+            # Scene changes that follow the previous one too closely are
+            # skipped, which spreads the candidates over the whole video
+            gap = duration / _MAX_VIDEO_CANDIDATES if duration else 0
+            select = (
+                f"select='eq(n,0)+gt(scene,{VIDEO_SCENE_THRESHOLD})"
+                f"*gte(t-prev_selected_t,{gap:.6f})'"
+            )
+            max_candidates = _MAX_VIDEO_CANDIDATES
+        _run_ffmpeg(
+            ffmpeg_binary,
+            file_path,
+            [
+                "-an",
+                "-vf",
+                f"{select},{scale}",
+                "-fps_mode",
+                "vfr",
+                "-frames:v",
+                str(max_candidates),
+                "-q:v",
+                "2",
+                os.path.join(frame_dir, "frame_%03d.jpg"),
+            ],
+        )
+        candidates = sorted(Path(frame_dir).glob("frame_*.jpg"))
+        if not candidates:
+            raise _video_error(file_path, "no frames could be extracted")
+        count = min(len(candidates), options.video_max_frames)
+        frames: list[ChatCompletionContentPartParam] = []
+        for index in range(count):
+            with Image.open(candidates[index * len(candidates) // count]) as image:
+                output = io.BytesIO()
+                image.save(output, pil_format, quality=options.image_quality)
+            frames.append(
+                _image_part(
+                    base64.b64encode(output.getvalue()).decode("ascii"),
+                    mime_type,
+                    options.detail,
+                )
+            )
+
+    LOGGER.debug(
+        "Selected %d of %d frames of %s by %s",
+        len(frames),
+        len(candidates),
+        file_path,
+        options.video_frame_selection,
+    )
+    header = f"[Video: {file_path.name}, {len(frames)} frames"
+    if duration is not None:
+        header += f" from {duration:.1f} seconds"
+    return ({"type": "text", "text": f"{header}]"}, *frames)
+
+
+def _encode_file(
+    file_path: Path,
+    mime_type: str,
+    options: AttachmentOptions,
+    ffmpeg_binary: str | None = None,
+) -> tuple[_AttachmentKey, _EncodedFile]:
+    """Read and encode a file, returning it with its cache key.
+
+    Images are encoded straight into their data URL, and images that are sent
+    as they are, which are most of them, while they are read so that the
+    whole file is never held in memory.
+    """
+    try:
+        with file_path.open("rb") as file:
+            # Key on the file that was read, in case it was replaced meanwhile
+            key = _attachment_key(file_path, os.fstat(file.fileno()), options)
+            if mime_type == "application/pdf":
+                return key, _encode_pdf(file_path, file.read(), options)
+            if mime_type.startswith("video/"):
+                # ffmpeg reads the video by path, so it is never held in memory
+                return key, _encode_video(file_path, cast(str, ffmpeg_binary), options)
+            if not options.preprocess_images:
+                return key, (
+                    _image_url_part(_data_url(file, mime_type), options.detail),
+                )
+            data = file.read()
+    except FileNotFoundError as err:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="file_not_found",
+            translation_placeholders={"file_path": str(file_path)},
+        ) from err
+
+    data, mime_type = _preprocess_image(file_path, data, mime_type, options)
+    return key, (
+        _image_url_part(_data_url(io.BytesIO(data), mime_type), options.detail),
+    )
+
+
+async def _async_encode_files(
+    hass: HomeAssistant,
+    files: list[Path],
+    file_info: list[tuple[_AttachmentKey, str]],
+    options: AttachmentOptions,
+) -> list[_EncodedFile]:
+    """Return the encoded files, encoding the ones that are not cached."""
+
+    async def encode_file(
+        file_path: Path, key: _AttachmentKey, mime_type: str
+    ) -> _EncodedFile:
+        """Encode a file in the executor and cache it."""
+        ffmpeg_binary: str | None = None
+        processes: asyncio.Semaphore | None = None
+        if mime_type.startswith("video/"):
+            ffmpeg_binary = get_ffmpeg_manager(hass).binary
+            # Videos are decoded by ffmpeg rather than read into memory
+            size = 0
+            if _VIDEO_PROCESSES not in hass.data:
+                hass.data[_VIDEO_PROCESSES] = asyncio.Semaphore(MAX_VIDEO_PROCESSES)
+            processes = hass.data[_VIDEO_PROCESSES]
+        else:
+            size = _encoding_size(key[2], mime_type, options)
+        async with _ENCODING_LIMITER.reserve(size), processes or nullcontext():
+            read_key, encoded_file = await hass.async_add_executor_job(
+                _encode_file, file_path, mime_type, options, ffmpeg_binary
+            )
+        _ATTACHMENT_CACHE.put(read_key, encoded_file)
+        return encoded_file
+
+    encoded_files = [_ATTACHMENT_CACHE.get(key) for key, _ in file_info]
+    if missing := [
+        index
+        for index, encoded_file in enumerate(encoded_files)
+        if encoded_file is None
+    ]:
+        LOGGER.debug("Encoding %d of %d attachments", len(missing), len(files))
+        # Files are encoded in parallel, limited by their total size
+        for index, encoded_file in zip(
+            missing,
+            await asyncio.gather(
+                *(encode_file(files[index], *file_info[index]) for index in missing)
+            ),
+            strict=True,
+        ):
+            encoded_files[index] = encoded_file
+    return cast(list[_EncodedFile], encoded_files)
+
+
+async def async_prepare_files_for_prompt(
+    hass: HomeAssistant,
+    files: list[Path],
+    options: AttachmentOptions | None = None,
+) -> list[ChatCompletionContentPartParam]:
+    """Prepare files for OpenAI-compatible API.
+
+    Images are sent as images, PDFs as their extracted text followed by any
+    rendered pages, and videos as a few of their frames. Encoded files are
+    cached until they are modified, so sending the same file again skips
+    reading and encoding it. The returned parts are shared with the cache and
+    must not be modified.
+
+    Caller needs to ensure that the files are allowed.
+    """
+    if options is None:
+        options = AttachmentOptions()
+    file_info = await hass.async_add_executor_job(_stat_files, files, options)
+    return [
+        part
+        for encoded_file in await _async_encode_files(hass, files, file_info, options)
+        for part in encoded_file
+    ]
+
+
+def _read_upload(
+    file_path: Path, mime_type: str, options: AttachmentOptions
+) -> tuple[_AttachmentKey, tuple[str, bytes, str]]:
+    """Read a file to upload, returning it with its cache key.
+
+    PDFs are uploaded as they are for the server to read.
+    """
+    try:
+        with file_path.open("rb") as file:
+            key = _attachment_key(file_path, os.fstat(file.fileno()), options)
+            data = file.read()
+    except FileNotFoundError as err:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="file_not_found",
+            translation_placeholders={"file_path": str(file_path)},
+        ) from err
+
+    return key, (file_path.name, data, mime_type)
+
+
+@dataclass
+class _UploadedFile:
+    """A file that was uploaded, and when it is deleted unless it is used.
+
+    A file is deleted at the max expiry even if it is used, before the server
+    deletes it.
+    """
+
+    file_id: str
+    expires: float
+    max_expires: float
+
+
+class AttachmentUploader:
+    """Upload attachments through the Files API and reference them by id.
+
+    Only PDFs are uploaded, as chat completions only accept PDFs as file
+    inputs. Requests carry the id of each PDF instead of its content, while
+    images, such as camera snapshots, and videos are still sent inline with
+    every request. Uploaded files are reused until they are modified, and
+    are deleted once they were not used for a while, when they are evicted,
+    or when the uploader is cleared. Files are uploaded with an expiry, so
+    the server deletes the files that are left behind.
+    """
+
+    def __init__(self, hass: HomeAssistant, client: AsyncOpenAI) -> None:
+        """Initialize the uploader."""
+        self._hass = hass
+        self._client = client
+        self._uploaded: LRUCache[_AttachmentKey, _UploadedFile] = LRUCache(
+            MAX_UPLOADED_ATTACHMENTS,
+            on_evict=lambda _, uploaded: self._async_delete([uploaded.file_id]),
+        )
+        self._uploads: dict[_AttachmentKey, asyncio.Task[str]] = {}
+        self._deletes: set[asyncio.Task[None]] = set()
+
+    async def async_prepare_files(
+        self,
+        files: list[Path],
+        options: AttachmentOptions | None = None,
+    ) -> list[ChatCompletionContentPartParam]:
+        """Upload files that were not uploaded yet and return their parts.
+
+        Caller needs to ensure that the files are allowed.
+        """
+        if options is None:
+            options = AttachmentOptions()
+        self._async_delete_expired()
+        file_info = await self._hass.async_add_executor_job(_stat_files, files, options)
+        # Images and videos are encoded as when nothing is uploaded
+        inline = [
+            index
+            for index, (_, mime_type) in enumerate(file_info)
+            if mime_type != "application/pdf"
+        ]
+        encoded_files, *file_ids = await asyncio.gather(
+            _async_encode_files(
+                self._hass,
+                [files[index] for index in inline],
+                [file_info[index] for index in inline],
+                options,
+            ),
+            *(
+                self._async_file_id(file_path, key, mime_type, options)
+                for file_path, (key, mime_type) in zip(files, file_info, strict=True)
+                if mime_type == "application/pdf"
+            ),
+        )
+        parts: list[list[ChatCompletionContentPartParam]] = [
+            [{"type": "file", "file": {"file_id": file_id}}] for file_id in file_ids
+        ]
+        for index, encoded_file in zip(inline, encoded_files, strict=True):
+            parts.insert(index, list(encoded_file))
+        return [part for file_parts in parts for part in file_parts]
+
+    async def async_clear(self) -> None:
+        """Delete all uploaded files and wait until they are deleted.
+
+        Uploads in progress are cancelled, and deletes that are still in
+        progress after a timeout are cancelled too, so the client can be closed.
+        """
+        uploads = list(self._uploads.values())
+        self._uploads.clear()
+        for upload in uploads:
+            upload.cancel()
+        self._async_delete(
+            [
+                uploaded.file_id
+                for key in self._uploaded
+                if (uploaded := self._uploaded.pop(key)) is not None
+            ]
+        )
+        if not (tasks := {*uploads, *self._deletes}):
+            return
+        _, pending = await asyncio.wait(
+            tasks, timeout=UPLOADED_ATTACHMENT_DELETE_TIMEOUT
+        )
+        if pending:
+            LOGGER.warning("Timed out deleting uploaded attachments")
+            for task in pending:
+                task.cancel()
+
+    async def _async_file_id(
+        self,
+        file_path: Path,
+        key: _AttachmentKey,
+        mime_type: str,
+        options: AttachmentOptions,
+    ) -> str:
+        """Return the id of an uploaded file, uploading it when needed."""
+        if (uploaded := self._uploaded.get(key)) is not None:
+            now = time.monotonic()
+            if uploaded.expires > now:
+                uploaded.expires = min(
+                    now + UPLOADED_ATTACHMENT_TTL, uploaded.max_expires
+                )
+                return uploaded.file_id
+            self._uploaded.pop(key)
+            self._async_delete([uploaded.file_id])
+        # Concurrent requests for the same file share a single upload
+        if (upload := self._uploads.get(key)) is None:
+            upload = self._hass.async_create_background_task(
+                self._async_upload(file_path, key, mime_type, options),
+                f"{DOMAIN} upload attachment",
+            )
+            self._uploads[key] = upload
+            upload.add_done_callback(partial(self._async_upload_done, key))
+        return await asyncio.shield(upload)
+
+    @callback
+    def _async_upload_done(
+        self, key: _AttachmentKey, upload: asyncio.Task[str]
+    ) -> None:
+        """Forget a finished upload.
+
+        Its error is raised in the requests that wait for it, so it is not
+        reported again when they were all cancelled.
+        """
+        if self._uploads.get(key) is upload:
+            del self._uploads[key]
+        if not upload.cancelled():
+            upload.exception()
+
+    async def _async_upload(
+        self,
+        file_path: Path,
+        key: _AttachmentKey,
+        mime_type: str,
+        options: AttachmentOptions,
+    ) -> str:
+        """Upload a file and cache its id."""
+        async with _ENCODING_LIMITER.reserve(key[2]):
+            read_key, upload = await self._hass.async_add_executor_job(
+                _read_upload, file_path, mime_type, options
+            )
+            with api_error_handler():
+                file_object = await self._client.files.create(
+                    file=upload,
+                    purpose="user_data",
+                    expires_after={
+                        "anchor": "created_at",
+                        "seconds": UPLOADED_ATTACHMENT_MAX_AGE,
+                    },
+                )
+        LOGGER.debug(
+            "Uploaded %s (%d bytes) as %s", file_path, len(upload[1]), file_object.id
+        )
+        now = time.monotonic()
+        max_expires = now + UPLOADED_ATTACHMENT_MAX_AGE - UPLOADED_ATTACHMENT_TTL
+        self._uploaded.put(
+            read_key,
+            _UploadedFile(
+                file_object.id,
+                min(now + UPLOADED_ATTACHMENT_TTL, max_expires),
+                max_expires,
+            ),
+        )
+        return file_object.id
+
+    @callback
+    def _async_delete_expired(self) -> None:
+        """Delete files that were not used for a while."""
+        now = time.monotonic()
+        expired: list[str] = []
+        # Keys are ordered by last use, so the expired files come first
+        for key in self._uploaded:
+            uploaded = self._uploaded.peek(key)
+            if uploaded is None or uploaded.expires > now:
+                break
+            self._uploaded.pop(key)
+            expired.append(uploaded.file_id)
+        self._async_delete(expired)
+
+    @callback
+    def _async_delete(self, file_ids: list[str]) -> None:
+        """Delete uploaded files in the background."""
+        if file_ids:
+            task = self._hass.async_create_background_task(
+                self._async_delete_files(file_ids),
+                f"{DOMAIN} delete uploaded attachments",
+            )
+            self._deletes.add(task)
+            task.add_done_callback(self._deletes.discard)
+
+    async def _async_delete_files(self, file_ids: list[str]) -> None:
+        """Delete uploaded files, logging files that can't be deleted."""
+        await asyncio.gather(
+            *(self._async_delete_file(file_id) for file_id in file_ids)
+        )
+
+    async def _async_delete_file(self, file_id: str) -> None:
+        """Delete an uploaded file, logging when it can't be deleted."""
+        try:
+            await self._client.files.delete(file_id)
+        except OpenAIError as err:
+            LOGGER.warning("Unable to delete uploaded file %s: %s", file_id, err)
+        else:
+            LOGGER.debug("Deleted uploaded file %s", file_id)
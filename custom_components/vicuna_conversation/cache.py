@@ -0,0 +1,105 @@
+"""Bounded in-memory caches used by the Custom OpenAI integration."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+from collections.abc import Callable, Hashable, Iterator
+
+
+class LRUCache[K: Hashable, V]:
+    """A least recently used cache bounded by entry count and optional size.
+
+    The size of each value is measured with `sizeof` when it is stored. When
+    either the entry count or the total size exceeds its bound, the least
+    recently used entries are evicted, and passed to `on_evict` if it is set.
+    """
+
+    def __init__(
+        self,
+        max_entries: int,
+        max_size: int | None = None,
+        sizeof: Callable[[V], int] | None = None,
+        on_evict: Callable[[K, V], None] | None = None,
+    ) -> None:
+        """Initialize the cache."""
+        self._max_entries = max_entries
+        self._max_size = max_size
+        self._sizeof = sizeof
+        self._on_evict = on_evict
+        self._data: OrderedDict[K, tuple[V, int]] = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._data)
+
+    def __contains__(self, key: object) -> bool:
+        """Return True if the key is cached, without updating recency."""
+        return key in self._data
+
+    def __iter__(self) -> Iterator[K]:
+        """Iterate over the cached keys from least to most recently used."""
+        return iter(list(self._data))
+
+    @property
+    def size(self) -> int:
+        """Return the total size of all cached values."""
+        return self._size
+
+    def as_dict(self) -> dict[str, int]:
+        """Return the counters for diagnostics."""
+        return {
+            "entries": len(self._data),
+            "size": self._size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def get(self, key: K) -> V | None:
+        """Return the cached value and mark it as recently used."""
+        if (item := self._data.get(key)) is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return item[0]
+
+    def put(self, key: K, value: V) -> None:
+        """Store a value, evicting old entries to stay within bounds."""
+        self.pop(key)
+        size = self._sizeof(value) if self._sizeof else 0
+        if self._max_size is not None and size > self._max_size:
+            # Never cache a value that could not fit on its own
+            return
+        self._data[key] = (value, size)
+        self._size += size
+        while len(self._data) > self._max_entries or (
+            self._max_size is not None and self._size > self._max_size
+        ):
+            evicted_key, (evicted, evicted_size) = self._data.popitem(last=False)
+            self._size -= evicted_size
+            self.evictions += 1
+            if self._on_evict:
+                self._on_evict(evicted_key, evicted)
+
+    def peek(self, key: K) -> V | None:
+        """Return the cached value without marking it as recently used."""
+        if (item := self._data.get(key)) is None:
+            return None
+        return item[0]
+
+    def pop(self, key: K) -> V | None:
+        """Remove a value from the cache and return it."""
+        if (item := self._data.pop(key, None)) is None:
+            return None
+        self._size -= item[1]
+        return item[0]
+
+    def clear(self) -> None:
+        """Remove all entries from the cache."""
+        self._data.clear()
+        self._size = 0
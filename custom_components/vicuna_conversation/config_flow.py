@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 import logging
+from collections.abc import Mapping
 from typing import Any, cast
 
 import openai
@@ -13,6 +14,7 @@ from homeassistant.config_entries import (
     ConfigFlow,
     ConfigFlowResult,
     ConfigSubentryFlow,
+    OptionsFlow,
     SubentryFlowResult,
 )
 from homeassistant.const import CONF_API_KEY, CONF_LLM_HASS_API, CONF_NAME
@@ -27,33 +29,84 @@ from homeassistant.helpers.selector import (
     SelectSelectorConfig,
     SelectSelectorMode,
     TemplateSelector,
+    TextSelector,
+    TextSelectorConfig,
+    TextSelectorType,
 )
 
 from .const import (
     CONF_BASE_URL,
     CONF_CHAT_MODEL,
+    CONF_CONNECT_TIMEOUT,
+    CONF_FIRST_TOKEN_TIMEOUT,
+    CONF_HTTP2,
+    CONF_IMAGE_FORMAT,
+    CONF_IMAGE_MAX_SIZE,
+    CONF_IMAGE_QUALITY,
+    CONF_KEEPALIVE_EXPIRY,
+    CONF_LOAD_BALANCING,
+    CONF_MAX_CONNECTIONS,
+    CONF_MAX_KEEPALIVE_CONNECTIONS,
+    CONF_MAX_RETRIES,
     CONF_MAX_TOKENS,
+    CONF_PARALLEL_TOOL_CALLS,
+    CONF_PDF_MAX_CHARS,
+    CONF_PDF_MAX_PAGES,
+    CONF_PDF_RENDER_PAGES,
     CONF_PROMPT,
+    CONF_RAW_STREAMING,
     CONF_RECOMMENDED,
+    CONF_REPLICAS,
+    CONF_REQUEST_TIMEOUT,
+    CONF_STALL_TIMEOUT,
     CONF_STREAMING,
     CONF_TEMPERATURE,
     CONF_TOP_P,
+    CONF_UPLOAD_ATTACHMENTS,
+    CONF_VIDEO_FRAME_SELECTION,
+    CONF_VIDEO_MAX_FRAMES,
     DEFAULT_AI_TASK_NAME,
     DEFAULT_API_KEY,
     DEFAULT_BASE_URL,
     DEFAULT_CONVERSATION_NAME,
     DOMAIN,
+    IMAGE_FORMATS,
+    LOAD_BALANCING_MODES,
     LOGGER,
     RECOMMENDED_CHAT_MODEL,
     RECOMMENDED_CHAT_MODELS,
+    RECOMMENDED_CONNECT_TIMEOUT,
+    RECOMMENDED_FIRST_TOKEN_TIMEOUT,
+    RECOMMENDED_HTTP2,
+    RECOMMENDED_IMAGE_FORMAT,
+    RECOMMENDED_IMAGE_MAX_SIZE,
+    RECOMMENDED_IMAGE_QUALITY,
+    RECOMMENDED_KEEPALIVE_EXPIRY,
+    RECOMMENDED_LOAD_BALANCING,
+    RECOMMENDED_MAX_CONNECTIONS,
+    RECOMMENDED_MAX_KEEPALIVE_CONNECTIONS,
+    RECOMMENDED_MAX_RETRIES,
     RECOMMENDED_MAX_TOKENS,
+    RECOMMENDED_PARALLEL_TOOL_CALLS,
+    RECOMMENDED_PDF_MAX_CHARS,
+    RECOMMENDED_PDF_MAX_PAGES,
+    RECOMMENDED_PDF_RENDER_PAGES,
+    RECOMMENDED_RAW_STREAMING,
+    RECOMMENDED_REQUEST_TIMEOUT,
+    RECOMMENDED_STALL_TIMEOUT,
     RECOMMENDED_TEMPERATURE,
     RECOMMENDED_TOP_P,
+    RECOMMENDED_UPLOAD_ATTACHMENTS,
+    RECOMMENDED_VIDEO_FRAME_SELECTION,
+    RECOMMENDED_VIDEO_MAX_FRAMES,
+    VIDEO_FRAME_SELECTIONS,
 )
 from .openai_client import (
-    async_create_client,
+    async_acquire_client,
     async_list_models,
+    async_release_client,
     async_validate_completions,
+    validate_base_url,
 )
 
 _LOGGER = logging.getLogger(__name__)
@@ -111,8 +164,10 @@ class OpenAIConfigFlow(ConfigFlow, domain=DOMAIN):
         errors = {}
         if user_input is not None:
             self._async_abort_entries_match(user_input)
+            self._async_release_client()
             try:
-                self.client = await async_create_client(self.hass, user_input)
+                # The new entry will share the client while the flow holds it
+                self.client = await async_acquire_client(self.hass, user_input, {})
                 self.models = await async_list_models(self.client)
             except HomeAssistantError as err:
                 LOGGER.error("Connection validation failed: %s", err)
@@ -128,6 +183,18 @@ class OpenAIConfigFlow(ConfigFlow, domain=DOMAIN):
             step_id="user", data_schema=STEP_USER_DATA_SCHEMA, errors=errors
         )
 
+    @callback
+    def _async_release_client(self) -> None:
+        """Release the client of the flow, if any."""
+        if self.client is not None:
+            async_release_client(self.hass, self.client)
+            self.client = None
+
+    @callback
+    def async_remove(self) -> None:
+        """Release the client when the flow is removed."""
+        self._async_release_client()
+
     async def async_step_model(
         self, user_input: dict[str, Any] | None = None
     ) -> ConfigFlowResult:
@@ -213,6 +280,12 @@ class OpenAIConfigFlow(ConfigFlow, domain=DOMAIN):
             errors=errors,
         )
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: ConfigEntry) -> OptionsFlow:
+        """Create the options flow."""
+        return TransportOptionsFlow()
+
     @classmethod
     @callback
     def async_get_supported_subentry_types(
@@ -225,6 +298,31 @@ class OpenAIConfigFlow(ConfigFlow, domain=DOMAIN):
         }
 
 
+class TransportOptionsFlow(OptionsFlow):
+    """Flow for managing the HTTP transport of an entry."""
+
+    async def async_step_init(
+        self, user_input: dict[str, Any] | None = None
+    ) -> ConfigFlowResult:
+        """Manage the transport options."""
+        errors: dict[str, str] = {}
+        if user_input is not None:
+            try:
+                for replica_url in user_input.get(CONF_REPLICAS, []):
+                    validate_base_url(replica_url)
+            except HomeAssistantError as err:
+                errors["base"] = err.translation_key or "unknown"
+            else:
+                return self.async_create_entry(data=user_input)
+        return self.async_show_form(
+            step_id="init",
+            data_schema=vol.Schema(
+                transport_option_schema(user_input or self.config_entry.options)
+            ),
+            errors=errors,
+        )
+
+
 class ConversationSubentryFlowHandler(ConfigSubentryFlow):
     """Flow for managing conversation subentries."""
 
@@ -349,6 +447,61 @@ class ConversationSubentryFlowHandler(ConfigSubentryFlow):
         )
 
 
+def transport_option_schema(options: Mapping[str, Any]) -> dict:
+    """Return a schema for the HTTP transport options of an entry."""
+    return {
+        vol.Optional(
+            CONF_MAX_CONNECTIONS,
+            description={
+                "suggested_value": options.get(
+                    CONF_MAX_CONNECTIONS, RECOMMENDED_MAX_CONNECTIONS
+                )
+            },
+        ): NumberSelector(NumberSelectorConfig(min=1, max=1000, step=1)),
+        vol.Optional(
+            CONF_MAX_KEEPALIVE_CONNECTIONS,
+            description={
+                "suggested_value": options.get(
+                    CONF_MAX_KEEPALIVE_CONNECTIONS,
+                    RECOMMENDED_MAX_KEEPALIVE_CONNECTIONS,
+                )
+            },
+        ): NumberSelector(NumberSelectorConfig(min=0, max=1000, step=1)),
+        vol.Optional(
+            CONF_KEEPALIVE_EXPIRY,
+            description={
+                "suggested_value": options.get(
+                    CONF_KEEPALIVE_EXPIRY, RECOMMENDED_KEEPALIVE_EXPIRY
+                )
+            },
+        ): NumberSelector(
+            NumberSelectorConfig(min=0, max=600, step=1, unit_of_measurement="s")
+        ),
+        vol.Optional(
+            CONF_HTTP2,
+            description={"suggested_value": options.get(CONF_HTTP2, RECOMMENDED_HTTP2)},
+        ): bool,
+        vol.Optional(
+            CONF_REPLICAS,
+            description={"suggested_value": options.get(CONF_REPLICAS, [])},
+        ): TextSelector(TextSelectorConfig(type=TextSelectorType.URL, multiple=True)),
+        vol.Optional(
+            CONF_LOAD_BALANCING,
+            description={
+                "suggested_value": options.get(
+                    CONF_LOAD_BALANCING, RECOMMENDED_LOAD_BALANCING
+                )
+            },
+        ): SelectSelector(
+            SelectSelectorConfig(
+                options=LOAD_BALANCING_MODES,
+                translation_key=CONF_LOAD_BALANCING,
+                mode=SelectSelectorMode.DROPDOWN,
+            )
+        ),
+    }
+
+
 def openai_config_option_schema(
     hass: HomeAssistant,
     subentry_type: str,
@@ -448,6 +601,161 @@ def openai_config_option_schema(
                 description={"suggested_value": options.get(CONF_TEMPERATURE)},
                 default=RECOMMENDED_TEMPERATURE,
             ): NumberSelector(NumberSelectorConfig(min=0, max=2, step=0.05)),
+            vol.Optional(
+                CONF_RAW_STREAMING,
+                description={
+                    "suggested_value": options.get(
+                        CONF_RAW_STREAMING, RECOMMENDED_RAW_STREAMING
+                    )
+                },
+            ): bool,
+            vol.Optional(
+                CONF_IMAGE_MAX_SIZE,
+                description={
+                    "suggested_value": options.get(
+                        CONF_IMAGE_MAX_SIZE, RECOMMENDED_IMAGE_MAX_SIZE
+                    )
+                },
+            ): NumberSelector(
+                NumberSelectorConfig(min=0, max=4096, step=64, unit_of_measurement="px")
+            ),
+            vol.Optional(
+                CONF_IMAGE_QUALITY,
+                description={
+                    "suggested_value": options.get(
+                        CONF_IMAGE_QUALITY, RECOMMENDED_IMAGE_QUALITY
+                    )
+                },
+            ): NumberSelector(NumberSelectorConfig(min=10, max=100, step=5)),
+            vol.Optional(
+                CONF_IMAGE_FORMAT,
+                description={
+                    "suggested_value": options.get(
+                        CONF_IMAGE_FORMAT, RECOMMENDED_IMAGE_FORMAT
+                    )
+                },
+            ): SelectSelector(
+                SelectSelectorConfig(
+                    options=IMAGE_FORMATS,
+                    translation_key=CONF_IMAGE_FORMAT,
+                    mode=SelectSelectorMode.DROPDOWN,
+                )
+            ),
+            vol.Optional(
+                CONF_PDF_MAX_PAGES,
+                description={
+                    "suggested_value": options.get(
+                        CONF_PDF_MAX_PAGES, RECOMMENDED_PDF_MAX_PAGES
+                    )
+                },
+            ): NumberSelector(NumberSelectorConfig(min=1, max=500, step=1)),
+            vol.Optional(
+                CONF_PDF_MAX_CHARS,
+                description={
+                    "suggested_value": options.get(
+                        CONF_PDF_MAX_CHARS, RECOMMENDED_PDF_MAX_CHARS
+                    )
+                },
+            ): NumberSelector(NumberSelectorConfig(min=1000, max=1000000, step=1000)),
+            vol.Optional(
+                CONF_PDF_RENDER_PAGES,
+                description={
+                    "suggested_value": options.get(
+                        CONF_PDF_RENDER_PAGES, RECOMMENDED_PDF_RENDER_PAGES
+                    )
+                },
+            ): NumberSelector(NumberSelectorConfig(min=0, max=20, step=1)),
+            vol.Optional(
+                CONF_VIDEO_MAX_FRAMES,
+                description={
+                    "suggested_value": options.get(
+                        CONF_VIDEO_MAX_FRAMES, RECOMMENDED_VIDEO_MAX_FRAMES
+                    )
+                },
+            ): NumberSelector(NumberSelectorConfig(min=1, max=32, step=1)),
+            vol.Optional(
+                CONF_VIDEO_FRAME_SELECTION,
+                description={
+                    "suggested_value": options.get(
+                        CONF_VIDEO_FRAME_SELECTION, RECOMMENDED_VIDEO_FRAME_SELECTION
+                    )
+                },
+            ): SelectSelector(
+                SelectSelectorConfig(
+                    options=VIDEO_FRAME_SELECTIONS,
+                    translation_key=CONF_VIDEO_FRAME_SELECTION,
+                    mode=SelectSelectorMode.DROPDOWN,
+                )
+            ),
+            vol.Optional(
+                CONF_UPLOAD_ATTACHMENTS,
+                description={
+                    "suggested_value": options.get(
+                        CONF_UPLOAD_ATTACHMENTS, RECOMMENDED_UPLOAD_ATTACHMENTS
+                    )
+                },
+            ): bool,
+            vol.Optional(
+                CONF_CONNECT_TIMEOUT,
+                description={
+                    "suggested_value": options.get(
+                        CONF_CONNECT_TIMEOUT, RECOMMENDED_CONNECT_TIMEOUT
+                    )
+                },
+            ): NumberSelector(
+                NumberSelectorConfig(min=1, max=120, step=1, unit_of_measurement="s")
+            ),
+            vol.Optional(
+                CONF_FIRST_TOKEN_TIMEOUT,
+                description={
+                    "suggested_value": options.get(
+                        CONF_FIRST_TOKEN_TIMEOUT, RECOMMENDED_FIRST_TOKEN_TIMEOUT
+                    )
+                },
+            ): NumberSelector(
+                NumberSelectorConfig(min=1, max=600, step=1, unit_of_measurement="s")
+            ),
+            vol.Optional(
+                CONF_STALL_TIMEOUT,
+                description={
+                    "suggested_value": options.get(
+                        CONF_STALL_TIMEOUT, RECOMMENDED_STALL_TIMEOUT
+                    )
+                },
+            ): NumberSelector(
+                NumberSelectorConfig(min=1, max=600, step=1, unit_of_measurement="s")
+            ),
+            vol.Optional(
+                CONF_REQUEST_TIMEOUT,
+                description={
+                    "suggested_value": options.get(
+                        CONF_REQUEST_TIMEOUT, RECOMMENDED_REQUEST_TIMEOUT
+                    )
+                },
+            ): NumberSelector(
+                NumberSelectorConfig(min=1, max=3600, step=1, unit_of_measurement="s")
+            ),
+            vol.Optional(
+                CONF_MAX_RETRIES,
+                description={
+                    "suggested_value": options.get(
+                        CONF_MAX_RETRIES, RECOMMENDED_MAX_RETRIES
+                    )
+                },
+            ): NumberSelector(NumberSelectorConfig(min=0, max=10, step=1)),
         }
     )
+    if subentry_type == "conversation":
+        schema.update(
+            {
+                vol.Optional(
+                    CONF_PARALLEL_TOOL_CALLS,
+                    description={
+                        "suggested_value": options.get(
+                            CONF_PARALLEL_TOOL_CALLS, RECOMMENDED_PARALLEL_TOOL_CALLS
+                        )
+                    },
+                ): bool,
+            }
+        )
     return schema
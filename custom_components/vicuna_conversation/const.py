@@ -16,6 +16,28 @@ CONF_TOP_P = "top_p"
 CONF_BASE_URL = "base_url"
 CONF_RECOMMENDED = "recommended"
 CONF_STREAMING = "streaming"
+CONF_PARALLEL_TOOL_CALLS = "parallel_tool_calls"
+CONF_RAW_STREAMING = "raw_streaming"
+CONF_IMAGE_MAX_SIZE = "image_max_size"
+CONF_IMAGE_QUALITY = "image_quality"
+CONF_IMAGE_FORMAT = "image_format"
+CONF_PDF_MAX_PAGES = "pdf_max_pages"
+CONF_PDF_MAX_CHARS = "pdf_max_chars"
+CONF_PDF_RENDER_PAGES = "pdf_render_pages"
+CONF_UPLOAD_ATTACHMENTS = "upload_attachments"
+CONF_VIDEO_MAX_FRAMES = "video_max_frames"
+CONF_VIDEO_FRAME_SELECTION = "video_frame_selection"
+CONF_MAX_CONNECTIONS = "max_connections"
+CONF_MAX_KEEPALIVE_CONNECTIONS = "max_keepalive_connections"
+CONF_KEEPALIVE_EXPIRY = "keepalive_expiry"
+CONF_HTTP2 = "http2"
+CONF_REPLICAS = "replicas"
+CONF_LOAD_BALANCING = "load_balancing"
+CONF_CONNECT_TIMEOUT = "connect_timeout"
+CONF_FIRST_TOKEN_TIMEOUT = "first_token_timeout"
+CONF_STALL_TIMEOUT = "stall_timeout"
+CONF_REQUEST_TIMEOUT = "request_timeout"
+CONF_MAX_RETRIES = "max_retries"
 
 RECOMMENDED_CHAT_MODEL = "gpt-3.5-turbo"
 RECOMMENDED_CHAT_MODELS = [
@@ -25,6 +47,34 @@ RECOMMENDED_CHAT_MODELS = [
 RECOMMENDED_MAX_TOKENS = 3000
 RECOMMENDED_TEMPERATURE = 0.7
 RECOMMENDED_TOP_P = 1.0
+RECOMMENDED_PARALLEL_TOOL_CALLS = False
+RECOMMENDED_RAW_STREAMING = False
+# Images are sent as they are unless a max size or format is configured
+RECOMMENDED_IMAGE_MAX_SIZE = 0
+RECOMMENDED_IMAGE_QUALITY = 85
+RECOMMENDED_IMAGE_FORMAT = "original"
+IMAGE_FORMATS = ["original", "jpeg", "webp"]
+RECOMMENDED_PDF_MAX_PAGES = 20
+RECOMMENDED_PDF_MAX_CHARS = 50000
+RECOMMENDED_PDF_RENDER_PAGES = 0
+RECOMMENDED_UPLOAD_ATTACHMENTS = False
+RECOMMENDED_VIDEO_MAX_FRAMES = 8
+RECOMMENDED_VIDEO_FRAME_SELECTION = "scene"
+VIDEO_FRAME_SELECTIONS = ["scene", "interval"]
+# Connection pool of the HTTP client of each entry
+RECOMMENDED_MAX_CONNECTIONS = 100
+RECOMMENDED_MAX_KEEPALIVE_CONNECTIONS = 20
+RECOMMENDED_KEEPALIVE_EXPIRY = 15
+RECOMMENDED_HTTP2 = False
+RECOMMENDED_LOAD_BALANCING = "least_outstanding"
+LOAD_BALANCING_MODES = ["least_outstanding", "ewma"]
+# Deadlines in seconds of the phases of a completion request, the first token
+# can take a while as a local server processes the prompt before sending it
+RECOMMENDED_CONNECT_TIMEOUT = 10
+RECOMMENDED_FIRST_TOKEN_TIMEOUT = 60
+RECOMMENDED_STALL_TIMEOUT = 30
+RECOMMENDED_REQUEST_TIMEOUT = 300
+RECOMMENDED_MAX_RETRIES = 2
 
 DEFAULT_AI_TASK_NAME: Final = "Custom OpenAI AI Task"
 RECOMMENDED_AI_TASK_OPTIONS = {
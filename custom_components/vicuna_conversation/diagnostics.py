@@ -0,0 +1,55 @@
+"""Diagnostics support for Custom OpenAI Conversation."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_API_KEY
+from homeassistant.core import HomeAssistant
+
+from .attachments import attachment_cache_stats
+from .const import CONF_BASE_URL, CONF_REPLICAS
+from .entity import async_get_stream_stats, conversion_cache_stats
+from .offload import async_get_offload_stats
+from .openai_client import RETRY_BUDGET, async_get_circuit_breaker
+
+TO_REDACT = {CONF_API_KEY}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    return {
+        "data": async_redact_data(entry.data, TO_REDACT),
+        "options": dict(entry.options),
+        "subentries": {
+            subentry_id: {
+                "subentry_type": subentry.subentry_type,
+                "title": subentry.title,
+                "data": dict(subentry.data),
+            }
+            for subentry_id, subentry in entry.subentries.items()
+        },
+        "offload": {
+            name: stats.as_dict()
+            for name, stats in async_get_offload_stats(hass).items()
+        },
+        "streams": async_get_stream_stats(hass).as_dict(),
+        # The caches and the retry budget bound the memory and the retries of
+        # the whole process, so they are shared with other Home Assistant
+        # instances in the same process, such as in tests
+        "process": {
+            "caches": {
+                **conversion_cache_stats(),
+                "attachments": attachment_cache_stats(),
+            },
+            "retries": RETRY_BUDGET.as_dict(),
+        },
+        # Replicas are ejected by the load balancer instead of the breaker
+        "circuit_breaker": None
+        if entry.options.get(CONF_REPLICAS)
+        else async_get_circuit_breaker(hass, entry.data[CONF_BASE_URL]).as_dict(),
+    }
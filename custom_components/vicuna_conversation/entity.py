@@ -2,30 +2,42 @@
 
 from __future__ import annotations
 
-import base64
+import asyncio
 import json
 import logging
-import mimetypes
-from collections.abc import AsyncGenerator, Callable
-from pathlib import Path
-from typing import Any, Literal, cast
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterable,
+    AsyncIterator,
+    Callable,
+    Hashable,
+    Mapping,
+)
+from contextlib import AsyncExitStack, ExitStack, aclosing, asynccontextmanager
+from dataclasses import asdict, dataclass, field
+from types import BuiltinFunctionType, FunctionType, MethodType
+from typing import Any, NamedTuple, cast
 
+import httpx
 import voluptuous as vol
 from homeassistant.components import conversation
 from homeassistant.config_entries import ConfigEntry, ConfigSubentry
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers import llm
 from homeassistant.helpers.entity import Entity
-from openai import AsyncOpenAI
+from homeassistant.helpers.json import json_bytes
+from homeassistant.util.hass_dict import HassKey
+from homeassistant.util.json import json_loads
+from homeassistant.util.ulid import ulid_now
+from openai import APIError, AsyncOpenAI
 from openai._streaming import AsyncStream
 from openai._types import Omit
 from openai.types.chat import (
     ChatCompletion,
     ChatCompletionAssistantMessageParam,
     ChatCompletionChunk,
-    ChatCompletionContentPartParam,
     ChatCompletionContentPartTextParam,
     ChatCompletionFunctionToolParam,
     ChatCompletionMessage,
@@ -40,27 +52,148 @@ from openai.types.chat.chat_completion_message_function_tool_call_param import F
 from openai.types.shared_params import FunctionDefinition, ResponseFormatJSONSchema
 from voluptuous_openapi import convert
 
+from .attachments import (
+    AttachmentOptions,
+    AttachmentUploader,
+    async_prepare_files_for_prompt,
+)
+from .cache import LRUCache
 from .const import (
+    CONF_BASE_URL,
     CONF_CHAT_MODEL,
+    CONF_IMAGE_FORMAT,
+    CONF_IMAGE_MAX_SIZE,
+    CONF_IMAGE_QUALITY,
+    CONF_MAX_RETRIES,
     CONF_MAX_TOKENS,
+    CONF_PARALLEL_TOOL_CALLS,
+    CONF_PDF_MAX_CHARS,
+    CONF_PDF_MAX_PAGES,
+    CONF_PDF_RENDER_PAGES,
+    CONF_RAW_STREAMING,
+    CONF_REPLICAS,
     CONF_STREAMING,
     CONF_TEMPERATURE,
     CONF_TOP_P,
+    CONF_UPLOAD_ATTACHMENTS,
+    CONF_VIDEO_FRAME_SELECTION,
+    CONF_VIDEO_MAX_FRAMES,
     DOMAIN,
     LOGGER,
     RECOMMENDED_CHAT_MODEL,
+    RECOMMENDED_IMAGE_FORMAT,
+    RECOMMENDED_IMAGE_MAX_SIZE,
+    RECOMMENDED_IMAGE_QUALITY,
+    RECOMMENDED_MAX_RETRIES,
     RECOMMENDED_MAX_TOKENS,
+    RECOMMENDED_PARALLEL_TOOL_CALLS,
+    RECOMMENDED_PDF_MAX_CHARS,
+    RECOMMENDED_PDF_MAX_PAGES,
+    RECOMMENDED_PDF_RENDER_PAGES,
+    RECOMMENDED_RAW_STREAMING,
     RECOMMENDED_TEMPERATURE,
     RECOMMENDED_TOP_P,
+    RECOMMENDED_UPLOAD_ATTACHMENTS,
+    RECOMMENDED_VIDEO_FRAME_SELECTION,
+    RECOMMENDED_VIDEO_MAX_FRAMES,
+)
+from .json_stream import JsonStreamAccumulator, JsonStreamError
+from .offload import async_offload, payload_size
+from .openai_client import (
+    PHASE_FIRST_TOKEN,
+    PHASE_TOTAL,
+    RequestDeadlines,
+    RequestTimeouts,
+    api_error_handler,
+    async_get_circuit_breaker,
+    async_retry_request,
 )
-from .openai_client import api_error_handler
 
 # Max number of back and forth with the LLM to generate a response
 MAX_TOOL_ITERATIONS = 10
 
+# Max number of converted tool and structured output schemas to keep around
+MAX_CACHED_SCHEMAS = 256
+
+# Max number of conversations with converted messages to keep around, and the
+# max total size of their messages in characters of content and bytes of their
+# serialized form
+MAX_CACHED_CONVERSATIONS = 32
+MAX_CACHED_CONVERSATION_SIZE = 8 * 1024 * 1024
+
+# Max number of characters and seconds that streamed content is held back to
+# be merged with the content that follows it
+STREAM_COALESCE_MAX_SIZE = 1024
+STREAM_COALESCE_MAX_DELAY = 0.02
+
+# Max nesting of a schema that is walked when computing its fingerprint
+_MAX_FINGERPRINT_DEPTH = 32
+
+# Code of the functions that voluptuous wraps constant defaults in
+_CONSTANT_DEFAULT_CODE = vol.schema_builder.default_factory(None).__code__
+
 _LOGGER = logging.getLogger(__name__)
 
 
+def _schema_fingerprint(value: Any, depth: int = 0) -> Hashable:
+    """Return a hashable fingerprint of a voluptuous schema.
+
+    The LLM APIs build new schema objects for every request, so schemas can't
+    be compared by identity. The fingerprint captures their structure instead.
+    """
+    if depth > _MAX_FINGERPRINT_DEPTH:
+        return repr(value)
+    depth += 1
+    if isinstance(value, vol.Schema):
+        return (
+            vol.Schema,
+            _schema_fingerprint(value.schema, depth),
+            value.extra,
+            value.required,
+        )
+    if isinstance(value, vol.Marker):
+        default = getattr(value, "default", vol.UNDEFINED)
+        if (
+            getattr(default, "__code__", None) is _CONSTANT_DEFAULT_CODE
+            and default.__closure__
+        ):
+            # A constant default, whose wrapper is created with each schema
+            default = default.__closure__[0].cell_contents
+        # Other defaults are factories, which are compared by identity as
+        # calling them may return a new value each time
+        return (
+            type(value),
+            _schema_fingerprint(value.schema, depth),
+            value.description,
+            _schema_fingerprint(default, depth),
+        )
+    if isinstance(value, dict):
+        return (
+            dict,
+            tuple(
+                (_schema_fingerprint(k, depth), _schema_fingerprint(v, depth))
+                for k, v in value.items()
+            ),
+        )
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_schema_fingerprint(v, depth) for v in value))
+    if isinstance(value, (set, frozenset)):
+        return (frozenset, frozenset(_schema_fingerprint(v, depth) for v in value))
+    if isinstance(value, (type, FunctionType, BuiltinFunctionType, MethodType)):
+        return value
+    if hasattr(value, "__dict__") and (
+        attrs := {k: v for k, v in vars(value).items() if not k.startswith("_")}
+    ):
+        # Validator objects such as vol.In, vol.All or selectors are converted
+        # based on their public attributes.
+        return (type(value), _schema_fingerprint(attrs, depth))
+    try:
+        hash(value)
+    except TypeError:
+        return repr(value)
+    return (type(value), value)
+
+
 def _format_tool(
     tool: llm.Tool,
     custom_serializer: Callable[[Any], Any] | None,
@@ -75,64 +208,300 @@ def _format_tool(
     return ChatCompletionFunctionToolParam(type="function", function=tool_spec)
 
 
-def _format_structured_output(
-    name: str, structure: vol.Schema, llm_api: llm.APIInstance | None
+# Converted tools keyed by LLM API, tool name, description, schema fingerprint
+# and serializer. The cached values are shared between requests and must not
+# be modified.
+_TOOL_CACHE: LRUCache[Hashable, ChatCompletionFunctionToolParam] = LRUCache(
+    MAX_CACHED_SCHEMAS
+)
+# Tool names last seen for each LLM API, used to invalidate removed tools
+_API_TOOL_NAMES: dict[str, frozenset[str]] = {}
+
+
+async def _async_format_tools(
+    hass: HomeAssistant, llm_api: llm.APIInstance
+) -> list[ChatCompletionFunctionToolParam]:
+    """Format the tools of an LLM API, reusing previously converted tools.
+
+    New tools are converted together, in the executor if their schemas are
+    large.
+    """
+    api_id = llm_api.api.id
+    tool_names = frozenset(tool.name for tool in llm_api.tools)
+    if (previous_names := _API_TOOL_NAMES.get(api_id)) != tool_names:
+        if previous_names is not None:
+            LOGGER.debug("Tools changed for LLM API %s, invalidating cache", api_id)
+            for key in _TOOL_CACHE:
+                if key[0] == api_id and key[1] not in tool_names:
+                    _TOOL_CACHE.pop(key)
+        _API_TOOL_NAMES[api_id] = tool_names
+
+    tools: list[ChatCompletionFunctionToolParam | None] = []
+    missing: list[tuple[int, Hashable, llm.Tool]] = []
+    for tool in llm_api.tools:
+        key = (
+            api_id,
+            tool.name,
+            tool.description,
+            _schema_fingerprint(tool.parameters),
+            llm_api.custom_serializer,
+        )
+        if (tool_param := _TOOL_CACHE.get(key)) is None:
+            missing.append((len(tools), key, tool))
+        tools.append(tool_param)
+    if missing:
+        converted = await async_offload(
+            hass,
+            "tool_schemas",
+            payload_size([key[3] for _, key, _ in missing]),
+            lambda: [
+                _format_tool(tool, llm_api.custom_serializer) for _, _, tool in missing
+            ],
+        )
+        for (index, key, _), tool_param in zip(missing, converted, strict=True):
+            _TOOL_CACHE.put(key, tool_param)
+            tools[index] = tool_param
+    return cast(list[ChatCompletionFunctionToolParam], tools)
+
+
+# Converted structured output schemas keyed by schema fingerprint and serializer
+_STRUCTURE_CACHE: LRUCache[Hashable, dict[str, object]] = LRUCache(MAX_CACHED_SCHEMAS)
+
+
+async def _async_format_structured_output(
+    hass: HomeAssistant,
+    name: str,
+    structure: vol.Schema,
+    llm_api: llm.APIInstance | None,
 ) -> ResponseFormatJSONSchema:
     """Format structured output specification."""
-    schema = convert(
-        structure, custom_serializer=llm_api.custom_serializer if llm_api else None
-    )
+    custom_serializer = llm_api.custom_serializer if llm_api else None
+    fingerprint = _schema_fingerprint(structure)
+    key = (fingerprint, custom_serializer)
+    if (schema := _STRUCTURE_CACHE.get(key)) is None:
+        schema = cast(
+            dict[str, object],
+            await async_offload(
+                hass,
+                "structure_schema",
+                payload_size(fingerprint),
+                lambda: convert(structure, custom_serializer=custom_serializer),
+            ),
+        )
+        _STRUCTURE_CACHE.put(key, schema)
     return ResponseFormatJSONSchema(
         type="json_schema",
         json_schema={
             "name": name,
             "strict": True,
-            "schema": cast(dict[str, object], schema),
+            "schema": schema,
         },
     )
 
 
-def _convert_content_to_chat_message(
+def _convert_tool_result_content(
+    content: conversation.ToolResultContent,
+) -> ChatCompletionMessageParam:
+    """Convert a tool result to a tool message."""
+    return ChatCompletionToolMessageParam(
+        # Note: The functionary 'tool' role expects a name which is
+        # not supported in llama cpp python and the openai protos.
+        role="tool",
+        tool_call_id=content.tool_call_id,
+        content=json.dumps(content.tool_result),
+    )
+
+
+def _convert_system_content(
+    content: conversation.SystemContent,
+) -> ChatCompletionMessageParam | None:
+    """Convert a system prompt to a system message."""
+    if not content.content:
+        return None
+    return ChatCompletionSystemMessageParam(role="system", content=content.content)
+
+
+def _convert_user_content(
+    content: conversation.UserContent,
+) -> ChatCompletionMessageParam | None:
+    """Convert user content to a user message."""
+    if not content.content:
+        return None
+    return ChatCompletionUserMessageParam(role="user", content=content.content)
+
+
+def _convert_assistant_content(
+    content: conversation.AssistantContent,
+) -> ChatCompletionMessageParam:
+    """Convert assistant content to an assistant message."""
+    if not content.tool_calls:
+        return ChatCompletionAssistantMessageParam(
+            role="assistant", content=content.content or ""
+        )
+    return ChatCompletionAssistantMessageParam(
+        role="assistant",
+        content=content.content,
+        tool_calls=[
+            ChatCompletionMessageToolCallParam(
+                type="function",
+                id=tool_call.id,
+                function=Function(
+                    arguments=json.dumps(tool_call.tool_args),
+                    name=tool_call.tool_name,
+                ),
+            )
+            for tool_call in content.tool_calls
+        ],
+    )
+
+
+_CONTENT_CONVERTERS: dict[type, Callable[[Any], ChatCompletionMessageParam | None]] = {
+    conversation.SystemContent: _convert_system_content,
+    conversation.UserContent: _convert_user_content,
+    conversation.AssistantContent: _convert_assistant_content,
+    conversation.ToolResultContent: _convert_tool_result_content,
+}
+
+
+def _convert_content(
     content: conversation.Content,
 ) -> ChatCompletionMessageParam | None:
     """Convert any native chat message for this agent to the native format."""
-    _LOGGER.debug("_convert_content_to_chat_message=%s", content)
+    if (converter := _CONTENT_CONVERTERS.get(type(content))) is None:
+        LOGGER.warning("Could not convert message to OpenAI API: %s", content)
+        return None
+    return converter(content)
+
+
+def _content_size(content: conversation.Content) -> int:
+    """Return the approximate size of the content that is serialized."""
     if isinstance(content, conversation.ToolResultContent):
-        return ChatCompletionToolMessageParam(
-            # Note: The functionary 'tool' role expects a name which is
-            # not supported in llama cpp python and the openai protos.
-            role="tool",
-            tool_call_id=content.tool_call_id,
-            content=json.dumps(content.tool_result),
-        )
+        return payload_size(content.tool_result)
+    if isinstance(content, conversation.AssistantContent) and content.tool_calls:
+        return payload_size([tool_call.tool_args for tool_call in content.tool_calls])
+    return 0
+
 
-    role: Literal["user", "assistant", "system"] = content.role
-    if role == "system" and content.content:
-        return ChatCompletionSystemMessageParam(role="system", content=content.content)
+def _message_size(message: ChatCompletionMessageParam | None) -> int:
+    """Return the approximate size of a converted message in characters."""
+    if message is None:
+        return 0
+    content = message.get("content")
+    size = len(content) if isinstance(content, str) else 0
+    for tool_call in message.get("tool_calls") or ():
+        size += len(tool_call["function"]["arguments"])
+    return size
 
-    if role == "user" and content.content:
-        return ChatCompletionUserMessageParam(role="user", content=content.content)
 
-    if role == "assistant":
-        param = ChatCompletionAssistantMessageParam(
-            role="assistant",
-            content=content.content,
+class _ConversationMessages:
+    """Messages converted from the chat log content of a conversation.
+
+    Converted messages are shared between requests and must not be modified.
+    Their serialized form is kept as well once a request is encoded, so only
+    new messages are serialized for the next request.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the converted messages."""
+        self._contents: list[conversation.Content] = []
+        self._messages: list[ChatCompletionMessageParam | None] = []
+        self._encoded: list[bytes | None] = []
+        self._sizes: list[int] = []
+        self.size = 0
+
+    async def _async_set(
+        self, hass: HomeAssistant, index: int, content: conversation.Content
+    ) -> None:
+        """Convert the content and store it at the index."""
+        _LOGGER.debug("Converting content: %s", content)
+        message = await async_offload(
+            hass, "convert_content", _content_size(content), _convert_content, content
         )
-        if isinstance(content, conversation.AssistantContent) and content.tool_calls:
-            param["tool_calls"] = [
-                ChatCompletionMessageToolCallParam(
-                    type="function",
-                    id=tool_call.id,
-                    function=Function(
-                        arguments=json.dumps(tool_call.tool_args),
-                        name=tool_call.tool_name,
-                    ),
-                )
-                for tool_call in content.tool_calls
-            ]
-        return param
-    LOGGER.warning("Could not convert message to OpenAI API: %s", content)
-    return None
+        size = _message_size(message)
+        if index < len(self._contents):
+            self.size -= self._sizes[index]
+            self._contents[index] = content
+            self._messages[index] = message
+            self._encoded[index] = None
+            self._sizes[index] = size
+        else:
+            self._contents.append(content)
+            self._messages.append(message)
+            self._encoded.append(None)
+            self._sizes.append(size)
+        self.size += size
+
+    async def async_sync(
+        self, hass: HomeAssistant, contents: list[conversation.Content]
+    ) -> list[ChatCompletionMessageParam]:
+        """Return messages for the content, converting only new content."""
+        for index, content in enumerate(contents):
+            # The system prompt is re-rendered every turn, so compare each item
+            if index >= len(self._contents) or self._contents[index] is not content:
+                await self._async_set(hass, index, content)
+        if len(self._contents) > len(contents):
+            self.size -= sum(self._sizes[len(contents) :])
+            del self._contents[len(contents) :]
+            del self._messages[len(contents) :]
+            del self._encoded[len(contents) :]
+            del self._sizes[len(contents) :]
+        return [message for message in self._messages if message is not None]
+
+    async def async_append(
+        self, hass: HomeAssistant, content: conversation.Content
+    ) -> ChatCompletionMessageParam | None:
+        """Convert content that was added to the end of the chat log."""
+        await self._async_set(hass, len(self._contents), content)
+        return self._messages[-1]
+
+    def encode(self, messages: list[ChatCompletionMessageParam]) -> bytes:
+        """Return the messages serialized as a JSON array.
+
+        The messages are those returned by `async_sync` and `async_append`, in
+        order. A message that was replaced by the caller is serialized every
+        time. Only requests sent as bytes use this, as the OpenAI library
+        serializes the messages itself.
+        """
+        parts: list[bytes] = []
+        index = 0
+        for message in messages:
+            while index < len(self._messages) and self._messages[index] is None:
+                index += 1
+            if index < len(self._messages) and self._messages[index] is message:
+                if (encoded := self._encoded[index]) is None:
+                    encoded = self._encoded[index] = json_bytes(message)
+                    self._sizes[index] += len(encoded)
+                    self.size += len(encoded)
+            else:
+                encoded = json_bytes(message)
+            parts.append(encoded)
+            index += 1
+        return b"[" + b",".join(parts) + b"]"
+
+
+_MESSAGE_CACHE: LRUCache[str, _ConversationMessages] = LRUCache(
+    MAX_CACHED_CONVERSATIONS,
+    MAX_CACHED_CONVERSATION_SIZE,
+    sizeof=lambda converted: converted.size,
+)
+
+
+def conversion_cache_stats() -> dict[str, dict[str, int]]:
+    """Return the counters of the caches of converted requests."""
+    return {
+        "messages": _MESSAGE_CACHE.as_dict(),
+        "tools": _TOOL_CACHE.as_dict(),
+        "structures": _STRUCTURE_CACHE.as_dict(),
+    }
+
+
+def _json_parse_error(err: ValueError) -> HomeAssistantError:
+    """Return the error raised for tool call arguments that are not valid JSON."""
+    return HomeAssistantError(
+        translation_domain=DOMAIN,
+        translation_key="json_parse_error",
+        translation_placeholders={"message": str(err)},
+    )
 
 
 def _decode_tool_arguments(arguments: str) -> Any:
@@ -140,15 +509,11 @@ def _decode_tool_arguments(arguments: str) -> Any:
     try:
         return json.loads(arguments)
     except json.JSONDecodeError as err:
-        raise HomeAssistantError(
-            translation_domain=DOMAIN,
-            translation_key="json_parse_error",
-            translation_placeholders={"message": str(err)},
-        ) from err
+        raise _json_parse_error(err) from err
 
 
 async def _transform_response(
-    message: ChatCompletionMessage,
+    hass: HomeAssistant, message: ChatCompletionMessage
 ) -> AsyncGenerator[conversation.AssistantContentDeltaDict]:
     """Transform the OpenAI API message to a ChatLog format."""
     data: conversation.AssistantContentDeltaDict = {
@@ -160,7 +525,13 @@ async def _transform_response(
             llm.ToolInput(
                 id=tool_call.id,
                 tool_name=tool_call.function.name,
-                tool_args=_decode_tool_arguments(tool_call.function.arguments),
+                tool_args=await async_offload(
+                    hass,
+                    "tool_arguments",
+                    len(tool_call.function.arguments),
+                    _decode_tool_arguments,
+                    tool_call.function.arguments,
+                ),
             )
             for tool_call in message.tool_calls
             if isinstance(tool_call, ChatCompletionMessageFunctionToolCall)
@@ -168,123 +539,591 @@ async def _transform_response(
     yield data
 
 
-def _convert_content_to_param(
-    content: conversation.Content,
-) -> ChatCompletionMessageParam:
-    """Convert any native chat message for this agent to the native format."""
-    if isinstance(content, conversation.ToolResultContent):
-        return ChatCompletionToolMessageParam(
-            role="tool",
-            tool_call_id=content.tool_call_id,
-            content=json.dumps(content.tool_result),
+class _ToolCallDelta(NamedTuple):
+    """A fragment of a streamed tool call."""
+
+    index: int
+    id: str | None
+    name: str | None
+    arguments: str | None
+
+
+class _StreamDelta(NamedTuple):
+    """The parts of a streamed chunk that are used to build the response."""
+
+    role: str | None
+    content: str | None
+    tool_calls: list[_ToolCallDelta] | None
+    finish_reason: str | None
+
+
+async def _chunk_deltas(
+    stream: AsyncStream[ChatCompletionChunk],
+) -> AsyncGenerator[_StreamDelta]:
+    """Return the deltas of a stream of chunks parsed by the OpenAI SDK."""
+    try:
+        async for chunk in stream:
+            LOGGER.debug("Received chunk: %s", chunk)
+            if not chunk.choices:
+                continue
+            choice = chunk.choices[0]
+            delta = choice.delta
+            yield _StreamDelta(
+                delta.role,
+                delta.content,
+                [
+                    _ToolCallDelta(
+                        tool_call.index,
+                        tool_call.id,
+                        tool_call.function.name,
+                        tool_call.function.arguments,
+                    )
+                    for tool_call in delta.tool_calls
+                    if tool_call.function
+                ]
+                if delta.tool_calls
+                else None,
+                choice.finish_reason,
+            )
+    finally:
+        await _async_close_stream(stream)
+
+
+def _parse_sse_data(data: bytes, response: httpx.Response) -> _StreamDelta | None:
+    """Parse the data of a server-sent chunk without building models."""
+    try:
+        chunk = json_loads(data)
+    except ValueError as err:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="api_error",
+            translation_placeholders={"message": f"Malformed streamed chunk: {err}"},
+        ) from err
+    if not isinstance(chunk, dict):
+        return None
+    if error := chunk.get("error"):
+        message = error.get("message") if isinstance(error, dict) else None
+        raise APIError(
+            message=message
+            if isinstance(message, str)
+            else "An error occurred during streaming",
+            request=response.request,
+            body=error,
         )
-    if not isinstance(content, conversation.AssistantContent) or not content.tool_calls:
-        if isinstance(content, conversation.SystemContent):
-            return ChatCompletionSystemMessageParam(
-                role="system",
-                content=content.content or "",
+    if not (choices := chunk.get("choices")):
+        return None
+    choice = choices[0]
+    delta = choice.get("delta") or {}
+    tool_calls = None
+    if raw_tool_calls := delta.get("tool_calls"):
+        tool_calls = []
+        for tool_call in raw_tool_calls:
+            if not (function := tool_call.get("function")):
+                continue
+            tool_calls.append(
+                _ToolCallDelta(
+                    tool_call.get("index", 0),
+                    tool_call.get("id"),
+                    function.get("name"),
+                    function.get("arguments"),
+                )
             )
-        # For other content types (like UserContent) or AssistantContent without tool calls
-        return cast(
-            ChatCompletionMessageParam,
-            {"role": content.role, "content": content.content or ""},
+    return _StreamDelta(
+        delta.get("role"),
+        delta.get("content"),
+        tool_calls,
+        choice.get("finish_reason"),
+    )
+
+
+async def _aiter_response_bytes(response: httpx.Response) -> AsyncGenerator[bytes]:
+    """Return the body of a response, translating transport errors."""
+    try:
+        async for data in response.aiter_bytes():
+            yield data
+    except httpx.TransportError as err:
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="cannot_connect",
+            translation_placeholders={"message": str(err) or type(err).__name__},
+        ) from err
+
+
+async def _sse_deltas(response: httpx.Response) -> AsyncGenerator[_StreamDelta]:
+    """Return the deltas of a raw server-sent event stream.
+
+    Only the `data` fields are used, which is all the chat completions API
+    sends, and each one is decoded straight into a delta. A connection that
+    is lost in the middle of the stream is reported like the SDK reports a
+    connection error.
+    """
+    buffer = b""
+    try:
+        async for data in _aiter_response_bytes(response):
+            lines = (buffer + data).split(b"\n") if buffer else data.split(b"\n")
+            buffer = lines.pop()
+            for line in lines:
+                if not line.startswith(b"data:"):
+                    continue
+                payload = line[5:].strip()
+                if payload == b"[DONE]":
+                    return
+                LOGGER.debug("Received chunk: %s", payload)
+                if (delta := _parse_sse_data(payload, response)) is not None:
+                    yield delta
+    finally:
+        await response.aclose()
+
+
+@dataclass
+class _StreamedToolCall:
+    """A tool call that is being assembled from streamed fragments."""
+
+    id: str | None = None
+    tool_name: str | None = None
+    tool_args: JsonStreamAccumulator = field(default_factory=JsonStreamAccumulator)
+    dispatched: bool = False
+
+    def feed(self, arguments: str) -> None:
+        """Consume a fragment of the tool call arguments."""
+        try:
+            self.tool_args.feed(arguments)
+        except JsonStreamError as err:
+            raise _json_parse_error(err) from err
+
+    async def async_as_tool_input(
+        self, hass: HomeAssistant, tool_name: str
+    ) -> llm.ToolInput:
+        """Return the assembled tool call."""
+        tool_args: Any = {}
+        if self.tool_args:
+            try:
+                tool_args = await async_offload(
+                    hass, "tool_arguments", self.tool_args.length, self.tool_args.value
+                )
+            except ValueError as err:
+                raise _json_parse_error(err) from err
+        return llm.ToolInput(
+            id=self.id or ulid_now(),
+            tool_name=tool_name,
+            tool_args=tool_args,
         )
 
-    # Handle the Assistant content including tool calls.
-    return ChatCompletionAssistantMessageParam(
-        role="assistant",
-        content=content.content,
-        tool_calls=[
-            ChatCompletionMessageToolCallParam(
-                id=tool_call.id,
-                function=Function(
-                    arguments=json.dumps(tool_call.tool_args),
-                    name=tool_call.tool_name,
-                ),
-                type="function",
+
+class _ToolCallAssembler:
+    """Assemble streamed tool calls keyed by their index.
+
+    Models that support parallel tool calls may interleave the fragments of
+    several tool calls, even within a single chunk. A tool call is returned
+    as soon as its arguments are a complete JSON object, so it can be run
+    while the model is still generating the rest of the response. Malformed
+    arguments are reported as soon as the fragment breaking them arrives.
+    """
+
+    def __init__(self, hass: HomeAssistant) -> None:
+        """Initialize the assembler."""
+        self._hass = hass
+        self._tool_calls: dict[int, _StreamedToolCall] = {}
+
+    async def async_add(self, delta_tool_call: _ToolCallDelta) -> llm.ToolInput | None:
+        """Add a streamed tool call fragment, returning the call if complete."""
+        if (tool_call := self._tool_calls.get(delta_tool_call.index)) is None:
+            tool_call = _StreamedToolCall()
+            self._tool_calls[delta_tool_call.index] = tool_call
+        if tool_call.dispatched:
+            return None
+        if delta_tool_call.id:
+            tool_call.id = delta_tool_call.id
+        if delta_tool_call.name:
+            tool_call.tool_name = delta_tool_call.name
+        if delta_tool_call.arguments:
+            tool_call.feed(delta_tool_call.arguments)
+        if tool_call.tool_args.complete and tool_call.id and tool_call.tool_name:
+            tool_call.dispatched = True
+            return await tool_call.async_as_tool_input(self._hass, tool_call.tool_name)
+        return None
+
+    async def async_pop_pending(self) -> list[llm.ToolInput]:
+        """Return the tool calls that were not yet returned, in index order.
+
+        Tool calls that never received a name can't be run and are skipped.
+        """
+        tool_inputs: list[llm.ToolInput] = []
+        for index, tool_call in sorted(self._tool_calls.items()):
+            if tool_call.dispatched:
+                continue
+            if not tool_call.tool_name:
+                LOGGER.warning("Skipping tool call %s without a name", index)
+                continue
+            tool_inputs.append(
+                await tool_call.async_as_tool_input(self._hass, tool_call.tool_name)
             )
-            for tool_call in content.tool_calls
-        ],
-    )
+        self._tool_calls.clear()
+        return tool_inputs
+
+
+# Value of a structured response that was not decoded yet
+_UNSET = object()
+
+
+class StructuredOutputParser:
+    """Parse and validate a structured response while it is streamed.
+
+    Each member of the response object is validated against the structure as
+    soon as its value is complete, so a response that does not match fails
+    without waiting for the rest of the generation. A structure that is not a
+    mapping can't be split into members, and the complete response is
+    validated against it instead.
+    """
+
+    def __init__(self, hass: HomeAssistant, structure: vol.Schema) -> None:
+        """Initialize the parser."""
+        self._hass = hass
+        self._structure = structure
+        self._validators: dict[str, vol.Schema] = {}
+        self._required: set[str] = set()
+        self._validate_members = isinstance(structure.schema, dict)
+        if self._validate_members:
+            for key, validator in structure.schema.items():
+                name = str(key.schema if isinstance(key, vol.Marker) else key)
+                self._validators[name] = vol.Schema(validator)
+                if isinstance(key, vol.Required):
+                    self._required.add(name)
+        self._json = JsonStreamAccumulator()
+        self._value: Any = _UNSET
+        self.partial_data: dict[str, Any] = {}
+
+    @property
+    def complete(self) -> bool:
+        """Return True once the complete response was parsed."""
+        return self._json.complete
+
+    def reset(self) -> None:
+        """Discard the parsed response, for a new model response."""
+        self._json = JsonStreamAccumulator()
+        self._value = _UNSET
+        self.partial_data = {}
+
+    async def async_feed(self, content: str) -> str:
+        """Consume streamed response content.
+
+        Returns the part of the content that belongs to the response, which
+        excludes anything a model emits after the response object is closed.
+        """
+        length = self._json.length
+        try:
+            self._json.feed(content)
+            members = await async_offload(
+                self._hass,
+                "structured_members",
+                self._json.members_length,
+                self._json.pop_members,
+            )
+        except JsonStreamError as err:
+            raise self._error(str(err)) from err
+        for key, value in members:
+            if self._validate_members:
+                self._validate_member(key, value)
+            self.partial_data[key] = value
+            LOGGER.debug("Received structured response field: %s", key)
+        if self.complete:
+            if missing := self._required - self.partial_data.keys():
+                raise self._error(f"required key not provided: {sorted(missing)}")
+            if not self._validate_members:
+                try:
+                    self._structure(await self.async_value())
+                except vol.Invalid as err:
+                    raise self._error(str(err)) from err
+        return content[: self._json.length - length]
+
+    async def async_value(self) -> Any:
+        """Return the parsed response."""
+        if self._value is _UNSET:
+            try:
+                self._value = await async_offload(
+                    self._hass,
+                    "structured_response",
+                    self._json.length,
+                    self._json.value,
+                )
+            except ValueError as err:
+                raise self._error(str(err)) from err
+        return self._value
+
+    def _validate_member(self, key: str, value: Any) -> None:
+        """Validate a completed member of the response object."""
+        if (validator := self._validators.get(key)) is None:
+            if self._structure.extra == vol.PREVENT_EXTRA:
+                raise self._error(f"extra keys not allowed @ data['{key}']")
+            return
+        try:
+            validator(value)
+        except vol.Invalid as err:
+            raise self._error(f"{err} @ data['{key}']") from err
+
+    def _error(self, message: str) -> HomeAssistantError:
+        """Return the error for a response that does not match the structure."""
+        LOGGER.debug("Structured response failed, partial data: %s", self.partial_data)
+        return HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="structured_output_error",
+            translation_placeholders={"message": message},
+        )
+
+
+async def _async_close_stream(stream: AsyncIterable[Any] | httpx.Response) -> None:
+    """Close a response stream, releasing its connection."""
+    if isinstance(stream, AsyncStream):
+        await stream.close()
+    elif isinstance(stream, (httpx.Response, AsyncGenerator)):
+        await stream.aclose()
+
+
+@dataclass
+class StreamStats:
+    """Counters of the response streams opened to the server.
+
+    Closing a stream before the server has sent all of it drops the
+    connection, which aborts the generation on the server. Streams that are
+    open without a request in progress have leaked.
+    """
+
+    opened: int = 0
+    completed: int = 0
+    cancelled: int = 0
+    failed: int = 0
+    closed: int = 0
+
+    @property
+    def open(self) -> int:
+        """Return the number of streams that are not closed yet."""
+        return self.opened - self.closed
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters for diagnostics."""
+        return asdict(self) | {"open": self.open}
+
+
+_STREAM_STATS: HassKey[StreamStats] = HassKey(f"{DOMAIN}_stream_stats")
+
+
+@callback
+def async_get_stream_stats(hass: HomeAssistant) -> StreamStats:
+    """Return the counters of the streams of all entries."""
+    if (stats := hass.data.get(_STREAM_STATS)) is None:
+        stats = hass.data[_STREAM_STATS] = StreamStats()
+    return stats
+
+
+@asynccontextmanager
+async def _async_own_stream(
+    hass: HomeAssistant, stream: AsyncIterable[Any] | httpx.Response
+) -> AsyncIterator[None]:
+    """Close a response stream when the block exits, however it exits.
+
+    Generators reading the stream are not enough on their own, as they only
+    run their cleanup once they have been started.
+    """
+    stats = async_get_stream_stats(hass)
+    stats.opened += 1
+    try:
+        yield
+    except asyncio.CancelledError:
+        LOGGER.debug("Request was cancelled, aborting the response stream")
+        stats.cancelled += 1
+        raise
+    except Exception:
+        stats.failed += 1
+        raise
+    else:
+        stats.completed += 1
+    finally:
+        try:
+            await _async_close_stream(stream)
+        finally:
+            stats.closed += 1
+
+
+async def _exit_when_read[T](
+    stack: ExitStack, stream: AsyncGenerator[T]
+) -> AsyncGenerator[T]:
+    """Return the items of a stream, closing the exit stack once it was read.
+
+    The consumer stops reading as soon as the response is complete, so the
+    stream being closed early counts as it being read. Errors of the stream
+    are left to the exit stack.
+    """
+    async with aclosing(stream):
+        try:
+            async for item in stream:
+                yield item
+        except GeneratorExit:
+            stack.close()
+            raise
+        else:
+            stack.close()
 
 
 async def _transform_stream(
-    result: AsyncStream[ChatCompletionChunk],
+    hass: HomeAssistant,
+    deltas: AsyncGenerator[_StreamDelta],
+    structured_output: StructuredOutputParser | None = None,
 ) -> AsyncGenerator[conversation.AssistantContentDeltaDict]:
-    """Transform an OpenAI delta stream into HA format."""
-    current_tool_call: dict[str, Any] | None = None
-    yielded_role = False
+    """Transform an OpenAI delta stream into HA format.
 
-    async for chunk in result:
-        LOGGER.debug("Received chunk: %s", chunk)
-        if not chunk.choices:
-            continue
-        choice = chunk.choices[0]
-
-        if choice.finish_reason:
-            if current_tool_call:
-                yield {
-                    "tool_calls": [
-                        llm.ToolInput(
-                            id=current_tool_call["id"],
-                            tool_name=current_tool_call["tool_name"],
-                            tool_args=_decode_tool_arguments(
-                                current_tool_call["tool_args"]
-                            )
-                            if current_tool_call["tool_args"]
-                            else {},
-                        )
-                    ]
-                }
-            break
-
-        delta = choice.delta
+    A structured response is fed to the structured output parser, and the
+    stream is closed as soon as the response object is complete. Some models
+    keep generating whitespace or text after it, which is discarded.
+    """
+    tool_calls = _ToolCallAssembler(hass)
+    yielded_role = False
+    if structured_output is not None:
+        structured_output.reset()
 
-        # We can yield delta messages not continuing or starting tool calls
-        if current_tool_call is None and not delta.tool_calls:
+    try:
+        async for delta in deltas:
             yield_dict: conversation.AssistantContentDeltaDict = {}
             if not yielded_role and delta.role == "assistant":
                 yield_dict["role"] = "assistant"
                 yielded_role = True
-            if delta.content is not None:
-                yield_dict["content"] = delta.content
+            if (content := delta.content) and structured_output is not None:
+                content = await structured_output.async_feed(content)
+            if content:
+                yield_dict["content"] = content
             if yield_dict:
                 yield yield_dict
-            continue
 
-        # When doing tool calls, we should always have a tool call
-        # object or we have gotten stopped above with a finish_reason set.
-        if (
-            not delta.tool_calls
-            or not (delta_tool_call := delta.tool_calls[0])
-            or not delta_tool_call.function
-        ):
-            continue
-
-        if current_tool_call and delta_tool_call.index == current_tool_call["index"]:
-            current_tool_call["tool_args"] += delta_tool_call.function.arguments or ""
-            continue
-
-        # We got tool call with new index, so we need to yield the previous
-        if current_tool_call:
-            yield {
-                "tool_calls": [
-                    llm.ToolInput(
-                        id=current_tool_call["id"],
-                        tool_name=current_tool_call["tool_name"],
-                        tool_args=_decode_tool_arguments(
-                            current_tool_call["tool_args"]
-                        ),
-                    )
+            if delta.tool_calls and (
+                completed := [
+                    tool_input
+                    for delta_tool_call in delta.tool_calls
+                    if (tool_input := await tool_calls.async_add(delta_tool_call))
                 ]
-            }
+            ):
+                yield {"tool_calls": completed}
 
-        current_tool_call = {
-            "index": delta_tool_call.index,
-            "id": delta_tool_call.id,
-            "tool_name": delta_tool_call.function.name,
-            "tool_args": delta_tool_call.function.arguments or "",
-        }
+            if delta.finish_reason:
+                break
+
+            if structured_output is not None and structured_output.complete:
+                LOGGER.debug("Structured response is complete, closing the stream")
+                break
+    finally:
+        # Release the connection rather than reading the rest of the response,
+        # also when the consumer stops early or is cancelled
+        await deltas.aclose()
+
+    if pending := await tool_calls.async_pop_pending():
+        yield {"tool_calls": pending}
+
+
+async def _coalesce_deltas(
+    stream: AsyncGenerator[conversation.AssistantContentDeltaDict],
+    max_size: int = STREAM_COALESCE_MAX_SIZE,
+    max_delay: float = STREAM_COALESCE_MAX_DELAY,
+) -> AsyncGenerator[conversation.AssistantContentDeltaDict]:
+    """Merge consecutive content deltas of a stream.
+
+    Content is held back until it reaches the max size or the oldest held back
+    delta reaches the max delay, so that each token doesn't cause its own chat
+    log update. Any other delta is passed through immediately, after the
+    content that was held back before it.
+    """
+    loop = asyncio.get_running_loop()
+    held: conversation.AssistantContentDeltaDict = {}
+    parts: list[str] = []
+    size = 0
+    deadline = 0.0
+    next_delta: asyncio.Future[conversation.AssistantContentDeltaDict] | None = None
+
+    def flush() -> conversation.AssistantContentDeltaDict:
+        """Return the held back deltas merged into one."""
+        nonlocal held, size
+        delta = held
+        if parts:
+            delta["content"] = "".join(parts)
+            parts.clear()
+        held = {}
+        size = 0
+        return delta
+
+    try:
+        while True:
+            try:
+                if next_delta is None and not held and not parts:
+                    delta = await anext(stream)
+                else:
+                    # The pending delta is kept for the next iteration when the
+                    # held back content is due, rather than cancelled
+                    if next_delta is None:
+                        next_delta = asyncio.ensure_future(anext(stream))
+                    done, _ = await asyncio.wait(
+                        (next_delta,),
+                        timeout=deadline - loop.time() if held or parts else None,
+                    )
+                    if not done:
+                        yield flush()
+                        continue
+                    delta = next_delta.result()
+                    next_delta = None
+            except StopAsyncIteration:
+                break
+            except Exception:
+                next_delta = None
+                if held or parts:
+                    yield flush()
+                raise
+
+            if delta.keys() - {"role", "content"}:
+                if held or parts:
+                    yield flush()
+                yield delta
+                continue
+            if "role" in delta and (held or parts):
+                # A new message can't be merged with the previous one
+                yield flush()
+            if not held and not parts:
+                deadline = loop.time() + max_delay
+            if "role" in delta:
+                held["role"] = delta["role"]
+            if content := delta.get("content"):
+                parts.append(content)
+                size += len(content)
+            if size >= max_size:
+                yield flush()
+
+        if held or parts:
+            yield flush()
+    finally:
+        if next_delta is not None:
+            next_delta.cancel()
+            await asyncio.wait((next_delta,))
+            if not next_delta.cancelled():
+                # Retrieve the result so a late error isn't logged as unhandled
+                next_delta.exception()
+        await stream.aclose()
+
+
+def _attachment_options(options: Mapping[str, Any]) -> AttachmentOptions:
+    """Return the attachment encoding settings of a subentry."""
+    return AttachmentOptions(
+        image_max_size=int(
+            options.get(CONF_IMAGE_MAX_SIZE, RECOMMENDED_IMAGE_MAX_SIZE)
+        ),
+        image_quality=int(options.get(CONF_IMAGE_QUALITY, RECOMMENDED_IMAGE_QUALITY)),
+        image_format=options.get(CONF_IMAGE_FORMAT, RECOMMENDED_IMAGE_FORMAT),
+        pdf_max_pages=int(options.get(CONF_PDF_MAX_PAGES, RECOMMENDED_PDF_MAX_PAGES)),
+        pdf_max_chars=int(options.get(CONF_PDF_MAX_CHARS, RECOMMENDED_PDF_MAX_CHARS)),
+        pdf_render_pages=int(
+            options.get(CONF_PDF_RENDER_PAGES, RECOMMENDED_PDF_RENDER_PAGES)
+        ),
+        video_max_frames=int(
+            options.get(CONF_VIDEO_MAX_FRAMES, RECOMMENDED_VIDEO_MAX_FRAMES)
+        ),
+        video_frame_selection=options.get(
+            CONF_VIDEO_FRAME_SELECTION, RECOMMENDED_VIDEO_FRAME_SELECTION
+        ),
+    )
 
 
 class CustomOpenAIBaseLLMEntity(Entity):
@@ -305,163 +1144,218 @@ class CustomOpenAIBaseLLMEntity(Entity):
             model=subentry.data.get(CONF_CHAT_MODEL, RECOMMENDED_CHAT_MODEL),
             entry_type=dr.DeviceEntryType.SERVICE,
         )
+        self._attachment_uploader: AttachmentUploader | None = None
+
+    async def async_will_remove_from_hass(self) -> None:
+        """When entity will be removed from Home Assistant."""
+        if self._attachment_uploader is not None:
+            await self._attachment_uploader.async_clear()
+        await super().async_will_remove_from_hass()
 
     async def _async_handle_chat_log(
         self,
         chat_log: conversation.ChatLog,
         structure_name: str | None = None,
         structure: vol.Schema | None = None,
+        structured_output: StructuredOutputParser | None = None,
     ) -> None:
-        """Generate an answer for the chat log."""
+        """Generate an answer for the chat log.
+
+        When streaming, a structured response is fed to the structured output
+        parser as it arrives.
+        """
         options = self.subentry.data
 
         tools: list[ChatCompletionFunctionToolParam] | None = None
         if chat_log.llm_api:
-            tools = [
-                _format_tool(tool, chat_log.llm_api.custom_serializer)
-                for tool in chat_log.llm_api.tools
-            ]
+            tools = await _async_format_tools(self.hass, chat_log.llm_api)
 
         model = options.get(CONF_CHAT_MODEL, RECOMMENDED_CHAT_MODEL)
-        messages = [
-            m
-            for content in chat_log.content
-            if (m := _convert_content_to_chat_message(content))
-        ]
+        if (history := _MESSAGE_CACHE.get(chat_log.conversation_id)) is None:
+            history = _ConversationMessages()
+        messages = await history.async_sync(self.hass, chat_log.content)
 
         response_format: ResponseFormatJSONSchema | Omit = Omit()
         if structure and structure_name:
-            response_format = _format_structured_output(
-                structure_name, structure, chat_log.llm_api
+            response_format = await _async_format_structured_output(
+                self.hass, structure_name, structure, chat_log.llm_api
             )
 
+        client: AsyncOpenAI = self.entry.runtime_data
+
         # Handle attachments by adding them to the last user message
         last_content = chat_log.content[-1]
         if (
             isinstance(last_content, conversation.UserContent)
             and last_content.attachments
         ):
-            files = await async_prepare_files_for_prompt(
-                self.hass,
-                [a.path for a in last_content.attachments],
-            )
+            paths = [a.path for a in last_content.attachments]
+            if options.get(CONF_UPLOAD_ATTACHMENTS, RECOMMENDED_UPLOAD_ATTACHMENTS):
+                # Files are uploaded once and referenced by id, so they are
+                # not sent again with every iteration of the tool loop
+                if self._attachment_uploader is None:
+                    self._attachment_uploader = AttachmentUploader(self.hass, client)
+                files = await self._attachment_uploader.async_prepare_files(
+                    paths, _attachment_options(options)
+                )
+            else:
+                files = await async_prepare_files_for_prompt(
+                    self.hass, paths, _attachment_options(options)
+                )
             # Find the last user message and convert it to multipart content
             for i in range(len(messages) - 1, -1, -1):
                 if messages[i]["role"] == "user":
                     user_msg = cast(ChatCompletionUserMessageParam, messages[i])
                     current_content = user_msg.get("content")
                     if isinstance(current_content, str):
-                        # Convert string content to list with text and files
-                        user_msg["content"] = [
-                            ChatCompletionContentPartTextParam(
-                                type="text", text=current_content
-                            ),
-                            *files,
-                        ]
+                        # Convert string content to list with text and files,
+                        # replacing the message as it is shared with the cache
+                        messages[i] = ChatCompletionUserMessageParam(
+                            role="user",
+                            content=[
+                                ChatCompletionContentPartTextParam(
+                                    type="text", text=current_content
+                                ),
+                                *files,
+                            ],
+                        )
                     break
 
-        client: AsyncOpenAI = self.entry.runtime_data
         streaming = bool(
             self.entry.data.get(CONF_STREAMING, options.get(CONF_STREAMING, False))
         )
 
-        for _iteration in range(MAX_TOOL_ITERATIONS):
-            with api_error_handler():
-                result = await client.chat.completions.create(
-                    model=model,
-                    messages=messages,
-                    tools=tools or Omit(),
-                    response_format=response_format,
-                    max_tokens=cast(
-                        int, options.get(CONF_MAX_TOKENS, RECOMMENDED_MAX_TOKENS)
-                    ),
-                    top_p=cast(float, options.get(CONF_TOP_P, RECOMMENDED_TOP_P)),
-                    temperature=cast(
-                        float, options.get(CONF_TEMPERATURE, RECOMMENDED_TEMPERATURE)
-                    ),
-                    user=chat_log.conversation_id,
-                    stream=cast(Any, streaming),
-                )
-
-            convert_message: Callable[[Any], Any]
-            async_generator: AsyncGenerator[conversation.AssistantContentDeltaDict]
-            if streaming:
-                convert_message = _convert_content_to_param
-                async_generator = _transform_stream(
-                    cast(AsyncStream[ChatCompletionChunk], result)
-                )
-            else:
-                convert_message = _convert_content_to_chat_message
-                async_generator = _transform_response(
-                    cast(ChatCompletion, result).choices[0].message
-                )
+        # Only send the parameter when enabled as not all servers support it
+        parallel_tool_calls: bool | Omit = Omit()
+        if tools and options.get(
+            CONF_PARALLEL_TOOL_CALLS, RECOMMENDED_PARALLEL_TOOL_CALLS
+        ):
+            parallel_tool_calls = True
 
-            messages.extend(
-                [
-                    msg
-                    async for content in chat_log.async_add_delta_content_stream(
-                        self.entity_id, async_generator
-                    )
-                    if (msg := convert_message(content))
-                ]
+        params: dict[str, Any] = {
+            "model": model,
+            "tools": tools or Omit(),
+            "parallel_tool_calls": parallel_tool_calls,
+            "response_format": response_format,
+            "max_tokens": cast(
+                int, options.get(CONF_MAX_TOKENS, RECOMMENDED_MAX_TOKENS)
+            ),
+            "top_p": cast(float, options.get(CONF_TOP_P, RECOMMENDED_TOP_P)),
+            "temperature": cast(
+                float, options.get(CONF_TEMPERATURE, RECOMMENDED_TEMPERATURE)
+            ),
+            "user": chat_log.conversation_id,
+        }
+        raw_streaming = streaming and options.get(
+            CONF_RAW_STREAMING, RECOMMENDED_RAW_STREAMING
+        )
+        if raw_streaming:
+            # The request is sent as bytes, so everything except the messages
+            # is serialized once for all iterations of the tool loop
+            encoded_params = json_bytes(
+                {
+                    key: value
+                    for key, value in params.items()
+                    if not isinstance(value, Omit)
+                }
+                | {"stream": True}
             )
 
-            if not chat_log.unresponded_tool_results:
-                break
-
-
-async def async_prepare_files_for_prompt(
-    hass: HomeAssistant, files: list[Path]
-) -> list[ChatCompletionContentPartParam]:
-    """Prepare files for OpenAI-compatible API.
-
-    Caller needs to ensure that the files are allowed.
-    """
-
-    def guess_file_type(file_path: Path) -> tuple[str | None, str | None]:
-        """Guess the file type based on the file extension."""
-        return mimetypes.guess_type(str(file_path))
-
-    def append_files_to_content() -> list[ChatCompletionContentPartParam]:
-        content: list[ChatCompletionContentPartParam] = []
-
-        for file_path in files:
-            if not file_path.exists():
-                raise HomeAssistantError(
-                    translation_domain=DOMAIN,
-                    translation_key="file_not_found",
-                    translation_placeholders={"file_path": str(file_path)},
-                )
-
-            mime_type, _ = guess_file_type(file_path)
+        timeouts = RequestTimeouts.from_options(options)
+        max_retries = int(options.get(CONF_MAX_RETRIES, RECOMMENDED_MAX_RETRIES))
+        # Requests are retried here, where it is known whether the response
+        # has started, instead of by the SDK
+        completions_client = client.with_options(max_retries=0)
+        # Replicas that fail are ejected by the load balancer instead, so that
+        # one replica that is down doesn't fail the requests to the others
+        breaker = (
+            None
+            if self.entry.options.get(CONF_REPLICAS)
+            else async_get_circuit_breaker(self.hass, self.entry.data[CONF_BASE_URL])
+        )
+        for _iteration in range(MAX_TOOL_ITERATIONS):
+            async with AsyncExitStack() as stack:
+                deltas: AsyncGenerator[_StreamDelta] | None = None
+                deadlines = RequestDeadlines(timeouts)
+                stack.enter_context(api_error_handler())
+                # Failures while the response is read count for the breaker too,
+                # so a server that dies in the middle of a response opens it.
+                # The guard is closed once the response was read, before the
+                # tools are run, which say nothing about the server.
+                guard = stack.enter_context(ExitStack())
+                if breaker is not None:
+                    guard.enter_context(breaker.guard())
+                if raw_streaming:
+                    # Read the response as it is sent instead of letting the
+                    # SDK build models for every chunk
+                    async with deadlines.async_phase(PHASE_FIRST_TOKEN):
+                        response = await async_retry_request(
+                            max_retries,
+                            completions_client.post,
+                            "/chat/completions",
+                            cast_to=httpx.Response,
+                            content=b'{"messages":'
+                            + history.encode(messages)
+                            + b","
+                            + encoded_params[1:],
+                            options={"timeout": timeouts.http_timeout},
+                            stream=True,
+                        )
+                    await stack.enter_async_context(
+                        _async_own_stream(self.hass, response)
+                    )
+                    deltas = _exit_when_read(
+                        guard, deadlines.async_stream(_sse_deltas(response))
+                    )
+                else:
+                    async with deadlines.async_phase(
+                        PHASE_FIRST_TOKEN if streaming else PHASE_TOTAL
+                    ):
+                        result = await async_retry_request(
+                            max_retries,
+                            completions_client.chat.completions.create,
+                            messages=messages,
+                            stream=cast(Any, streaming),
+                            timeout=timeouts.http_timeout,
+                            **params,
+                        )
+                    if streaming:
+                        stream = cast(AsyncStream[ChatCompletionChunk], result)
+                        await stack.enter_async_context(
+                            _async_own_stream(self.hass, stream)
+                        )
+                        deltas = _exit_when_read(
+                            guard, deadlines.async_stream(_chunk_deltas(stream))
+                        )
+                    else:
+                        guard.close()
 
-            if not mime_type or not mime_type.startswith(("image/", "application/pdf")):
-                raise HomeAssistantError(
-                    translation_domain=DOMAIN,
-                    translation_key="unsupported_file_type",
-                    translation_placeholders={"file_path": str(file_path)},
-                )
+                async_generator: AsyncGenerator[conversation.AssistantContentDeltaDict]
+                if deltas is not None:
+                    async_generator = _coalesce_deltas(
+                        _transform_stream(self.hass, deltas, structured_output)
+                    )
+                else:
+                    async_generator = _transform_response(
+                        self.hass, cast(ChatCompletion, result).choices[0].message
+                    )
 
-            base64_file = base64.b64encode(file_path.read_bytes()).decode("utf-8")
-
-            if mime_type.startswith("image/"):
-                content.append(
-                    {
-                        "type": "image_url",
-                        "image_url": {
-                            "url": f"data:{mime_type};base64,{base64_file}",
-                            "detail": "auto",
-                        },
-                    }
+                # Close the generators before the stream, rather than leaving
+                # it to the event loop when the request is cancelled
+                async_generator = await stack.enter_async_context(
+                    aclosing(async_generator)
                 )
-            elif mime_type.startswith("application/pdf"):
-                content.append(
-                    {
-                        "type": "text",
-                        "text": f"[File: {file_path.name}]\nContent: {base64_file}",
-                    }
+                messages.extend(
+                    [
+                        msg
+                        async for content in chat_log.async_add_delta_content_stream(
+                            self.entity_id, async_generator
+                        )
+                        if (msg := await history.async_append(self.hass, content))
+                    ]
                 )
+            # Store again so the cache accounts for the new messages
+            _MESSAGE_CACHE.put(chat_log.conversation_id, history)
 
-        return content
-
-    return await hass.async_add_executor_job(append_files_to_content)
+            if not chat_log.unresponded_tool_results:
+                break
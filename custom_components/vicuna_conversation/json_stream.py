@@ -0,0 +1,262 @@
+"""Incremental parsing of JSON documents that are streamed in fragments."""
+
+from __future__ import annotations
+
+import json
+import re
+from typing import Any
+
+# Runs of whitespace between tokens
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+# Characters that can continue a number or a literal
+_SCALAR_CHARS = re.compile(r"[0-9A-Za-z.+\-]+")
+# Characters that need handling inside a string
+_STRING_SPECIAL = re.compile(r'["\\\x00-\x1f]')
+_HEX_DIGITS = re.compile(r"[0-9a-fA-F]+")
+_NUMBER = re.compile(r"-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?")
+_LITERALS = ("true", "false", "null")
+_ESCAPES = frozenset('"\\/bfnrtu')
+
+# Tokenizer states outside of strings
+_VALUE = 0
+_VALUE_OR_END = 1
+_KEY = 2
+_KEY_OR_END = 3
+_COLON = 4
+_AFTER_VALUE = 5
+_DONE = 6
+
+
+class JsonStreamError(ValueError):
+    """Error raised when a streamed JSON document is malformed."""
+
+    def __init__(self, msg: str, pos: int) -> None:
+        """Initialize the error."""
+        super().__init__(f"{msg}: char {pos}")
+        self.msg = msg
+        self.pos = pos
+
+
+class JsonStreamAccumulator:
+    """Accumulate a streamed JSON document and validate it as it arrives.
+
+    Each fragment is tokenized once when it is fed, so a malformed document
+    is reported at the fragment that breaks it and completion is known as
+    soon as the root value is closed. Fragments are kept in a list and only
+    joined when a value is decoded.
+
+    When the root value is an object, its members are tracked as well so that
+    each one can be decoded as soon as its value is complete. Anything after
+    the root value, such as trailing text from a model, is not part of the
+    document and is ignored.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the accumulator."""
+        self._parts: list[str] = []
+        self._offset = 0
+        self._state = _VALUE
+        self._stack: list[str] = []
+        self._in_string = False
+        self._is_key = False
+        self._escaped = False
+        self._unicode_remaining = 0
+        self._scalar = ""
+        self._scalar_pos = 0
+        self._string_pos = 0
+        self._key_span: tuple[int, int] | None = None
+        self._member_start: int | None = None
+        self._members: list[tuple[int, int, int, int]] = []
+
+    def __bool__(self) -> bool:
+        """Return True if any non-empty fragment was fed."""
+        return self._offset > 0
+
+    @property
+    def complete(self) -> bool:
+        """Return True once the root value is complete."""
+        return self._state == _DONE
+
+    @property
+    def length(self) -> int:
+        """Return the number of characters consumed as part of the document."""
+        return self._offset
+
+    @property
+    def members_length(self) -> int:
+        """Return the number of characters of the members that weren't popped."""
+        return sum(end - key_start for key_start, _, _, end in self._members)
+
+    @property
+    def text(self) -> str:
+        """Return the accumulated document."""
+        if len(self._parts) > 1:
+            self._parts = ["".join(self._parts)]
+        return self._parts[0] if self._parts else ""
+
+    def feed(self, fragment: str) -> bool:
+        """Consume a fragment and return True once the root value is complete.
+
+        Raises JsonStreamError as soon as the document can no longer be valid.
+        """
+        if not fragment or self.complete:
+            return self.complete
+        pos = 0
+        end = len(fragment)
+        while pos < end and self._state != _DONE:
+            if self._in_string:
+                pos = self._scan_string(fragment, pos)
+                continue
+            if self._scalar:
+                if match := _SCALAR_CHARS.match(fragment, pos):
+                    self._scalar += match.group()
+                    pos = match.end()
+                    self._check_scalar_prefix()
+                    if pos == end:
+                        # The number or literal may continue in the next fragment
+                        break
+                # The terminating character is consumed on the next iteration
+                self._end_scalar()
+                continue
+            pos = _WHITESPACE.match(fragment, pos).end()  # type: ignore[union-attr]
+            if pos == end:
+                break
+            self._consume(fragment[pos], self._offset + pos)
+            pos += 1
+        self._parts.append(fragment[:pos] if pos < end else fragment)
+        self._offset += pos
+        return self.complete
+
+    def pop_members(self) -> list[tuple[str, Any]]:
+        """Return the decoded root object members completed since the last call."""
+        if not self._members:
+            return []
+        text = self.text
+        members = [
+            (json.loads(text[key_start:key_end]), json.loads(text[start:end]))
+            for key_start, key_end, start, end in self._members
+        ]
+        self._members.clear()
+        return members
+
+    def value(self) -> Any:
+        """Return the decoded value of the complete document."""
+        if self._scalar:
+            self._end_scalar()
+        if not self.complete:
+            raise JsonStreamError("Unterminated JSON document", self._offset)
+        return json.loads(self.text)
+
+    def _consume(self, char: str, pos: int) -> None:
+        """Consume a structural character outside of a string."""
+        state = self._state
+        if state in (_VALUE, _VALUE_OR_END):
+            if state == _VALUE and self._stack == ["}"]:
+                self._member_start = pos
+            if char == "{":
+                self._stack.append("}")
+                self._state = _KEY_OR_END
+            elif char == "[":
+                self._stack.append("]")
+                self._state = _VALUE_OR_END
+            elif char == '"':
+                self._in_string = True
+                self._is_key = False
+                self._string_pos = pos
+            elif char in "-0123456789tfn":
+                self._scalar = char
+                self._scalar_pos = pos
+                self._check_scalar_prefix()
+            elif char == "]" and state == _VALUE_OR_END:
+                self._close(pos + 1)
+            else:
+                raise JsonStreamError("Expecting value", pos)
+        elif state in (_KEY, _KEY_OR_END):
+            if char == '"':
+                self._in_string = True
+                self._is_key = True
+                self._string_pos = pos
+            elif char == "}" and state == _KEY_OR_END:
+                self._close(pos + 1)
+            else:
+                raise JsonStreamError(
+                    "Expecting property name enclosed in double quotes", pos
+                )
+        elif state == _COLON:
+            if char != ":":
+                raise JsonStreamError("Expecting ':' delimiter", pos)
+            self._state = _VALUE
+        elif state == _AFTER_VALUE:
+            if char == ",":
+                self._state = _KEY if self._stack[-1] == "}" else _VALUE
+            elif char == self._stack[-1]:
+                self._close(pos + 1)
+            else:
+                raise JsonStreamError("Expecting ',' delimiter", pos)
+
+    def _scan_string(self, fragment: str, pos: int) -> int:
+        """Scan the inside of a string and return the next position."""
+        if self._unicode_remaining:
+            match = _HEX_DIGITS.match(fragment, pos, pos + self._unicode_remaining)
+            if match is None:
+                raise JsonStreamError("Invalid \\uXXXX escape", self._offset + pos)
+            self._unicode_remaining -= len(match.group())
+            return match.end()
+        if self._escaped:
+            char = fragment[pos]
+            if char not in _ESCAPES:
+                raise JsonStreamError("Invalid \\escape", self._offset + pos)
+            if char == "u":
+                self._unicode_remaining = 4
+            self._escaped = False
+            return pos + 1
+        if (match := _STRING_SPECIAL.search(fragment, pos)) is None:
+            return len(fragment)
+        char = match.group()
+        if char == "\\":
+            self._escaped = True
+        elif char == '"':
+            self._in_string = False
+            end = self._offset + match.end()
+            if self._is_key:
+                self._state = _COLON
+                if self._stack == ["}"]:
+                    self._key_span = (self._string_pos, end)
+            else:
+                self._end_value(end)
+        else:
+            raise JsonStreamError(
+                "Invalid control character", self._offset + match.start()
+            )
+        return match.end()
+
+    def _check_scalar_prefix(self) -> None:
+        """Raise if the literal being read can't become a valid literal."""
+        if self._scalar[0] in "tfn" and not any(
+            literal.startswith(self._scalar) for literal in _LITERALS
+        ):
+            raise JsonStreamError("Expecting value", self._scalar_pos)
+
+    def _end_scalar(self) -> None:
+        """Validate a number or literal that was terminated."""
+        scalar = self._scalar
+        self._scalar = ""
+        if scalar not in _LITERALS and not _NUMBER.fullmatch(scalar):
+            raise JsonStreamError("Expecting value", self._scalar_pos)
+        self._end_value(self._scalar_pos + len(scalar))
+
+    def _close(self, end: int) -> None:
+        """Close the innermost object or array."""
+        self._stack.pop()
+        self._end_value(end)
+
+    def _end_value(self, end: int) -> None:
+        """Update the state after a value ending at the offset was completed."""
+        self._state = _AFTER_VALUE if self._stack else _DONE
+        if (
+            self._member_start is not None
+            and self._key_span is not None
+            and self._stack == ["}"]
+        ):
+            self._members.append((*self._key_span, self._member_start, end))
+            self._member_start = None
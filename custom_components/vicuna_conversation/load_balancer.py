@@ -0,0 +1,242 @@
+"""Balancing of requests across the replicas of a server."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import AsyncIterator, Callable
+from dataclasses import dataclass
+from typing import cast
+
+import httpx
+import openai
+from homeassistant.core import HomeAssistant, callback
+
+from .const import DOMAIN
+
+_LOGGER = logging.getLogger(__name__)
+
+# Weight of the latest response in the moving average of the latency
+_EWMA_WEIGHT = 0.3
+# Consecutive failures that eject a replica, and seconds until it is
+# admitted again if a probe hasn't done so earlier
+_EJECT_FAILURES = 3
+_EJECT_TIME = 60.0
+# Seconds between the health probes of all replicas, and until a probe fails
+PROBE_INTERVAL = 30.0
+PROBE_TIMEOUT = 10.0
+
+# Path of the Files API, relative to the base URL
+_FILES_PATH = "/files"
+
+
+@dataclass(eq=False)
+class Replica:
+    """A replica of the server that requests are balanced across.
+
+    The client is only used for health probes, and sends them through the
+    transport of the replica without retries and with the probe timeout.
+    """
+
+    base_url: str
+    transport: httpx.AsyncBaseTransport
+    client: openai.AsyncOpenAI
+    outstanding: int = 0
+    latency: float = 0.0
+    failures: int = 0
+    ejected_until: float = 0.0
+
+    def record_latency(self, seconds: float) -> None:
+        """Add the time until a response to the moving average."""
+        if self.latency:
+            self.latency += _EWMA_WEIGHT * (seconds - self.latency)
+        else:
+            self.latency = seconds
+
+
+class _ReplicaStream(httpx.AsyncByteStream):
+    """The body of a response, which releases its replica once closed."""
+
+    def __init__(
+        self, stream: httpx.AsyncByteStream, release: Callable[[], None]
+    ) -> None:
+        """Initialize the stream."""
+        self._stream = stream
+        self._release: Callable[[], None] | None = release
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Iterate over the body."""
+        async for chunk in self._stream:
+            yield chunk
+
+    async def aclose(self) -> None:
+        """Close the body and release the replica."""
+        try:
+            await self._stream.aclose()
+        finally:
+            if self._release is not None:
+                self._release()
+                self._release = None
+
+
+class LoadBalancingTransport(httpx.AsyncBaseTransport):
+    """Send each request to one of the replicas of a server.
+
+    Requests go to the replica with the least outstanding requests, or with
+    the lowest moving average of the latency weighted by its outstanding
+    requests, picking at random among equal ones. A replica is ejected after
+    consecutive connection errors or server errors, and admitted again when
+    a health probe succeeds or the ejection expires. When all replicas are
+    ejected, requests go to the one that is admitted again first.
+
+    Uploaded files only exist on the replica that received them, so requests
+    to the Files API and requests that reference uploaded files always go to
+    the first replica.
+    """
+
+    def __init__(self, base_url: str, replicas: list[Replica], mode: str) -> None:
+        """Initialize the transport.
+
+        Requests are made to the base URL by the client and are rewritten to
+        the base URL of the replica.
+        """
+        self._base_url = base_url.rstrip("/")
+        self._replicas = replicas
+        self._mode = mode
+        self._probes: asyncio.Task[None] | None = None
+
+    @property
+    def replicas(self) -> list[Replica]:
+        """Return the replicas."""
+        return self._replicas
+
+    def _load(self, replica: Replica) -> float:
+        """Return the load of a replica, lower is better."""
+        if self._mode == "ewma":
+            return replica.latency * (replica.outstanding + 1)
+        return replica.outstanding
+
+    def _is_pinned(self, request: httpx.Request, path: str) -> bool:
+        """Return True if a request must go to the first replica."""
+        if path == _FILES_PATH or path.startswith(f"{_FILES_PATH}/"):
+            return True
+        try:
+            return b'"file_id"' in request.content
+        except httpx.RequestNotRead:
+            return False
+
+    def _select(self) -> Replica:
+        """Return the replica to send the next request to."""
+        now = time.monotonic()
+        if not (
+            candidates := [
+                replica for replica in self._replicas if replica.ejected_until <= now
+            ]
+        ):
+            return min(self._replicas, key=lambda replica: replica.ejected_until)
+        best = min(self._load(replica) for replica in candidates)
+        return random.choice(
+            [replica for replica in candidates if self._load(replica) == best]
+        )
+
+    def _eject(self, replica: Replica) -> None:
+        """Stop sending requests to a replica for a while."""
+        if replica.ejected_until <= time.monotonic():
+            _LOGGER.warning(
+                "Replica %s is failing, not sending it requests for %s seconds",
+                replica.base_url,
+                _EJECT_TIME,
+            )
+        replica.ejected_until = time.monotonic() + _EJECT_TIME
+
+    def _record_failure(self, replica: Replica) -> None:
+        """Count a failure, ejecting the replica if there are too many."""
+        replica.failures += 1
+        if replica.failures >= _EJECT_FAILURES:
+            self._eject(replica)
+
+    def _record_success(self, replica: Replica) -> None:
+        """Admit a replica again after it answered."""
+        if replica.ejected_until:
+            _LOGGER.info("Replica %s has recovered", replica.base_url)
+        replica.failures = 0
+        replica.ejected_until = 0.0
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        """Send a request to a replica."""
+        url = str(request.url)
+        path = url[len(self._base_url) :] if url.startswith(self._base_url) else None
+        if path is not None and self._is_pinned(request, path.partition("?")[0]):
+            replica = self._replicas[0]
+        else:
+            replica = self._select()
+        if path is not None and replica.base_url != self._base_url:
+            request.url = httpx.URL(replica.base_url + path)
+            request.headers["Host"] = request.url.netloc.decode("ascii")
+
+        def release() -> None:
+            replica.outstanding -= 1
+
+        replica.outstanding += 1
+        start = time.monotonic()
+        try:
+            response = await replica.transport.handle_async_request(request)
+        except httpx.TransportError:
+            release()
+            self._record_failure(replica)
+            raise
+        except BaseException:
+            release()
+            raise
+        replica.record_latency(time.monotonic() - start)
+        if response.status_code >= 500:
+            self._record_failure(replica)
+        else:
+            self._record_success(replica)
+        if response.is_closed:
+            # The body was read by the transport already
+            release()
+        else:
+            response.stream = _ReplicaStream(
+                cast(httpx.AsyncByteStream, response.stream), release
+            )
+        return response
+
+    async def _async_probe(self, replica: Replica) -> None:
+        """Probe the health of a replica by listing its models.
+
+        A failed probe counts like a failed request, and a replica that
+        answers with an error of the request is up.
+        """
+        try:
+            await replica.client.models.list()
+        except openai.OpenAIError as err:
+            if not isinstance(err, openai.APIStatusError) or err.status_code >= 500:
+                _LOGGER.debug("Probe of replica %s failed: %s", replica.base_url, err)
+                self._record_failure(replica)
+                return
+        self._record_success(replica)
+
+    async def _async_probe_replicas(self) -> None:
+        """Probe the health of all replicas at an interval."""
+        while True:
+            await asyncio.sleep(PROBE_INTERVAL)
+            await asyncio.gather(
+                *(self._async_probe(replica) for replica in self._replicas)
+            )
+
+    @callback
+    def async_start_probes(self, hass: HomeAssistant) -> None:
+        """Start probing the health of the replicas until the transport closes."""
+        self._probes = hass.async_create_background_task(
+            self._async_probe_replicas(), f"{DOMAIN} probe replicas"
+        )
+
+    async def aclose(self) -> None:
+        """Stop the probes and close the transports of all replicas."""
+        if self._probes is not None:
+            self._probes.cancel()
+        for replica in self._replicas:
+            await replica.transport.aclose()
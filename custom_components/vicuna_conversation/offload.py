@@ -0,0 +1,111 @@
+"""Offloading of CPU heavy work on large payloads from the event loop."""
+
+from __future__ import annotations
+
+import itertools
+import time
+from collections.abc import Callable, Iterator, Mapping
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.util.hass_dict import HassKey
+
+from .const import DOMAIN
+
+# Work on payloads of at least this many characters or bytes is run in the
+# executor, smaller payloads are cheaper to process than to hand off
+OFFLOAD_MIN_SIZE = 64 * 1024
+
+# Approximate serialized size of a number, boolean or null
+_SCALAR_SIZE = 8
+
+_END = object()
+
+
+def payload_size(value: Any, limit: int = OFFLOAD_MIN_SIZE) -> int:
+    """Return the approximate JSON size of a value, up to the limit.
+
+    The value is only walked until the limit is reached, so measuring a huge
+    payload costs no more than measuring one at the limit.
+    """
+    size = 0
+    pending: list[Iterator[Any]] = [iter((value,))]
+    while pending and size < limit:
+        if (item := next(pending[-1], _END)) is _END:
+            pending.pop()
+            continue
+        if isinstance(item, (str, bytes, bytearray)):
+            size += len(item) + 3
+        elif isinstance(item, Mapping):
+            size += 2
+            pending.append(itertools.chain.from_iterable(item.items()))
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            size += 2
+            pending.append(iter(item))
+        else:
+            size += _SCALAR_SIZE
+    return min(size, limit)
+
+
+@dataclass
+class OffloadStats:
+    """Counters of the work done on and off the event loop for an operation.
+
+    The time spent in the executor is event loop time that was saved, as it
+    would otherwise have blocked the loop.
+    """
+
+    inline_calls: int = 0
+    inline_seconds: float = 0.0
+    offloaded_calls: int = 0
+    offloaded_size: int = 0
+    offloaded_seconds: float = 0.0
+    max_offloaded_seconds: float = 0.0
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters for diagnostics."""
+        return asdict(self)
+
+
+_OFFLOAD_STATS: HassKey[dict[str, OffloadStats]] = HassKey(f"{DOMAIN}_offload_stats")
+
+
+@callback
+def async_get_offload_stats(hass: HomeAssistant) -> dict[str, OffloadStats]:
+    """Return the counters of all entries keyed by operation name."""
+    if (stats := hass.data.get(_OFFLOAD_STATS)) is None:
+        stats = hass.data[_OFFLOAD_STATS] = {}
+    return stats
+
+
+def _timed[R](func: Callable[..., R], *args: Any) -> tuple[R, float]:
+    """Call the function, returning its result and the seconds it took."""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+async def async_offload[R](
+    hass: HomeAssistant, name: str, size: int, func: Callable[..., R], *args: Any
+) -> R:
+    """Call a function on a payload, in the executor if the payload is large.
+
+    The function must not touch state that is shared with the event loop.
+    """
+    all_stats = async_get_offload_stats(hass)
+    if (stats := all_stats.get(name)) is None:
+        stats = all_stats[name] = OffloadStats()
+    if size < OFFLOAD_MIN_SIZE:
+        start = time.perf_counter()
+        try:
+            return func(*args)
+        finally:
+            stats.inline_calls += 1
+            stats.inline_seconds += time.perf_counter() - start
+    result, elapsed = await hass.async_add_executor_job(_timed, func, *args)
+    stats.offloaded_calls += 1
+    stats.offloaded_size += size
+    stats.offloaded_seconds += elapsed
+    stats.max_offloaded_seconds = max(stats.max_offloaded_seconds, elapsed)
+    return result
@@ -2,16 +2,33 @@
 
 from __future__ import annotations
 
+import asyncio
+import importlib.util
 import logging
-from collections.abc import Generator, Mapping
-from contextlib import contextmanager
+import random
+import time
+from collections.abc import (
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Generator,
+    Hashable,
+    Mapping,
+)
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import asdict, dataclass, field
+from email.utils import parsedate_to_datetime
 from typing import Any, cast
 
+import httpx
 import openai
 from homeassistant.const import CONF_API_KEY
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers.httpx_client import get_async_client
+from homeassistant.util.hass_dict import HassKey
+from homeassistant.util.ssl import client_context
 from openai._streaming import AsyncStream
 from openai.types.chat import (
     ChatCompletionChunk,
@@ -21,8 +38,28 @@ from openai.types.chat import (
 
 from .const import (
     CONF_BASE_URL,
+    CONF_CONNECT_TIMEOUT,
+    CONF_FIRST_TOKEN_TIMEOUT,
+    CONF_HTTP2,
+    CONF_KEEPALIVE_EXPIRY,
+    CONF_LOAD_BALANCING,
+    CONF_MAX_CONNECTIONS,
+    CONF_MAX_KEEPALIVE_CONNECTIONS,
+    CONF_REPLICAS,
+    CONF_REQUEST_TIMEOUT,
+    CONF_STALL_TIMEOUT,
     DOMAIN,
+    RECOMMENDED_CONNECT_TIMEOUT,
+    RECOMMENDED_FIRST_TOKEN_TIMEOUT,
+    RECOMMENDED_HTTP2,
+    RECOMMENDED_KEEPALIVE_EXPIRY,
+    RECOMMENDED_LOAD_BALANCING,
+    RECOMMENDED_MAX_CONNECTIONS,
+    RECOMMENDED_MAX_KEEPALIVE_CONNECTIONS,
+    RECOMMENDED_REQUEST_TIMEOUT,
+    RECOMMENDED_STALL_TIMEOUT,
 )
+from .load_balancer import PROBE_TIMEOUT, LoadBalancingTransport, Replica
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -30,22 +67,241 @@ _LOGGER = logging.getLogger(__name__)
 _TIMEOUT = 10.0
 _MAX_MODELS = 100
 
+_END = object()
+
+_UNIX_SCHEME = "unix://"
+# Requests over a Unix socket still need a host in their URL
+_UNIX_BASE_URL = "http://localhost"
+
+
+def _parse_base_url(base_url: str) -> tuple[str, str | None]:
+    """Return the HTTP base URL and the path of the Unix socket, if any.
+
+    A server on a Unix socket is given as `unix://<socket path>`, optionally
+    followed by `:<base path>` such as `unix:///run/llama.sock:/v1`.
+    """
+    if not base_url.startswith(_UNIX_SCHEME):
+        return base_url, None
+    socket_path = base_url.removeprefix(_UNIX_SCHEME)
+    base_path = ""
+    if ":" in socket_path:
+        socket_path, _, base_path = socket_path.rpartition(":")
+    if not socket_path.startswith("/") or (base_path and not base_path.startswith("/")):
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_base_url",
+            translation_placeholders={"base_url": base_url},
+        )
+    return f"{_UNIX_BASE_URL}{base_path.rstrip('/')}", socket_path
+
+
+def _create_transport(
+    transport_options: Mapping[str, Any], socket_path: str | None = None
+) -> httpx.AsyncHTTPTransport:
+    """Create an HTTP transport with its own connection pool.
+
+    Connections are made to the Unix socket when a path is given.
+    """
+    http2 = bool(transport_options.get(CONF_HTTP2, RECOMMENDED_HTTP2))
+    if http2 and importlib.util.find_spec("h2") is None:
+        _LOGGER.warning("HTTP/2 requires the h2 package, using HTTP/1.1 instead")
+        http2 = False
+    return httpx.AsyncHTTPTransport(
+        # The shared context lets all clients reuse the loaded certificates
+        verify=client_context(),
+        http2=http2,
+        uds=socket_path,
+        limits=httpx.Limits(
+            max_connections=int(
+                transport_options.get(CONF_MAX_CONNECTIONS, RECOMMENDED_MAX_CONNECTIONS)
+            ),
+            max_keepalive_connections=int(
+                transport_options.get(
+                    CONF_MAX_KEEPALIVE_CONNECTIONS,
+                    RECOMMENDED_MAX_KEEPALIVE_CONNECTIONS,
+                )
+            ),
+            keepalive_expiry=float(
+                transport_options.get(
+                    CONF_KEEPALIVE_EXPIRY, RECOMMENDED_KEEPALIVE_EXPIRY
+                )
+            ),
+        ),
+    )
+
+
+def _create_load_balancer(
+    api_key: str,
+    base_urls: list[tuple[str, str | None]],
+    transport_options: Mapping[str, Any],
+) -> LoadBalancingTransport:
+    """Create a transport that balances requests across the replicas.
+
+    The first replica is the one the client sends its requests to.
+    """
+    replicas = []
+    for base_url, socket_path in base_urls:
+        transport = _create_transport(transport_options, socket_path)
+        replicas.append(
+            Replica(
+                base_url.rstrip("/"),
+                transport,
+                openai.AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    http_client=httpx.AsyncClient(transport=transport),
+                    max_retries=0,
+                    timeout=PROBE_TIMEOUT,
+                ),
+            )
+        )
+    return LoadBalancingTransport(
+        base_urls[0][0],
+        replicas,
+        transport_options.get(CONF_LOAD_BALANCING, RECOMMENDED_LOAD_BALANCING),
+    )
+
 
 async def async_create_client(
-    hass: HomeAssistant, config_entry_data: Mapping[str, Any]
+    hass: HomeAssistant,
+    config_entry_data: Mapping[str, Any],
+    transport_options: Mapping[str, Any] | None = None,
 ) -> openai.AsyncOpenAI:
-    """Create a new OpenAI client."""
+    """Create a new OpenAI client.
+
+    The client uses the shared Home Assistant HTTP client, unless transport
+    options are given or the server is on a Unix socket. It then has an HTTP
+    client of its own that is closed when the OpenAI client is closed.
+    Requests are balanced across the server and its replicas, if the
+    transport options have any.
+    """
+    base_url, socket_path = _parse_base_url(config_entry_data[CONF_BASE_URL])
+    replica_urls = [
+        _parse_base_url(replica_url)
+        for replica_url in (transport_options or {}).get(CONF_REPLICAS, [])
+    ]
+    load_balancer: LoadBalancingTransport | None = None
 
     def _create() -> openai.AsyncOpenAI:
         """Get OpenAI client."""
+        nonlocal load_balancer
         _LOGGER.debug("Creating OpenAI client: %s", config_entry_data)
+        http_client: httpx.AsyncClient
+        if replica_urls:
+            load_balancer = _create_load_balancer(
+                config_entry_data[CONF_API_KEY],
+                [(base_url, socket_path), *replica_urls],
+                cast(Mapping[str, Any], transport_options),
+            )
+            http_client = httpx.AsyncClient(transport=load_balancer)
+        elif transport_options is None and socket_path is None:
+            http_client = get_async_client(hass)
+        else:
+            http_client = httpx.AsyncClient(
+                transport=_create_transport(transport_options or {}, socket_path)
+            )
         return openai.AsyncOpenAI(
             api_key=config_entry_data[CONF_API_KEY],
-            base_url=config_entry_data[CONF_BASE_URL],
-            http_client=get_async_client(hass),
+            base_url=base_url,
+            http_client=http_client,
+        )
+
+    client = await hass.async_add_executor_job(_create)
+    if load_balancer is not None:
+        load_balancer.async_start_probes(hass)
+    return client
+
+
+def validate_base_url(base_url: str) -> None:
+    """Raise an error if a base URL is not an HTTP URL or a Unix socket."""
+    _parse_base_url(base_url)
+    if not base_url.startswith((_UNIX_SCHEME, "http://", "https://")):
+        raise HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="invalid_base_url",
+            translation_placeholders={"base_url": base_url},
         )
 
-    return await hass.async_add_executor_job(_create)
+
+@dataclass
+class _SharedClient:
+    """A client and the number of entries and flows that use it."""
+
+    client: openai.AsyncOpenAI
+    users: int = 0
+
+
+@dataclass
+class _ClientRegistry:
+    """Clients shared by the entries and flows that connect to the same server."""
+
+    clients: dict[Hashable, _SharedClient] = field(default_factory=dict)
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+
+_CLIENTS: HassKey[_ClientRegistry] = HassKey(f"{DOMAIN}_clients")
+
+
+def _client_key(
+    config_entry_data: Mapping[str, Any], transport_options: Mapping[str, Any]
+) -> Hashable:
+    """Return the key of the clients that can be shared."""
+    return (
+        config_entry_data[CONF_BASE_URL],
+        config_entry_data[CONF_API_KEY],
+        int(transport_options.get(CONF_MAX_CONNECTIONS, RECOMMENDED_MAX_CONNECTIONS)),
+        int(
+            transport_options.get(
+                CONF_MAX_KEEPALIVE_CONNECTIONS, RECOMMENDED_MAX_KEEPALIVE_CONNECTIONS
+            )
+        ),
+        float(
+            transport_options.get(CONF_KEEPALIVE_EXPIRY, RECOMMENDED_KEEPALIVE_EXPIRY)
+        ),
+        bool(transport_options.get(CONF_HTTP2, RECOMMENDED_HTTP2)),
+        tuple(transport_options.get(CONF_REPLICAS, [])),
+        transport_options.get(CONF_LOAD_BALANCING, RECOMMENDED_LOAD_BALANCING),
+    )
+
+
+async def async_acquire_client(
+    hass: HomeAssistant,
+    config_entry_data: Mapping[str, Any],
+    transport_options: Mapping[str, Any],
+) -> openai.AsyncOpenAI:
+    """Return a client for the server, shared with other users of the server.
+
+    Each client that is acquired must be released with `async_release_client`.
+    """
+    registry = hass.data.setdefault(_CLIENTS, _ClientRegistry())
+    key = _client_key(config_entry_data, transport_options)
+    async with registry.lock:
+        if (shared := registry.clients.get(key)) is None:
+            client = await async_create_client(
+                hass, config_entry_data, transport_options
+            )
+            shared = registry.clients[key] = _SharedClient(client)
+        else:
+            _LOGGER.debug("Reusing OpenAI client for %s", key[0])
+        shared.users += 1
+    return shared.client
+
+
+@callback
+def async_release_client(hass: HomeAssistant, client: openai.AsyncOpenAI) -> None:
+    """Release a client, closing it once it has no users left."""
+    registry = hass.data[_CLIENTS]
+    for key, shared in registry.clients.items():
+        if shared.client is client:
+            break
+    else:
+        return
+    shared.users -= 1
+    if shared.users:
+        return
+    _LOGGER.debug("Closing OpenAI client for %s", key[0])
+    del registry.clients[key]
+    hass.async_create_task(client.close(), f"{DOMAIN} close client")
 
 
 async def async_list_models(client: openai.AsyncOpenAI) -> list[str]:
@@ -92,12 +348,373 @@ async def async_validate_completions(
         )
 
         if stream:
-            stream_result = cast(AsyncStream[ChatCompletionChunk], result)
-            async for event in stream_result:
-                if not event.choices:
-                    continue
-                if event.choices[0].finish_reason is not None:
-                    continue
+            # Closing the stream releases the connection even if reading fails
+            async with cast(AsyncStream[ChatCompletionChunk], result) as stream_result:
+                async for event in stream_result:
+                    if not event.choices:
+                        continue
+                    if event.choices[0].finish_reason is not None:
+                        continue
+
+
+# Phases of a completion request that each have a deadline
+PHASE_CONNECT = "connect"
+PHASE_FIRST_TOKEN = "first_token"
+PHASE_STALL = "stall"
+PHASE_TOTAL = "total"
+
+
+@dataclass(frozen=True)
+class RequestTimeouts:
+    """Timeouts in seconds of the phases of a completion request.
+
+    The first token timeout runs from when the request is sent, and the stall
+    timeout between the chunks of a streamed response after that. Responses
+    that are not streamed only have the connect and total timeouts.
+    """
+
+    connect: float = RECOMMENDED_CONNECT_TIMEOUT
+    first_token: float = RECOMMENDED_FIRST_TOKEN_TIMEOUT
+    stall: float = RECOMMENDED_STALL_TIMEOUT
+    total: float = RECOMMENDED_REQUEST_TIMEOUT
+
+    @classmethod
+    def from_options(cls, options: Mapping[str, Any]) -> RequestTimeouts:
+        """Return the timeouts configured in the options of a subentry."""
+        return cls(
+            connect=float(
+                options.get(CONF_CONNECT_TIMEOUT, RECOMMENDED_CONNECT_TIMEOUT)
+            ),
+            first_token=float(
+                options.get(CONF_FIRST_TOKEN_TIMEOUT, RECOMMENDED_FIRST_TOKEN_TIMEOUT)
+            ),
+            stall=float(options.get(CONF_STALL_TIMEOUT, RECOMMENDED_STALL_TIMEOUT)),
+            total=float(options.get(CONF_REQUEST_TIMEOUT, RECOMMENDED_REQUEST_TIMEOUT)),
+        )
+
+    @property
+    def http_timeout(self) -> httpx.Timeout:
+        """Return the timeout of the HTTP request.
+
+        Waiting for a connection from the pool counts as connecting.
+        """
+        return httpx.Timeout(self.total, connect=self.connect, pool=self.connect)
+
+
+def timeout_error(phase: str, message: str) -> HomeAssistantError:
+    """Return the error of a request that timed out in a phase."""
+    return HomeAssistantError(
+        translation_domain=DOMAIN,
+        translation_key="timeout",
+        translation_placeholders={"phase": phase, "message": message},
+    )
+
+
+class RequestDeadlines:
+    """Deadlines of the phases of a completion request that was just sent."""
+
+    def __init__(self, timeouts: RequestTimeouts) -> None:
+        """Start the deadlines of the request."""
+        self._loop = asyncio.get_running_loop()
+        self._timeouts = timeouts
+        now = self._loop.time()
+        self._first_token = now + timeouts.first_token
+        self._total = now + timeouts.total
+
+    @asynccontextmanager
+    async def async_phase(self, phase: str) -> AsyncIterator[None]:
+        """Raise a timeout error if the block runs past the deadline of a phase.
+
+        The total deadline applies to every phase.
+        """
+        if phase == PHASE_FIRST_TOKEN:
+            deadline, timeout = self._first_token, self._timeouts.first_token
+        elif phase == PHASE_STALL:
+            deadline = self._loop.time() + self._timeouts.stall
+            timeout = self._timeouts.stall
+        else:
+            deadline, timeout = self._total, self._timeouts.total
+        if deadline >= self._total:
+            phase, deadline, timeout = PHASE_TOTAL, self._total, self._timeouts.total
+        try:
+            async with asyncio.timeout_at(deadline):
+                yield
+        except TimeoutError as err:
+            _LOGGER.error("Timeout talking to API in the %s phase", phase)
+            raise timeout_error(
+                phase, f"no response after {timeout:g} seconds"
+            ) from err
+
+    async def async_stream[T](self, stream: AsyncGenerator[T]) -> AsyncGenerator[T]:
+        """Return the items of a stream, with the first token and stall deadlines.
+
+        The stream is closed when this generator is closed.
+        """
+        phase = PHASE_FIRST_TOKEN
+        try:
+            while True:
+                async with self.async_phase(phase):
+                    item = await anext(stream, _END)
+                if item is _END:
+                    return
+                phase = PHASE_STALL
+                yield cast(T, item)
+        finally:
+            await stream.aclose()
+
+
+# Delays in seconds between retries, the delay doubles with each retry and a
+# random part of it is used so that clients don't retry in lockstep
+_RETRY_BASE_DELAY = 0.5
+_RETRY_MAX_DELAY = 8.0
+# Requests are not retried when the server asks to wait longer than this
+_RETRY_AFTER_MAX = 30.0
+
+
+@dataclass
+class RetryBudget:
+    """A budget of retries shared by all requests.
+
+    Each request adds a fraction of a retry to the balance, up to a maximum,
+    and each retry spends a whole one. When a server fails every request the
+    balance runs out, so retries can't multiply the load on it.
+    """
+
+    ratio: float = 0.2
+    max_balance: float = 10.0
+    balance: float = 10.0
+    retries: int = 0
+    exhausted: int = 0
+
+    def deposit(self) -> None:
+        """Add the share of a request to the balance."""
+        self.balance = min(self.max_balance, self.balance + self.ratio)
+
+    def withdraw(self) -> bool:
+        """Spend a retry, returning False if the budget is exhausted."""
+        if self.balance < 1:
+            self.exhausted += 1
+            return False
+        self.balance -= 1
+        self.retries += 1
+        return True
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the budget for diagnostics."""
+        return asdict(self)
+
+
+# Budget of all retries, kept for the lifetime of the process
+RETRY_BUDGET = RetryBudget()
+
+
+def _retry_after(response: httpx.Response) -> float | None:
+    """Return the seconds the server asked to wait before retrying, if any."""
+    if (value := response.headers.get("retry-after-ms")) is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    if (value := response.headers.get("retry-after")) is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+def _retry_delay(err: openai.OpenAIError, attempt: int) -> float | None:
+    """Return the seconds to wait before retrying a failed request.
+
+    Returns None if the request should not be retried, which is when the
+    server rejected it or it timed out after it was sent.
+    """
+    if isinstance(err, openai.APITimeoutError):
+        if not isinstance(err.__cause__, (httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return None
+    elif isinstance(err, openai.APIStatusError):
+        if err.status_code != 429 and err.status_code < 500:
+            return None
+        if (retry_after := _retry_after(err.response)) is not None:
+            return retry_after if retry_after <= _RETRY_AFTER_MAX else None
+    elif not isinstance(err, openai.APIConnectionError):
+        return None
+    return random.uniform(0, min(_RETRY_MAX_DELAY, _RETRY_BASE_DELAY * 2**attempt))
+
+
+async def async_retry_request[R](
+    max_retries: int, func: Callable[..., Awaitable[R]], *args: Any, **kwargs: Any
+) -> R:
+    """Send a request, retrying failures that happened before a response.
+
+    Only sending the request is retried, a streamed response that has started
+    is never sent again. The request must be sent without the retries of the
+    OpenAI SDK.
+    """
+    RETRY_BUDGET.deposit()
+    attempt = 0
+    while True:
+        try:
+            return await func(*args, **kwargs)
+        except openai.OpenAIError as err:
+            if attempt >= max_retries or (delay := _retry_delay(err, attempt)) is None:
+                raise
+            if not RETRY_BUDGET.withdraw():
+                _LOGGER.warning("Retry budget exhausted, not retrying: %s", err)
+                raise
+            _LOGGER.debug("Retrying request in %.1f seconds: %s", delay, err)
+        await asyncio.sleep(delay)
+        attempt += 1
+
+
+# States of a circuit breaker
+BREAKER_CLOSED = "closed"
+BREAKER_OPEN = "open"
+BREAKER_HALF_OPEN = "half_open"
+
+# Consecutive failures that open a circuit breaker, and seconds until a probe
+# request is let through to see if the server has recovered
+_BREAKER_FAILURE_THRESHOLD = 5
+_BREAKER_RESET_TIMEOUT = 30.0
+
+
+def _is_server_failure(err: BaseException) -> bool:
+    """Return True if an error means the server is down or failing.
+
+    Only lost connections, server errors and responses that stall count.
+    Errors of requests that the server answered and rejected, such as invalid
+    authentication or an error event about the request, mean it is up, and a
+    slow first token or response may be caused by the request itself.
+    """
+    if isinstance(err, openai.APIStatusError):
+        return err.status_code >= 500
+    if isinstance(err, openai.APITimeoutError):
+        return isinstance(err.__cause__, httpx.ConnectTimeout)
+    if isinstance(err, openai.APIConnectionError):
+        return True
+    if isinstance(err, httpx.TransportError):
+        return not isinstance(err, httpx.TimeoutException) or isinstance(
+            err, httpx.ConnectTimeout
+        )
+    if not isinstance(err, HomeAssistantError):
+        return False
+    if err.translation_key == "timeout":
+        return (err.translation_placeholders or {}).get("phase") in (
+            PHASE_CONNECT,
+            PHASE_STALL,
+        )
+    return err.translation_key == "cannot_connect"
+
+
+@dataclass
+class CircuitBreaker:
+    """Fail requests to a server straight away while it is down.
+
+    The breaker opens after consecutive failures, and requests fail without
+    being sent until the reset timeout has passed. It is then half open, and
+    the next request is sent as a probe while other requests keep failing.
+    The breaker closes if the probe succeeds and opens again if it fails.
+    """
+
+    failure_threshold: int = _BREAKER_FAILURE_THRESHOLD
+    reset_timeout: float = _BREAKER_RESET_TIMEOUT
+    state: str = BREAKER_CLOSED
+    failures: int = 0
+    trips: int = 0
+    rejected: int = 0
+    opened_at: float = 0.0
+    probing: bool = False
+
+    def _reject(self, message: str) -> HomeAssistantError:
+        """Return the error of a request that is not sent."""
+        self.rejected += 1
+        return HomeAssistantError(
+            translation_domain=DOMAIN,
+            translation_key="server_unavailable",
+            translation_placeholders={"message": message},
+        )
+
+    def _before_request(self) -> bool:
+        """Raise an error if the request can't be sent.
+
+        Return True if the request is sent as the probe.
+        """
+        if self.state == BREAKER_OPEN:
+            if (wait := self.opened_at + self.reset_timeout - time.monotonic()) > 0:
+                raise self._reject(f"retrying in {int(wait) + 1} seconds")
+            self.state = BREAKER_HALF_OPEN
+        if self.state == BREAKER_HALF_OPEN:
+            if self.probing:
+                raise self._reject("checking if it has recovered")
+            _LOGGER.debug("Sending a probe request to a server that was down")
+            self.probing = True
+            return True
+        return False
+
+    def _record_success(self) -> None:
+        """Close the breaker after the server answered."""
+        if self.state != BREAKER_CLOSED:
+            _LOGGER.info("Server has recovered, closing the circuit breaker")
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+
+    def _record_failure(self) -> None:
+        """Count a failure, opening the breaker if there are too many."""
+        self.failures += 1
+        if self.state == BREAKER_HALF_OPEN or (
+            self.state == BREAKER_CLOSED and self.failures >= self.failure_threshold
+        ):
+            _LOGGER.warning(
+                "Server failed %s times, failing requests for %s seconds",
+                self.failures,
+                self.reset_timeout,
+            )
+            self.state = BREAKER_OPEN
+            self.opened_at = time.monotonic()
+            self.trips += 1
+
+    @contextmanager
+    def guard(self) -> Generator[None]:
+        """Guard a request until its response is read, recording if it failed.
+
+        Only the request that was sent as the probe frees the probe slot. A
+        cancelled probe tells nothing, so the next request probes again.
+        """
+        probe = self._before_request()
+        try:
+            yield
+        except Exception as err:
+            if _is_server_failure(err):
+                self._record_failure()
+            else:
+                self._record_success()
+            raise
+        else:
+            self._record_success()
+        finally:
+            if probe:
+                self.probing = False
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state of the breaker for diagnostics."""
+        return asdict(self)
+
+
+_BREAKERS: HassKey[dict[str, CircuitBreaker]] = HassKey(f"{DOMAIN}_breakers")
+
+
+@callback
+def async_get_circuit_breaker(hass: HomeAssistant, base_url: str) -> CircuitBreaker:
+    """Return the circuit breaker of a server, shared by all its entries."""
+    breakers = hass.data.setdefault(_BREAKERS, {})
+    if (breaker := breakers.get(base_url)) is None:
+        breaker = breakers[base_url] = CircuitBreaker()
+    return breaker
 
 
 def _extract_error_message(err: openai.APIStatusError) -> str:
@@ -120,11 +737,11 @@ def api_error_handler() -> Generator[None]:
         yield
     except openai.APITimeoutError as err:
         _LOGGER.error("Timeout talking to API: %s", err)
-        error_message = err.message or str(err)
-        raise HomeAssistantError(
-            translation_domain=DOMAIN,
-            translation_key="timeout",
-            translation_placeholders={"message": error_message},
+        raise timeout_error(
+            PHASE_CONNECT
+            if isinstance(err.__cause__, (httpx.ConnectTimeout, httpx.PoolTimeout))
+            else PHASE_TOTAL,
+            err.message or str(err),
         ) from err
     except openai.APIConnectionError as err:
         _LOGGER.error("Connection error talking to API: %s", err)
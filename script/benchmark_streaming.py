@@ -0,0 +1,115 @@
+"""Benchmark parsing streamed chat completions with and without the OpenAI SDK.
+
+Usage: python3 script/benchmark_streaming.py [--chunks N] [--rounds N]
+
+Both paths read the same server-sent event stream from memory and transform it
+into chat log deltas, so the difference is the CPU time spent per chunk.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections.abc import AsyncGenerator, AsyncIterator, Callable
+
+import httpx
+import openai
+from openai._streaming import AsyncStream
+from openai.types.chat import ChatCompletionChunk
+
+from custom_components.vicuna_conversation.entity import (
+    _chunk_deltas,
+    _sse_deltas,
+    _StreamDelta,
+    _transform_stream,
+)
+
+
+class _ByteStream(httpx.AsyncByteStream):
+    """A response body that is received one event at a time."""
+
+    def __init__(self, events: list[bytes]) -> None:
+        """Initialize the stream."""
+        self._events = events
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Iterate over the events."""
+        for event in self._events:
+            yield event
+
+
+def _events(chunks: int) -> list[bytes]:
+    """Return the events of a response with the given number of tokens."""
+    events = []
+    for i in range(chunks):
+        delta = {"content": f" token{i}"}
+        if i == 0:
+            delta["role"] = "assistant"
+        chunk = {
+            "id": "chatcmpl-benchmark",
+            "object": "chat.completion.chunk",
+            "created": 1700000000,
+            "model": "gpt-3.5-turbo",
+            "choices": [{"index": 0, "delta": delta, "finish_reason": None}],
+        }
+        events.append(f"data: {json.dumps(chunk)}\n\n".encode())
+    chunk["choices"] = [{"index": 0, "delta": {}, "finish_reason": "stop"}]
+    events.append(f"data: {json.dumps(chunk)}\n\n".encode())
+    events.append(b"data: [DONE]\n\n")
+    return events
+
+
+def _response(events: list[bytes]) -> httpx.Response:
+    """Return a streamed response with the given events."""
+    return httpx.Response(
+        200,
+        stream=_ByteStream(events),
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+    )
+
+
+async def _run(
+    events: list[bytes],
+    rounds: int,
+    deltas: Callable[[httpx.Response], AsyncGenerator[_StreamDelta]],
+) -> float:
+    """Return the best time in seconds to transform the stream."""
+    best = float("inf")
+    for _ in range(rounds):
+        response = _response(events)
+        start = time.perf_counter()
+        async for _delta in _transform_stream(deltas(response)):
+            pass
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+async def main() -> None:
+    """Run the benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    events = _events(args.chunks)
+    client = openai.AsyncOpenAI(api_key="sk-benchmark")
+
+    def sdk_deltas(response: httpx.Response) -> AsyncGenerator[_StreamDelta]:
+        return _chunk_deltas(
+            AsyncStream(cast_to=ChatCompletionChunk, response=response, client=client)
+        )
+
+    sdk = await _run(events, args.rounds, sdk_deltas)
+    raw = await _run(events, args.rounds, _sse_deltas)
+    for name, elapsed in (("sdk", sdk), ("raw", raw)):
+        print(
+            f"{name}: {elapsed * 1000:8.2f} ms total, "
+            f"{elapsed / args.chunks * 1e6:6.2f} us per chunk"
+        )
+    print(f"raw streaming is {sdk / raw:.1f}x faster")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -8,13 +8,19 @@ import voluptuous as vol
 from homeassistant.components import ai_task
 from homeassistant.const import Platform
 from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from openai.types.chat import ChatCompletionChunk
 from openai.types.chat.chat_completion import ChatCompletion, Choice
+from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
+from openai.types.chat.chat_completion_chunk import ChoiceDelta
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 from openai.types.completion_usage import CompletionUsage
 from pytest_homeassistant_custom_component.common import (
     MockConfigEntry,
 )
 
+from custom_components.vicuna_conversation.const import CONF_STREAMING
+
 
 @pytest.fixture(name="platforms")
 def mock_platforms() -> list[Platform]:
@@ -130,3 +136,111 @@ async def test_generate_data_error(
             entity_id="ai_task.custom_openai_ai_task",
             instructions="test prompt",
         )
+
+
+def _content_stream(fragments: list[str], consumed: list[str]):
+    """Return a mock stream of content fragments, recording what was consumed."""
+
+    async def mock_stream():
+        for i, fragment in enumerate(fragments):
+            yield ChatCompletionChunk.model_construct(
+                id="chatcmpl-123",
+                choices=[
+                    ChunkChoice.model_construct(
+                        index=0,
+                        delta=ChoiceDelta(
+                            role="assistant" if i == 0 else None, content=fragment
+                        ),
+                        finish_reason=None,
+                    )
+                ],
+                created=1700000000,
+                model="gpt-3.5-turbo",
+                object="chat.completion.chunk",
+            )
+            consumed.append(fragment)
+        yield ChatCompletionChunk.model_construct(
+            id="chatcmpl-123",
+            choices=[
+                ChunkChoice.model_construct(
+                    index=0, delta=ChoiceDelta(), finish_reason="stop"
+                )
+            ],
+            created=1700000000,
+            model="gpt-3.5-turbo",
+            object="chat.completion.chunk",
+        )
+
+    return mock_stream()
+
+
+@pytest.mark.parametrize("config_entry_options", [{CONF_STREAMING: True}])
+async def test_generate_structured_data_streaming(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    setup_integration: None,
+    mock_completion: AsyncMock,
+) -> None:
+    """Test structured data that is parsed while it is streamed."""
+    consumed: list[str] = []
+    mock_completion.return_value = _content_stream(
+        ['{"name": "Kitchen", ', '"count"', ": 3}"], consumed
+    )
+    response = await ai_task.async_generate_data(
+        hass,
+        task_name="Test Task",
+        entity_id="ai_task.custom_openai_ai_task",
+        instructions="test prompt",
+        structure=vol.Schema({vol.Required("name"): str, vol.Required("count"): int}),
+    )
+    assert response.data == {"name": "Kitchen", "count": 3}
+
+
+@pytest.mark.parametrize("config_entry_options", [{CONF_STREAMING: True}])
+async def test_generate_structured_data_streaming_invalid(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    setup_integration: None,
+    mock_completion: AsyncMock,
+) -> None:
+    """Test a streamed structured response that fails as soon as a field is invalid."""
+    consumed: list[str] = []
+    mock_completion.return_value = _content_stream(
+        ['{"count": "many", ', '"name": "Kitchen"}'], consumed
+    )
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await ai_task.async_generate_data(
+            hass,
+            task_name="Test Task",
+            entity_id="ai_task.custom_openai_ai_task",
+            instructions="test prompt",
+            structure=vol.Schema(
+                {vol.Required("name"): str, vol.Required("count"): int}
+            ),
+        )
+    assert exc_info.value.translation_key == "structured_output_error"
+    assert consumed == []
+
+
+@pytest.mark.parametrize("config_entry_options", [{CONF_STREAMING: True}])
+async def test_generate_structured_data_streaming_stops_when_complete(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    setup_integration: None,
+    mock_completion: AsyncMock,
+) -> None:
+    """Test the stream is closed once the structured response is complete."""
+    consumed: list[str] = []
+    mock_completion.return_value = _content_stream(
+        ['{"name": ', '"Kitchen"}\n\nHere is', " the data", " you asked for."],
+        consumed,
+    )
+    response = await ai_task.async_generate_data(
+        hass,
+        task_name="Test Task",
+        entity_id="ai_task.custom_openai_ai_task",
+        instructions="test prompt",
+        structure=vol.Schema({vol.Required("name"): str}),
+    )
+    assert response.data == {"name": "Kitchen"}
+    assert consumed == ['{"name": ']
@@ -0,0 +1,562 @@
+"""Tests for encoding attachments."""
+
+import asyncio
+import base64
+import io
+import os
+import subprocess
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, call, patch
+
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+from PIL import Image
+
+from custom_components.vicuna_conversation.attachments import (
+    MAX_ENCODING_SIZE,
+    AttachmentOptions,
+    AttachmentUploader,
+    _encode_file,
+    _SizeLimiter,
+    async_prepare_files_for_prompt,
+    attachment_cache_stats,
+)
+
+
+def _write_pdf(path: Path, pages: list[str]) -> None:
+    """Write a PDF with a line of text on each page."""
+    objects: list[bytes] = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 24 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % len(objects)
+        )
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(kids),
+        len(kids),
+    )
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    data += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    data += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref,
+    )
+    path.write_bytes(data)
+
+
+async def test_attachments_cached(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test that an attachment is encoded again only when it changes."""
+    image = tmp_path / "snapshot.jpg"
+    image.write_bytes(b"image")
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["Reset the device"])
+
+    with patch(
+        "custom_components.vicuna_conversation.attachments._encode_file",
+        wraps=_encode_file,
+    ) as mock_encode:
+        parts = await async_prepare_files_for_prompt(hass, [image, pdf])
+        assert parts == [
+            {
+                "type": "image_url",
+                "image_url": {
+                    "url": "data:image/jpeg;base64,aW1hZ2U=",
+                    "detail": "auto",
+                },
+            },
+            {
+                "type": "text",
+                "text": "[File: manual.pdf, 1 pages]\n--- Page 1 ---\nReset the device",
+            },
+        ]
+        assert mock_encode.call_count == 2
+
+        hits = attachment_cache_stats()["hits"]
+        assert await async_prepare_files_for_prompt(hass, [image, pdf]) == parts
+        assert mock_encode.call_count == 2
+        assert attachment_cache_stats()["hits"] == hits + 2
+
+        # Different encoding settings are cached separately
+        await async_prepare_files_for_prompt(
+            hass, [image], AttachmentOptions(image_quality=50)
+        )
+        assert mock_encode.call_count == 3
+
+        image.write_bytes(b"new image")
+        stat = image.stat()
+        os.utime(image, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        parts = await async_prepare_files_for_prompt(hass, [image, pdf])
+        assert parts[0]["image_url"]["url"] == "data:image/jpeg;base64,bmV3IGltYWdl"
+        assert mock_encode.call_count == 4
+
+
+async def test_attachment_not_found(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test an attachment that does not exist."""
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await async_prepare_files_for_prompt(hass, [tmp_path / "missing.jpg"])
+    assert exc_info.value.translation_key == "file_not_found"
+
+
+async def test_attachment_unsupported(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test an attachment that is not an image or PDF."""
+    text = tmp_path / "notes.txt"
+    text.write_text("notes")
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await async_prepare_files_for_prompt(hass, [text])
+    assert exc_info.value.translation_key == "unsupported_file_type"
+
+
+@pytest.mark.parametrize(
+    ("options", "mime_type", "size", "detail"),
+    [
+        (AttachmentOptions(image_max_size=256), "image/png", (256, 192), "low"),
+        (
+            AttachmentOptions(image_max_size=768, image_format="jpeg"),
+            "image/jpeg",
+            (768, 576),
+            "high",
+        ),
+        (AttachmentOptions(image_format="webp"), "image/webp", (1024, 768), "auto"),
+    ],
+)
+async def test_attachment_image_preprocessing(
+    hass: HomeAssistant,
+    tmp_path: Path,
+    options: AttachmentOptions,
+    mime_type: str,
+    size: tuple[int, int],
+    detail: str,
+) -> None:
+    """Test that images are downscaled and re-encoded."""
+    image = tmp_path / "snapshot.png"
+    Image.effect_noise((1024, 768), 64).convert("RGB").save(image)
+
+    parts = await async_prepare_files_for_prompt(hass, [image], options)
+
+    image_url = parts[0]["image_url"]
+    assert image_url["detail"] == detail
+    prefix = f"data:{mime_type};base64,"
+    assert image_url["url"].startswith(prefix)
+    data = base64.b64decode(image_url["url"].removeprefix(prefix))
+    assert len(data) < image.stat().st_size
+    with Image.open(io.BytesIO(data)) as encoded:
+        assert encoded.size == size
+
+
+async def test_attachment_pdf_limits(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test that PDF text is limited and leading pages are rendered."""
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["Hello page one", "Second page text", "Third"])
+
+    parts = await async_prepare_files_for_prompt(
+        hass,
+        [pdf],
+        AttachmentOptions(pdf_max_chars=20, pdf_render_pages=1, image_max_size=256),
+    )
+
+    assert parts[0] == {
+        "type": "text",
+        "text": (
+            "[File: manual.pdf, 3 pages]\n"
+            "[Content is truncated to 2 pages and 20 characters]\n"
+            "--- Page 1 ---\nHello page one\n"
+            "--- Page 2 ---\nSecond"
+        ),
+    }
+    assert len(parts) == 2
+    image_url = parts[1]["image_url"]
+    assert image_url["detail"] == "low"
+    prefix = "data:image/jpeg;base64,"
+    assert image_url["url"].startswith(prefix)
+    data = base64.b64decode(image_url["url"].removeprefix(prefix))
+    with Image.open(io.BytesIO(data)) as image:
+        assert max(image.size) == 256
+
+
+async def test_attachment_pdf_invalid(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test a PDF that can't be read."""
+    pdf = tmp_path / "manual.pdf"
+    pdf.write_bytes(b"not a pdf")
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await async_prepare_files_for_prompt(hass, [pdf])
+    assert exc_info.value.translation_key == "pdf_read_error"
+
+
+async def test_attachment_encoded_in_blocks(
+    hass: HomeAssistant, tmp_path: Path
+) -> None:
+    """Test an image that is larger than a base64 block."""
+    data = os.urandom(1024 * 1024 + 1)
+    image = tmp_path / "snapshot.jpg"
+    image.write_bytes(data)
+
+    parts = await async_prepare_files_for_prompt(hass, [image])
+
+    assert parts[0]["image_url"]["url"] == (
+        f"data:image/jpeg;base64,{base64.b64encode(data).decode()}"
+    )
+
+
+async def test_attachment_encoding_size_reserved(
+    hass: HomeAssistant, tmp_path: Path
+) -> None:
+    """Test that the memory used to encode an image is reserved."""
+    image = tmp_path / "snapshot.jpg"
+    image.write_bytes(os.urandom(100000))
+    limiter = _SizeLimiter(MAX_ENCODING_SIZE)
+    reserved: list[int] = []
+    reserve = limiter.reserve
+
+    def record(size: int) -> Any:
+        reserved.append(size)
+        return reserve(size)
+
+    with (
+        patch(
+            "custom_components.vicuna_conversation.attachments._ENCODING_LIMITER",
+            limiter,
+        ),
+        patch.object(limiter, "reserve", side_effect=record),
+    ):
+        parts = await async_prepare_files_for_prompt(hass, [image])
+
+    # The data URL is held as bytes and as a string while it is built
+    assert reserved == [2 * len(parts[0]["image_url"]["url"])]
+
+
+def _fake_ffmpeg(frames: int, returncode: int = 0) -> Callable[..., Any]:
+    """Return a replacement for running ffmpeg that writes numbered frames."""
+
+    def run(args: list[str], **kwargs: Any) -> subprocess.CompletedProcess[bytes]:
+        log = b"  Duration: 00:00:12.50, start: 0.000000, bitrate: 1024 kb/s\n"
+        if args[-1].endswith(".jpg") and not returncode:
+            for index in range(frames):
+                Image.new("RGB", (100 + index, 50)).save(args[-1] % (index + 1))
+        elif args[-1].endswith(".jpg"):
+            log += b"Invalid data found when processing input\n"
+        else:
+            log += b"At least one output file must be specified\n"
+        return subprocess.CompletedProcess(
+            args, returncode if args[-1].endswith(".jpg") else 1, b"", log
+        )
+
+    return run
+
+
+@pytest.mark.parametrize(
+    ("selection", "candidates", "video_filter", "max_candidates", "widths"),
+    [
+        (
+            "scene",
+            20,
+            "select='eq(n,0)+gt(scene,0.3)*gte(t-prev_selected_t,0.195312)'",
+            "64",
+            [100, 105, 110, 115],
+        ),
+        ("interval", 4, "fps=0.320000", "4", [100, 101, 102, 103]),
+    ],
+)
+async def test_attachment_video_frames(
+    hass: HomeAssistant,
+    tmp_path: Path,
+    selection: str,
+    candidates: int,
+    video_filter: str,
+    max_candidates: str,
+    widths: list[int],
+) -> None:
+    """Test that a video is sent as a few of its frames."""
+    video = tmp_path / "doorbell.mp4"
+    video.write_bytes(b"video")
+
+    with (
+        patch(
+            "custom_components.vicuna_conversation.attachments.get_ffmpeg_manager",
+            return_value=MagicMock(binary="ffmpeg"),
+        ),
+        patch(
+            "custom_components.vicuna_conversation.attachments.subprocess.run",
+            side_effect=_fake_ffmpeg(candidates),
+        ) as mock_run,
+    ):
+        parts = await async_prepare_files_for_prompt(
+            hass,
+            [video],
+            AttachmentOptions(video_max_frames=4, video_frame_selection=selection),
+        )
+
+    assert parts[0] == {
+        "type": "text",
+        "text": "[Video: doorbell.mp4, 4 frames from 12.5 seconds]",
+    }
+    args = mock_run.call_args.args[0]
+    assert args[:5] == ["ffmpeg", "-hide_banner", "-nostdin", "-i", str(video)]
+    assert args[args.index("-vf") + 1].startswith(f"{video_filter},scale=")
+    assert args[args.index("-frames:v") + 1] == max_candidates
+    sizes = []
+    for part in parts[1:]:
+        prefix = "data:image/jpeg;base64,"
+        assert part["image_url"]["url"].startswith(prefix)
+        data = base64.b64decode(part["image_url"]["url"].removeprefix(prefix))
+        with Image.open(io.BytesIO(data)) as image:
+            sizes.append(image.size[0])
+    # Frames are sampled evenly from all the candidates
+    assert sizes == widths
+
+
+async def test_attachment_video_invalid(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test a video that ffmpeg can't read."""
+    video = tmp_path / "doorbell.mp4"
+    video.write_bytes(b"not a video")
+
+    with (
+        patch(
+            "custom_components.vicuna_conversation.attachments.get_ffmpeg_manager",
+            return_value=MagicMock(binary="ffmpeg"),
+        ),
+        patch(
+            "custom_components.vicuna_conversation.attachments.subprocess.run",
+            side_effect=_fake_ffmpeg(0, returncode=1),
+        ),
+        pytest.raises(HomeAssistantError) as exc_info,
+    ):
+        await async_prepare_files_for_prompt(hass, [video])
+    assert exc_info.value.translation_key == "video_read_error"
+    assert exc_info.value.translation_placeholders["message"] == (
+        "Invalid data found when processing input"
+    )
+
+
+async def test_attachments_uploaded(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test that PDFs are uploaded once and deleted when they expire."""
+    image = tmp_path / "snapshot.png"
+    Image.effect_noise((64, 48), 64).convert("RGB").save(image)
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["Reset the device"])
+    client = MagicMock()
+    client.files.create = AsyncMock(
+        side_effect=lambda file, **kwargs: MagicMock(id=f"file-{file[0]}")
+    )
+    client.files.delete = AsyncMock()
+    uploader = AttachmentUploader(hass, client)
+    options = AttachmentOptions(image_format="jpeg")
+
+    parts = await uploader.async_prepare_files([image, pdf], options)
+    # Images are sent inline, as only PDFs are accepted as file inputs
+    assert parts[0]["type"] == "image_url"
+    assert parts[0]["image_url"]["url"].startswith("data:image/jpeg;base64,")
+    assert parts[1] == {"type": "file", "file": {"file_id": "file-manual.pdf"}}
+    client.files.create.assert_called_once_with(
+        file=("manual.pdf", pdf.read_bytes(), "application/pdf"),
+        purpose="user_data",
+        expires_after={"anchor": "created_at", "seconds": 86400},
+    )
+
+    # Files are referenced by the same id until they expire
+    assert await uploader.async_prepare_files([pdf, image], options) == parts[::-1]
+    assert client.files.create.call_count == 1
+
+    with patch(
+        "custom_components.vicuna_conversation.attachments.UPLOADED_ATTACHMENT_TTL",
+        -1,
+    ):
+        await uploader.async_prepare_files([image, pdf], options)
+        await uploader.async_prepare_files([pdf], options)
+    await uploader.async_prepare_files([pdf], options)
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert client.files.create.call_count == 3
+    assert client.files.delete.call_args_list == [
+        call("file-manual.pdf"),
+        call("file-manual.pdf"),
+    ]
+
+    client.files.delete.reset_mock()
+    await uploader.async_clear()
+    assert client.files.delete.call_args_list == [call("file-manual.pdf")]
+
+
+async def test_attachments_uploaded_max_age(
+    hass: HomeAssistant, tmp_path: Path
+) -> None:
+    """Test that uploaded attachments are replaced before the server deletes them."""
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["Reset the device"])
+    client = MagicMock()
+    client.files.create = AsyncMock(
+        side_effect=[MagicMock(id="file-1"), MagicMock(id="file-2")]
+    )
+    client.files.delete = AsyncMock()
+    uploader = AttachmentUploader(hass, client)
+
+    with patch(
+        "custom_components.vicuna_conversation.attachments.UPLOADED_ATTACHMENT_MAX_AGE",
+        3600,
+    ):
+        assert await uploader.async_prepare_files([pdf]) == [
+            {"type": "file", "file": {"file_id": "file-1"}}
+        ]
+    assert await uploader.async_prepare_files([pdf]) == [
+        {"type": "file", "file": {"file_id": "file-2"}}
+    ]
+    await hass.async_block_till_done(wait_background_tasks=True)
+    assert client.files.delete.call_args_list == [call("file-1")]
+
+
+async def test_attachments_cleared_timeout(hass: HomeAssistant, tmp_path: Path) -> None:
+    """Test that clearing uploaded attachments doesn't wait forever."""
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["Reset the device"])
+    client = MagicMock()
+    client.files.create = AsyncMock(return_value=MagicMock(id="file-manual.pdf"))
+    deleting = asyncio.Event()
+
+    async def delete(file_id: str) -> None:
+        deleting.set()
+        await asyncio.Event().wait()
+
+    client.files.delete = AsyncMock(side_effect=delete)
+    uploader = AttachmentUploader(hass, client)
+    await uploader.async_prepare_files([pdf])
+
+    with patch(
+        "custom_components.vicuna_conversation.attachments."
+        "UPLOADED_ATTACHMENT_DELETE_TIMEOUT",
+        0.01,
+    ):
+        await uploader.async_clear()
+    assert deleting.is_set()
+    await hass.async_block_till_done(wait_background_tasks=True)
+
+
+async def test_attachments_cleared_while_uploading(
+    hass: HomeAssistant, tmp_path: Path
+) -> None:
+    """Test that clearing uploaded attachments cancels uploads in progress."""
+    pdf = tmp_path / "manual.pdf"
+    _write_pdf(pdf, ["Reset the device"])
+    client = MagicMock()
+    uploading = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def create(**kwargs: Any) -> MagicMock:
+        uploading.set()
+        try:
+            await asyncio.Event().wait()
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    client.files.create = AsyncMock(side_effect=create)
+    client.files.delete = AsyncMock()
+    uploader = AttachmentUploader(hass, client)
+    request = hass.async_create_task(uploader.async_prepare_files([pdf]))
+    await uploading.wait()
+
+    await uploader.async_clear()
+    assert cancelled.is_set()
+    with pytest.raises(asyncio.CancelledError):
+        await request
+    client.files.delete.assert_not_called()
+
+
+async def test_size_limiter() -> None:
+    """Test that work is started in order while it fits within the limit."""
+    limiter = _SizeLimiter(10)
+    started: list[str] = []
+    finish = {name: asyncio.Event() for name in ("a", "b", "c", "d")}
+
+    async def work(name: str, size: int) -> None:
+        async with limiter.reserve(size):
+            started.append(name)
+            await finish[name].wait()
+
+    tasks = [
+        asyncio.create_task(work(name, size))
+        for name, size in (("a", 6), ("b", 6), ("c", 3), ("d", 20))
+    ]
+    await asyncio.sleep(0)
+    # Work that fits waits behind earlier work that doesn't
+    assert started == ["a"]
+
+    finish["a"].set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    assert started == ["a", "b", "c"]
+
+    finish["b"].set()
+    finish["c"].set()
+    await asyncio.sleep(0)
+    await asyncio.sleep(0)
+    # Work larger than the limit runs on its own
+    assert started == ["a", "b", "c", "d"]
+
+    finish["d"].set()
+    await asyncio.gather(*tasks)
+
+
+async def test_size_limiter_cancelled() -> None:
+    """Test that cancelled work that is waiting does not hold up other work."""
+    limiter = _SizeLimiter(10)
+    started: list[str] = []
+
+    async def work(name: str, size: int) -> None:
+        async with limiter.reserve(size):
+            started.append(name)
+
+    async with limiter.reserve(8):
+        waiting = asyncio.create_task(work("a", 5))
+        other = asyncio.create_task(work("b", 2))
+        await asyncio.sleep(0)
+        assert started == []
+        waiting.cancel()
+        await asyncio.sleep(0)
+        await asyncio.sleep(0)
+        assert started == ["b"]
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    await other
+    async with limiter.reserve(10):
+        pass
+
+
+async def test_size_limiter_cancelled_while_released() -> None:
+    """Test work that is cancelled while the size it waits for is released."""
+    limiter = _SizeLimiter(10)
+    started: list[str] = []
+
+    async def work(name: str, size: int) -> None:
+        async with limiter.reserve(size):
+            started.append(name)
+
+    async with limiter.reserve(10):
+        waiting = asyncio.create_task(work("a", 5))
+        await asyncio.sleep(0)
+        # Released in the same loop iteration as the cancellation
+        waiting.cancel()
+
+    with pytest.raises(asyncio.CancelledError):
+        await waiting
+    assert started == []
+    # No size is left reserved by the cancelled work
+    await asyncio.wait_for(work("b", 10), 1)
+    assert started == ["b"]
@@ -17,9 +17,15 @@ from pytest_homeassistant_custom_component.common import (
 from custom_components.vicuna_conversation.config_flow import RECOMMENDED_OPTIONS
 from custom_components.vicuna_conversation.const import (
     CONF_CHAT_MODEL,
+    CONF_HTTP2,
+    CONF_KEEPALIVE_EXPIRY,
+    CONF_LOAD_BALANCING,
+    CONF_MAX_CONNECTIONS,
+    CONF_MAX_KEEPALIVE_CONNECTIONS,
     CONF_MAX_TOKENS,
     CONF_PROMPT,
     CONF_RECOMMENDED,
+    CONF_REPLICAS,
     CONF_STREAMING,
     CONF_TEMPERATURE,
     CONF_TOP_P,
@@ -251,6 +257,76 @@ async def test_creating_conversation_subentry(
     assert result2["data"] == processed_options
 
 
+async def test_options_flow(
+    hass: HomeAssistant,
+    setup_integration: None,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test changing the HTTP transport of an entry."""
+    result = await hass.config_entries.options.async_init(mock_config_entry.entry_id)
+    assert result["type"] is FlowResultType.FORM
+    assert result["step_id"] == "init"
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {
+            CONF_MAX_CONNECTIONS: 10,
+            CONF_MAX_KEEPALIVE_CONNECTIONS: 5,
+            CONF_KEEPALIVE_EXPIRY: 60,
+            CONF_HTTP2: False,
+        },
+    )
+    await hass.async_block_till_done()
+
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    assert mock_config_entry.options == {
+        CONF_MAX_CONNECTIONS: 10,
+        CONF_MAX_KEEPALIVE_CONNECTIONS: 5,
+        CONF_KEEPALIVE_EXPIRY: 60,
+        CONF_HTTP2: False,
+    }
+    # The entry was reloaded with a client using the new connection pool
+    pool = mock_config_entry.runtime_data._client._transport._pool
+    assert pool._max_connections == 10
+    assert pool._max_keepalive_connections == 5
+    assert pool._keepalive_expiry == 60
+
+
+async def test_options_flow_replicas(
+    hass: HomeAssistant,
+    setup_integration: None,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test balancing the requests of an entry across replicas."""
+    result = await hass.config_entries.options.async_init(mock_config_entry.entry_id)
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"], {CONF_REPLICAS: ["llama-cublas-2.llama:8000/v1"]}
+    )
+    assert result["type"] is FlowResultType.FORM
+    assert result["errors"] == {"base": "invalid_base_url"}
+
+    result = await hass.config_entries.options.async_configure(
+        result["flow_id"],
+        {
+            CONF_REPLICAS: [
+                "http://llama-cublas-2.llama:8000/v1",
+                "unix:///run/llama.sock:/v1",
+            ],
+            CONF_LOAD_BALANCING: "ewma",
+        },
+    )
+    await hass.async_block_till_done()
+
+    assert result["type"] is FlowResultType.CREATE_ENTRY
+    transport = mock_config_entry.runtime_data._client._transport
+    assert [replica.base_url for replica in transport.replicas] == [
+        "http://llama-cublas.llama:8000/v1",
+        "http://llama-cublas-2.llama:8000/v1",
+        "http://localhost/v1",
+    ]
+
+
 async def test_creating_conversation_subentry_not_loaded(
     hass: HomeAssistant,
     setup_integration: None,
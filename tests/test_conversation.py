@@ -1,19 +1,31 @@
 """Tests for the vicuna_conversation component."""
 
+import asyncio
+import itertools
+import json
 from collections.abc import Generator
+from contextlib import ExitStack
 from unittest.mock import AsyncMock, Mock, patch
 
+import httpx
 import pytest
+import voluptuous as vol
 from freezegun import freeze_time
 from homeassistant.components import conversation
 from homeassistant.const import CONF_LLM_HASS_API
 from homeassistant.core import Context, HomeAssistant
-from homeassistant.helpers import intent
+from homeassistant.exceptions import HomeAssistantError
+from homeassistant.helpers import intent, llm
+from homeassistant.helpers.json import json_bytes
 from homeassistant.setup import async_setup_component
 from openai.types.chat import ChatCompletionChunk
 from openai.types.chat.chat_completion import ChatCompletion, Choice
 from openai.types.chat.chat_completion_chunk import Choice as ChunkChoice
-from openai.types.chat.chat_completion_chunk import ChoiceDelta
+from openai.types.chat.chat_completion_chunk import (
+    ChoiceDelta,
+    ChoiceDeltaToolCall,
+    ChoiceDeltaToolCallFunction,
+)
 from openai.types.chat.chat_completion_message import ChatCompletionMessage
 from openai.types.chat.chat_completion_message_tool_call import (
     ChatCompletionMessageToolCall,
@@ -24,8 +36,32 @@ from pytest_homeassistant_custom_component.common import (
     MockConfigEntry,
 )
 from syrupy.assertion import SnapshotAssertion
+from voluptuous_openapi import convert
 
-from custom_components.vicuna_conversation.const import CONF_STREAMING
+from custom_components.vicuna_conversation.const import (
+    CONF_BASE_URL,
+    CONF_PARALLEL_TOOL_CALLS,
+    CONF_RAW_STREAMING,
+    CONF_STREAMING,
+)
+from custom_components.vicuna_conversation.entity import (
+    StructuredOutputParser,
+    _chunk_deltas,
+    _coalesce_deltas,
+    _convert_content,
+    _exit_when_read,
+    _schema_fingerprint,
+    _sse_deltas,
+    _transform_stream,
+    async_get_stream_stats,
+)
+from custom_components.vicuna_conversation.offload import (
+    OFFLOAD_MIN_SIZE,
+    async_get_offload_stats,
+)
+from custom_components.vicuna_conversation.openai_client import (
+    async_get_circuit_breaker,
+)
 
 from .conftest import ASSIST_OPTIONS, MockChatLog
 
@@ -341,6 +377,131 @@ async def test_assist_api_tools_conversion(
     assert tools
 
 
+@pytest.mark.parametrize(("config_entry_options"), [ASSIST_OPTIONS])
+async def test_assist_api_tools_conversion_cached(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test that converted tools are reused across conversation turns."""
+    for component in ["intent", "light", "climate"]:
+        assert await async_setup_component(hass, component, {})
+
+    agent_id = mock_config_entry.entry_id
+    with (
+        patch(
+            "openai.resources.chat.completions.AsyncCompletions.create",
+            new_callable=AsyncMock,
+            return_value=ChatCompletion(
+                id="chatcmpl-1234567890ABCDEFGHIJKLMNOPQRS",
+                choices=[
+                    Choice(
+                        finish_reason="stop",
+                        index=0,
+                        message=ChatCompletionMessage(
+                            content="Hello, how can I help you?",
+                            role="assistant",
+                            function_call=None,
+                            tool_calls=None,
+                        ),
+                    )
+                ],
+                created=1700000000,
+                model="gpt-3.5-turbo-0613",
+                object="chat.completion",
+                system_fingerprint=None,
+            ),
+        ) as mock_create,
+        patch(
+            "custom_components.vicuna_conversation.entity.convert",
+            wraps=convert,
+        ) as mock_convert,
+    ):
+        await conversation.async_converse(hass, "hello", None, None, agent_id=agent_id)
+        first_convert_count = mock_convert.call_count
+        await conversation.async_converse(hass, "hello", None, None, agent_id=agent_id)
+
+    first_tools = mock_create.mock_calls[0][2]["tools"]
+    second_tools = mock_create.mock_calls[1][2]["tools"]
+    assert first_tools == second_tools
+    assert all(a is b for a, b in zip(first_tools, second_tools, strict=True))
+    assert mock_convert.call_count == first_convert_count
+
+
+def test_schema_fingerprint_default_factory() -> None:
+    """Test that default factories are fingerprinted without calling them."""
+    counter = itertools.count()
+
+    def factory() -> int:
+        return next(counter)
+
+    def schema(default: int) -> vol.Schema:
+        return vol.Schema(
+            {
+                vol.Optional("id", default=factory): int,
+                vol.Optional("count", default=default): int,
+            }
+        )
+
+    assert _schema_fingerprint(schema(1)) == _schema_fingerprint(schema(1))
+    assert _schema_fingerprint(schema(1)) != _schema_fingerprint(schema(2))
+    assert next(counter) == 0
+
+
+async def test_conversation_history_conversion_cached(
+    hass: HomeAssistant,
+    mock_chat_log: MockChatLog,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test that content from earlier turns is not converted again."""
+    with (
+        patch(
+            "openai.resources.chat.completions.AsyncCompletions.create",
+            new_callable=AsyncMock,
+            return_value=ChatCompletion(
+                id="chatcmpl-1234567890ABCDEFGHIJKLMNOPQRS",
+                choices=[
+                    Choice(
+                        finish_reason="stop",
+                        index=0,
+                        message=ChatCompletionMessage(
+                            content="Hello, how can I help you?",
+                            role="assistant",
+                            function_call=None,
+                            tool_calls=None,
+                        ),
+                    )
+                ],
+                created=1700000000,
+                model="gpt-3.5-turbo-0613",
+                object="chat.completion",
+                system_fingerprint=None,
+            ),
+        ) as mock_create,
+        patch(
+            "custom_components.vicuna_conversation.entity._convert_content",
+            wraps=_convert_content,
+        ) as mock_convert,
+    ):
+        for text in ("hello", "hello again"):
+            await conversation.async_converse(
+                hass,
+                text,
+                mock_chat_log.conversation_id,
+                Context(),
+                agent_id="conversation.custom_openai_conversation",
+            )
+
+    # The system prompt, user input and assistant response of each turn
+    assert mock_convert.call_count == 6
+    messages = mock_create.mock_calls[1][2]["messages"]
+    assert messages[1:] == [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "Hello, how can I help you?"},
+        {"role": "user", "content": "hello again"},
+        {"role": "assistant", "content": "Hello, how can I help you?"},
+    ]
+
+
 @pytest.mark.parametrize(("config_entry_options"), [{CONF_STREAMING: True}])
 async def test_streaming_response(
     hass: HomeAssistant,
@@ -427,6 +588,256 @@ async def test_streaming_response(
     assert content[1].content == "Hello world"
 
 
+class _MockByteStream(httpx.AsyncByteStream):
+    """A response body that is received in the given chunks."""
+
+    def __init__(self, chunks: list[bytes]) -> None:
+        """Initialize the stream."""
+        self._chunks = chunks
+
+    async def __aiter__(self):
+        """Iterate over the chunks."""
+        for chunk in self._chunks:
+            yield chunk
+
+
+@pytest.mark.parametrize(
+    ("config_entry_options"), [{CONF_STREAMING: True, CONF_RAW_STREAMING: True}]
+)
+async def test_raw_streaming_response(
+    hass: HomeAssistant,
+    mock_chat_log: MockChatLog,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test a streaming response that is parsed without the OpenAI SDK."""
+    body = (
+        b'data: {"choices":[{"index":0,"delta":{"role":"assistant","content":'
+        b'"Hello"},"finish_reason":null}]}\n\n'
+        b": keep-alive\n\n"
+        b'data: {"choices":[{"index":0,"delta":{"content":" world"},'
+        b'"finish_reason":null}]}\r\n\r\n'
+        b'data: {"choices":[{"index":0,"delta":{},"finish_reason":"stop"}]}\n\n'
+        b"data: [DONE]\n\n"
+    )
+    # Split events and lines across chunks as a server may do
+    response = httpx.Response(
+        200,
+        stream=_MockByteStream([body[:60], body[60:130], body[130:]]),
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+    )
+
+    with patch(
+        "openai.AsyncOpenAI.post", new_callable=AsyncMock, return_value=response
+    ) as mock_post:
+        result = await conversation.async_converse(
+            hass,
+            "hello",
+            mock_chat_log.conversation_id,
+            Context(),
+            agent_id="conversation.custom_openai_conversation",
+        )
+
+    assert result.response.response_type == intent.IntentResponseType.ACTION_DONE
+    assert result.response.speech["plain"]["speech"] == "Hello world"
+    assert response.is_closed
+
+    assert mock_post.call_args.args == ("/chat/completions",)
+    request_body = json.loads(mock_post.call_args.kwargs["content"])
+    assert request_body["stream"] is True
+    assert request_body["messages"][1:] == [{"role": "user", "content": "hello"}]
+    assert "tools" not in request_body
+
+
+@pytest.mark.parametrize(
+    ("config_entry_options"), [{CONF_STREAMING: True, CONF_RAW_STREAMING: True}]
+)
+async def test_raw_streaming_request_encoding_cached(
+    hass: HomeAssistant,
+    mock_chat_log: MockChatLog,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test that messages from earlier turns are not serialized again."""
+    chunk = (
+        b'data: {"choices":[{"index":0,"delta":{"role":"assistant",'
+        b'"content":"Hi"},"finish_reason":"stop"}]}\n\n'
+    )
+
+    def mock_response(*args, **kwargs) -> httpx.Response:
+        return httpx.Response(
+            200,
+            stream=_MockByteStream([chunk]),
+            request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+        )
+
+    with (
+        patch(
+            "openai.AsyncOpenAI.post", new_callable=AsyncMock, side_effect=mock_response
+        ) as mock_post,
+        patch(
+            "custom_components.vicuna_conversation.entity.json_bytes",
+            wraps=json_bytes,
+        ) as mock_json_bytes,
+    ):
+        for text in ("hello", "hello again"):
+            await conversation.async_converse(
+                hass,
+                text,
+                mock_chat_log.conversation_id,
+                Context(),
+                agent_id="conversation.custom_openai_conversation",
+            )
+
+    # The request parameters of each turn, the system prompt and user input of
+    # each turn and the assistant response of the first turn
+    assert mock_json_bytes.call_count == 7
+    request_body = json.loads(mock_post.call_args.kwargs["content"])
+    assert request_body["messages"][1:] == [
+        {"role": "user", "content": "hello"},
+        {"role": "assistant", "content": "Hi"},
+        {"role": "user", "content": "hello again"},
+    ]
+    assert request_body["stream"] is True
+
+
+class _StalledByteStream(httpx.AsyncByteStream):
+    """A response body that stops being sent after its first chunk."""
+
+    def __init__(self, chunk: bytes) -> None:
+        """Initialize the stream."""
+        self._chunk = chunk
+        self.sent = asyncio.Event()
+
+    async def __aiter__(self):
+        """Send the chunk then wait forever."""
+        yield self._chunk
+        self.sent.set()
+        await asyncio.Event().wait()
+
+
+@pytest.mark.parametrize(
+    ("config_entry_options"), [{CONF_STREAMING: True, CONF_RAW_STREAMING: True}]
+)
+async def test_raw_streaming_cancelled(
+    hass: HomeAssistant,
+    mock_chat_log: MockChatLog,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test that the response is closed when the request is cancelled."""
+    stream = _StalledByteStream(
+        b'data: {"choices":[{"index":0,"delta":{"role":"assistant",'
+        b'"content":"Hello"},"finish_reason":null}]}\n\n'
+    )
+    response = httpx.Response(
+        200,
+        stream=stream,
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+    )
+
+    with patch(
+        "openai.AsyncOpenAI.post", new_callable=AsyncMock, return_value=response
+    ):
+        task = hass.async_create_task(
+            conversation.async_converse(
+                hass,
+                "hello",
+                mock_chat_log.conversation_id,
+                Context(),
+                agent_id="conversation.custom_openai_conversation",
+            )
+        )
+        await stream.sent.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert response.is_closed
+    stats = async_get_stream_stats(hass)
+    assert stats.cancelled == 1
+    assert stats.closed == 1
+
+
+class _TruncatedByteStream(httpx.AsyncByteStream):
+    """A response body whose connection is lost after its first chunk."""
+
+    def __init__(self, chunk: bytes) -> None:
+        """Initialize the stream."""
+        self._chunk = chunk
+
+    async def __aiter__(self):
+        """Send the chunk then drop the connection."""
+        yield self._chunk
+        raise httpx.RemoteProtocolError("peer closed connection")
+
+
+@pytest.mark.parametrize(
+    ("config_entry_options"), [{CONF_STREAMING: True, CONF_RAW_STREAMING: True}]
+)
+async def test_raw_streaming_failure_opens_breaker(
+    hass: HomeAssistant,
+    mock_chat_log: MockChatLog,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test that a server failing in the middle of responses opens the breaker."""
+    breaker = async_get_circuit_breaker(hass, mock_config_entry.data[CONF_BASE_URL])
+
+    with patch(
+        "openai.AsyncOpenAI.post",
+        new_callable=AsyncMock,
+        side_effect=lambda *args, **kwargs: httpx.Response(
+            200,
+            stream=_TruncatedByteStream(
+                b'data: {"choices":[{"index":0,"delta":{"role":"assistant",'
+                b'"content":"Hello"},"finish_reason":null}]}\n\n'
+            ),
+            request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+        ),
+    ) as mock_post:
+        for _ in range(breaker.failure_threshold + 1):
+            result = await conversation.async_converse(
+                hass,
+                "hello",
+                mock_chat_log.conversation_id,
+                Context(),
+                agent_id="conversation.custom_openai_conversation",
+            )
+            assert result.response.response_type == intent.IntentResponseType.ERROR
+
+    assert breaker.state == "open"
+    # The last request failed without being sent
+    assert mock_post.call_count == breaker.failure_threshold
+    assert breaker.rejected == 1
+
+
+@pytest.mark.parametrize(
+    ("stream", "translation_key"),
+    [
+        (
+            _TruncatedByteStream(
+                b'data: {"choices":[{"index":0,"delta":{"content":"Hi"}}]}\n\n'
+            ),
+            "cannot_connect",
+        ),
+        (_MockByteStream([b'data: {"choices": [\n\n']), "api_error"),
+    ],
+    ids=["truncated", "malformed"],
+)
+async def test_raw_streaming_errors_translated(
+    stream: httpx.AsyncByteStream, translation_key: str
+) -> None:
+    """Test that errors while reading a raw streamed response are translated."""
+    response = httpx.Response(
+        200,
+        stream=stream,
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+    )
+
+    with pytest.raises(HomeAssistantError) as exc_info:
+        _ = [delta async for delta in _sse_deltas(response)]
+
+    assert exc_info.value.translation_key == translation_key
+    assert response.is_closed
+
+
 @pytest.mark.parametrize(
     ("config_entry_options"), [{CONF_LLM_HASS_API: ["non-existing"]}]
 )
@@ -441,3 +852,324 @@ async def test_unknown_hass_api(
     )
 
     assert result.as_dict() == snapshot
+
+
+def _stream_chunk(
+    delta: ChoiceDelta, finish_reason: str | None = None
+) -> ChatCompletionChunk:
+    """Create a streamed chunk for a mock response."""
+    return ChatCompletionChunk.model_construct(
+        id="chatcmpl-1234567890ABCDEFGHIJKLMNOPQRS",
+        choices=[
+            ChunkChoice.model_construct(
+                index=0, delta=delta, finish_reason=finish_reason
+            )
+        ],
+        created=1700000000,
+        model="gpt-3.5-turbo-0613",
+        object="chat.completion.chunk",
+    )
+
+
+def _tool_call_delta(
+    index: int,
+    arguments: str,
+    call_id: str | None = None,
+    name: str | None = None,
+) -> ChoiceDeltaToolCall:
+    """Create a streamed tool call fragment."""
+    return ChoiceDeltaToolCall(
+        index=index,
+        id=call_id,
+        type="function" if call_id else None,
+        function=ChoiceDeltaToolCallFunction(name=name, arguments=arguments),
+    )
+
+
+@pytest.mark.parametrize(
+    ("config_entry_options"),
+    [{**ASSIST_OPTIONS, CONF_STREAMING: True, CONF_PARALLEL_TOOL_CALLS: True}],
+)
+async def test_streaming_parallel_tool_calls(
+    hass: HomeAssistant,
+    mock_chat_log: MockChatLog,
+    mock_config_entry: MockConfigEntry,
+) -> None:
+    """Test streamed tool calls with interleaved fragments for several indexes."""
+    mock_chat_log.mock_tool_results(
+        {
+            "call_call_1": "value1",
+            "call_call_2": "value2",
+        }
+    )
+
+    async def tool_call_stream():
+        yield _stream_chunk(
+            ChoiceDelta(
+                role="assistant",
+                tool_calls=[
+                    _tool_call_delta(0, '{"param1":', "call_call_1", "test_tool"),
+                    _tool_call_delta(1, '{"param1":', "call_call_2", "test_tool"),
+                ],
+            )
+        )
+        yield _stream_chunk(
+            ChoiceDelta(
+                tool_calls=[
+                    _tool_call_delta(1, '"call2"}'),
+                    _tool_call_delta(0, '"call1"}'),
+                ]
+            )
+        )
+        yield _stream_chunk(ChoiceDelta(), finish_reason="tool_calls")
+
+    async def text_stream():
+        yield _stream_chunk(ChoiceDelta(role="assistant", content="Done"))
+        yield _stream_chunk(ChoiceDelta(), finish_reason="stop")
+
+    def completion_result(*args, messages, **kwargs):
+        if any(message["role"] == "tool" for message in messages):
+            return text_stream()
+        return tool_call_stream()
+
+    with patch(
+        "openai.resources.chat.completions.AsyncCompletions.create",
+        new_callable=AsyncMock,
+        side_effect=completion_result,
+    ) as mock_create:
+        result = await conversation.async_converse(
+            hass,
+            "Please call the test function twice",
+            mock_chat_log.conversation_id,
+            Context(),
+            agent_id="conversation.custom_openai_conversation",
+        )
+
+    assert result.response.response_type == intent.IntentResponseType.ACTION_DONE
+    assert result.response.speech["plain"]["speech"] == "Done"
+    assert mock_create.call_args.kwargs["parallel_tool_calls"] is True
+
+    content = mock_chat_log.content[1:]
+    assert content[1].role == "assistant"
+    assert [
+        (tool_call.id, tool_call.tool_args) for tool_call in content[1].tool_calls
+    ] == [
+        ("call_call_1", {"param1": "call1"}),
+        ("call_call_2", {"param1": "call2"}),
+    ]
+    assert [(c.role, c.tool_result) for c in content[2:4]] == [
+        ("tool_result", "value1"),
+        ("tool_result", "value2"),
+    ]
+
+
+async def test_exit_when_read() -> None:
+    """Test that the breaker guard is closed once the response was read."""
+
+    async def mock_stream(error: Exception | None = None):
+        yield "first"
+        if error is not None:
+            raise error
+        yield "second"
+
+    with ExitStack() as stack:
+        callback = stack.callback(Mock())
+        stream = _exit_when_read(stack, mock_stream())
+        assert [item async for item in stream] == ["first", "second"]
+        callback.assert_called_once()
+
+    # The consumer stops reading once the response is complete
+    with ExitStack() as stack:
+        callback = stack.callback(Mock())
+        stream = _exit_when_read(stack, mock_stream())
+        assert await anext(stream) == "first"
+        await stream.aclose()
+        callback.assert_called_once()
+
+    # Errors are left to the guard
+    with ExitStack() as stack:
+        callback = stack.callback(Mock())
+        stream = _exit_when_read(stack, mock_stream(httpx.ReadError("reset")))
+        with pytest.raises(httpx.ReadError):
+            _ = [item async for item in stream]
+        callback.assert_not_called()
+
+
+async def test_streaming_tool_call_dispatched_early(hass: HomeAssistant) -> None:
+    """Test that a tool call is yielded once its arguments are complete."""
+    consumed: list[str] = []
+
+    async def mock_stream():
+        yield _stream_chunk(
+            ChoiceDelta(
+                role="assistant",
+                tool_calls=[_tool_call_delta(0, '{"param1":', "call_1", "test_tool")],
+            )
+        )
+        yield _stream_chunk(ChoiceDelta(tool_calls=[_tool_call_delta(0, '"1"}')]))
+        consumed.append("second_tool_call")
+        yield _stream_chunk(
+            ChoiceDelta(
+                tool_calls=[
+                    _tool_call_delta(1, '{"param1":"2"}', "call_2", "test_tool")
+                ]
+            )
+        )
+        consumed.append("finish")
+        yield _stream_chunk(ChoiceDelta(), finish_reason="tool_calls")
+
+    deltas = []
+    async for delta in _transform_stream(hass, _chunk_deltas(mock_stream())):
+        deltas.append((delta, list(consumed)))
+
+    assert [
+        ([tool_call.id for tool_call in delta.get("tool_calls", [])], seen)
+        for delta, seen in deltas
+    ] == [
+        ([], []),
+        (["call_1"], []),
+        (["call_2"], ["second_tool_call"]),
+    ]
+
+
+async def test_streaming_content_coalesced() -> None:
+    """Test that consecutive content deltas are merged and tool calls are not."""
+    tool_input = llm.ToolInput(id="call_1", tool_name="test_tool", tool_args={})
+
+    async def mock_stream():
+        yield {"role": "assistant", "content": "Hel"}
+        yield {"content": "lo"}
+        yield {"content": " there"}
+        yield {"tool_calls": [tool_input]}
+        yield {"content": "!"}
+        yield {"role": "assistant"}
+        yield {"content": "Done"}
+
+    assert [delta async for delta in _coalesce_deltas(mock_stream(), max_size=8)] == [
+        {"role": "assistant", "content": "Hello there"},
+        {"tool_calls": [tool_input]},
+        {"content": "!"},
+        {"role": "assistant", "content": "Done"},
+    ]
+
+
+async def test_streaming_malformed_tool_arguments(hass: HomeAssistant) -> None:
+    """Test that malformed tool call arguments are reported before the end."""
+    consumed: list[str] = []
+
+    async def mock_stream():
+        yield _stream_chunk(
+            ChoiceDelta(
+                role="assistant",
+                tool_calls=[_tool_call_delta(0, '{"param1" ', "call_1", "test_tool")],
+            )
+        )
+        yield _stream_chunk(ChoiceDelta(tool_calls=[_tool_call_delta(0, '"1"}')]))
+        consumed.append("finish")
+        yield _stream_chunk(ChoiceDelta(), finish_reason="tool_calls")
+
+    with pytest.raises(HomeAssistantError) as exc_info:
+        async for _ in _transform_stream(hass, _chunk_deltas(mock_stream())):
+            pass
+
+    assert exc_info.value.translation_key == "json_parse_error"
+    assert exc_info.value.translation_placeholders == {
+        "message": "Expecting ':' delimiter: char 10"
+    }
+
+    assert not consumed
+
+
+async def test_streaming_tool_call_without_name(hass: HomeAssistant) -> None:
+    """Test that tool call fragments without a function or name are skipped."""
+
+    async def mock_stream():
+        yield _stream_chunk(
+            ChoiceDelta(
+                role="assistant",
+                tool_calls=[
+                    ChoiceDeltaToolCall(index=0, id="call_1", type="function"),
+                    _tool_call_delta(1, '{"param1": "1"}', "call_2"),
+                ],
+            )
+        )
+        yield _stream_chunk(ChoiceDelta(), finish_reason="tool_calls")
+
+    assert [
+        delta async for delta in _transform_stream(hass, _chunk_deltas(mock_stream()))
+    ] == [{"role": "assistant"}]
+
+
+async def test_streaming_tool_arguments_offloaded(hass: HomeAssistant) -> None:
+    """Test that large streamed tool arguments are decoded in the executor."""
+    value = "x" * OFFLOAD_MIN_SIZE
+    arguments = json.dumps({"param1": value})
+
+    async def mock_stream():
+        yield _stream_chunk(
+            ChoiceDelta(
+                role="assistant",
+                tool_calls=[_tool_call_delta(0, arguments[:10], "call_1", "test_tool")],
+            )
+        )
+        yield _stream_chunk(
+            ChoiceDelta(tool_calls=[_tool_call_delta(0, arguments[10:])])
+        )
+        yield _stream_chunk(ChoiceDelta(), finish_reason="tool_calls")
+
+    deltas = [
+        delta async for delta in _transform_stream(hass, _chunk_deltas(mock_stream()))
+    ]
+
+    assert deltas[1]["tool_calls"][0].tool_args == {"param1": value}
+    stats = async_get_offload_stats(hass)["tool_arguments"]
+    assert stats.offloaded_calls == 1
+    assert stats.inline_calls == 0
+
+
+async def test_streaming_structured_output_offloaded(hass: HomeAssistant) -> None:
+    """Test that large streamed structured output is decoded in the executor."""
+    summary = "x" * OFFLOAD_MIN_SIZE
+    content = json.dumps({"count": 1, "summary": summary})
+    parser = StructuredOutputParser(
+        hass, vol.Schema({vol.Required("summary"): str, vol.Optional("count"): int})
+    )
+
+    async def mock_stream():
+        yield _stream_chunk(ChoiceDelta(role="assistant", content=content[:20]))
+        yield _stream_chunk(ChoiceDelta(content=content[20:]))
+        yield _stream_chunk(ChoiceDelta(), finish_reason="stop")
+
+    async for _ in _transform_stream(hass, _chunk_deltas(mock_stream()), parser):
+        pass
+
+    assert await parser.async_value() == {"count": 1, "summary": summary}
+    stats = async_get_offload_stats(hass)
+    members = stats["structured_members"]
+    # The small member is decoded on the event loop and the large one isn't
+    assert members.inline_calls == 1
+    assert members.offloaded_calls == 1
+    assert stats["structured_response"].offloaded_calls == 1
+
+
+@pytest.mark.parametrize(
+    ("min_length", "valid"),
+    [(1, True), (2, False)],
+)
+async def test_structured_output_not_a_mapping(
+    hass: HomeAssistant, min_length: int, valid: bool
+) -> None:
+    """Test that a structure that is not a mapping validates the whole response."""
+    parser = StructuredOutputParser(
+        hass, vol.Schema(vol.All(dict, vol.Length(min=min_length)))
+    )
+
+    # Members are not validated on their own, so extra keys are accepted
+    assert await parser.async_feed('{"name": "Kitchen"') == '{"name": "Kitchen"'
+    if valid:
+        await parser.async_feed("}")
+        assert await parser.async_value() == {"name": "Kitchen"}
+        return
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await parser.async_feed("}")
+    assert exc_info.value.translation_key == "structured_output_error"
@@ -0,0 +1,61 @@
+"""Tests for the diagnostics of the Custom OpenAI integration."""
+
+from homeassistant.core import HomeAssistant
+from homeassistant.setup import async_setup_component
+from pytest_homeassistant_custom_component.common import MockConfigEntry
+from pytest_homeassistant_custom_component.components.diagnostics import (
+    get_diagnostics_for_config_entry,
+)
+from pytest_homeassistant_custom_component.typing import ClientSessionGenerator
+
+
+async def test_diagnostics(
+    hass: HomeAssistant,
+    hass_client: ClientSessionGenerator,
+    mock_config_entry: MockConfigEntry,
+    setup_integration: None,
+) -> None:
+    """Test that the API key is redacted and the counters are included."""
+    assert await async_setup_component(hass, "diagnostics", {})
+
+    diagnostics = await get_diagnostics_for_config_entry(
+        hass, hass_client, mock_config_entry
+    )
+
+    assert diagnostics["data"] == {
+        "api_key": "**REDACTED**",
+        "base_url": "http://llama-cublas.llama:8000/v1",
+    }
+    assert [
+        subentry["subentry_type"] for subentry in diagnostics["subentries"].values()
+    ] == ["conversation", "ai_task_data"]
+    assert diagnostics["process"]["caches"].keys() == {
+        "messages",
+        "tools",
+        "structures",
+        "attachments",
+    }
+    assert diagnostics["process"]["caches"]["messages"].keys() == {
+        "entries",
+        "size",
+        "hits",
+        "misses",
+        "evictions",
+    }
+    assert isinstance(diagnostics["offload"], dict)
+    assert diagnostics["streams"].keys() == {
+        "opened",
+        "completed",
+        "cancelled",
+        "failed",
+        "closed",
+        "open",
+    }
+    assert diagnostics["process"]["retries"].keys() == {
+        "ratio",
+        "max_balance",
+        "balance",
+        "retries",
+        "exhausted",
+    }
+    assert diagnostics["circuit_breaker"]["state"] == "closed"
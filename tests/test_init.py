@@ -390,3 +390,48 @@ async def test_migration_from_v2_1_to_v2_2(
         **RECOMMENDED_AI_TASK_OPTIONS,
         **data,
     }
+
+
+async def test_http_client_closed_on_unload(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    setup_integration: None,
+) -> None:
+    """Test that each entry has its own HTTP client that is closed on unload."""
+    assert mock_config_entry.state is ConfigEntryState.LOADED
+    http_client = mock_config_entry.runtime_data._client
+    assert not http_client.is_closed
+
+    assert await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+
+    assert http_client.is_closed
+
+
+async def test_client_shared_between_entries(
+    hass: HomeAssistant,
+    mock_config_entry: MockConfigEntry,
+    setup_integration: None,
+) -> None:
+    """Test that entries for the same server share a client until both unload."""
+    other_entry = MockConfigEntry(
+        domain=DOMAIN,
+        title="Other",
+        data=dict(mock_config_entry.data),
+        version=2,
+        minor_version=2,
+    )
+    other_entry.add_to_hass(hass)
+    assert await hass.config_entries.async_setup(other_entry.entry_id)
+    await hass.async_block_till_done()
+
+    client = mock_config_entry.runtime_data
+    assert other_entry.runtime_data is client
+
+    assert await hass.config_entries.async_unload(mock_config_entry.entry_id)
+    await hass.async_block_till_done()
+    assert not client._client.is_closed
+
+    assert await hass.config_entries.async_unload(other_entry.entry_id)
+    await hass.async_block_till_done()
+    assert client._client.is_closed
@@ -0,0 +1,239 @@
+"""Tests for balancing requests across the replicas of a server."""
+
+import logging
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import openai
+import pytest
+
+from custom_components.vicuna_conversation.load_balancer import (
+    LoadBalancingTransport,
+    Replica,
+)
+
+_BASE_URL = "http://llama-1:8000/v1"
+
+
+class _Body(httpx.AsyncByteStream):
+    """A response body that is sent as a stream."""
+
+    async def __aiter__(self):
+        """Send the body."""
+        yield b'{"data": []}'
+
+
+def _replica(base_url: str, status_code: int, requests: list[httpx.Request]) -> Replica:
+    """Create a replica that answers every request with a status code."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(status_code, stream=_Body())
+
+    transport = httpx.MockTransport(handler)
+    return Replica(
+        base_url,
+        transport,
+        openai.AsyncOpenAI(
+            api_key="sk-0000",
+            base_url=base_url,
+            http_client=httpx.AsyncClient(transport=transport),
+            max_retries=0,
+        ),
+    )
+
+
+@pytest.fixture(autouse=True)
+def pick_first_fixture():
+    """Pick the first of equally loaded replicas."""
+    with patch("random.choice", lambda replicas: replicas[0]):
+        yield
+
+
+async def test_least_outstanding() -> None:
+    """Test that requests go to the replica with the fewest in progress."""
+    first: list[httpx.Request] = []
+    second: list[httpx.Request] = []
+    transport = LoadBalancingTransport(
+        _BASE_URL,
+        [_replica(_BASE_URL, 200, first), _replica("http://llama-2/v1", 200, second)],
+        "least_outstanding",
+    )
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        request = client.build_request("POST", f"{_BASE_URL}/chat/completions")
+        response = await client.send(request, stream=True)
+        await client.post(f"{_BASE_URL}/chat/completions")
+        assert transport.replicas[0].outstanding == 1
+        await response.aclose()
+        assert transport.replicas[0].outstanding == 0
+
+    assert len(first) == 1
+    assert len(second) == 1
+    assert str(second[0].url) == "http://llama-2/v1/chat/completions"
+    assert second[0].headers["Host"] == "llama-2"
+
+
+async def test_ewma() -> None:
+    """Test that requests go to the replica with the lowest latency."""
+    first: list[httpx.Request] = []
+    second: list[httpx.Request] = []
+    transport = LoadBalancingTransport(
+        _BASE_URL,
+        [_replica(_BASE_URL, 200, first), _replica("http://llama-2/v1", 200, second)],
+        "ewma",
+    )
+    transport.replicas[0].latency = 2.0
+    transport.replicas[1].latency = 1.0
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        await client.post(f"{_BASE_URL}/chat/completions")
+
+    assert not first
+    assert len(second) == 1
+    # The latency of the response is added to the moving average
+    assert transport.replicas[1].latency < 1.0
+
+
+async def test_ejected_and_admitted() -> None:
+    """Test that a failing replica is ejected until a probe succeeds."""
+    first: list[httpx.Request] = []
+    second: list[httpx.Request] = []
+    transport = LoadBalancingTransport(
+        _BASE_URL,
+        [_replica(_BASE_URL, 503, first), _replica("http://llama-2/v1", 200, second)],
+        "least_outstanding",
+    )
+
+    async with httpx.AsyncClient(transport=transport) as client:
+        for _ in range(5):
+            await client.post(f"{_BASE_URL}/chat/completions")
+
+    # The first replica is tried until it has failed three times
+    assert len(first) == 3
+    assert len(second) == 2
+    failing = transport.replicas[0]
+    assert failing.ejected_until
+
+    with patch.object(failing.client.models, "list", AsyncMock()) as probe:
+        await transport._async_probe(failing)
+    probe.assert_awaited_once()
+    assert not failing.ejected_until
+    assert not failing.failures
+
+
+async def test_probe_failures(caplog: pytest.LogCaptureFixture) -> None:
+    """Test that failed probes count like failed requests."""
+    requests: list[httpx.Request] = []
+    replica = _replica(_BASE_URL, 503, requests)
+    transport = LoadBalancingTransport(_BASE_URL, [replica], "least_outstanding")
+
+    for _ in range(2):
+        await transport._async_probe(replica)
+    assert replica.failures == 2
+    assert not replica.ejected_until
+
+    await transport._async_probe(replica)
+    assert replica.ejected_until
+    assert [request.url.path for request in requests] == ["/v1/models"] * 3
+    # Only the ejection is logged above the debug level
+    assert [
+        record.levelno for record in caplog.records if record.levelno > logging.DEBUG
+    ] == [logging.WARNING]
+
+
+def _api_replica(base_url: str, requests: list[httpx.Request]) -> Replica:
+    """Create a replica that answers requests to the Files and Chat APIs."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if request.url.path.endswith("/chat/completions"):
+            return httpx.Response(
+                200,
+                json={
+                    "id": "chatcmpl-1",
+                    "object": "chat.completion",
+                    "created": 1700000000,
+                    "model": "llama",
+                    "choices": [
+                        {
+                            "index": 0,
+                            "finish_reason": "stop",
+                            "message": {"role": "assistant", "content": "Done"},
+                        }
+                    ],
+                },
+            )
+        if request.method == "DELETE":
+            return httpx.Response(
+                200, json={"id": "file-1", "object": "file", "deleted": True}
+            )
+        return httpx.Response(
+            200,
+            json={
+                "id": "file-1",
+                "object": "file",
+                "bytes": 4,
+                "created_at": 1700000000,
+                "filename": "manual.pdf",
+                "purpose": "user_data",
+                "status": "processed",
+            },
+        )
+
+    transport = httpx.MockTransport(handler)
+    return Replica(
+        base_url,
+        transport,
+        openai.AsyncOpenAI(
+            api_key="sk-0000",
+            base_url=base_url,
+            http_client=httpx.AsyncClient(transport=transport),
+        ),
+    )
+
+
+async def test_uploaded_files_pinned() -> None:
+    """Test that uploaded files and requests using them go to the first replica."""
+    first: list[httpx.Request] = []
+    second: list[httpx.Request] = []
+    transport = LoadBalancingTransport(
+        _BASE_URL,
+        [_api_replica(_BASE_URL, first), _api_replica("http://llama-2/v1", second)],
+        "least_outstanding",
+    )
+    # Other requests are balanced to the second replica
+    transport.replicas[0].outstanding = 1
+
+    async with httpx.AsyncClient(transport=transport) as http_client:
+        client = openai.AsyncOpenAI(
+            api_key="sk-0000", base_url=_BASE_URL, http_client=http_client
+        )
+        file_object = await client.files.create(
+            file=("manual.pdf", b"%PDF", "application/pdf"), purpose="user_data"
+        )
+        await client.chat.completions.create(
+            model="llama",
+            messages=[
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "file", "file": {"file_id": file_object.id}},
+                        {"type": "text", "text": "Summarize the manual"},
+                    ],
+                }
+            ],
+        )
+        await client.files.delete(file_object.id)
+        await client.chat.completions.create(
+            model="llama", messages=[{"role": "user", "content": "hello"}]
+        )
+
+    assert [(request.method, request.url.path) for request in first] == [
+        ("POST", "/v1/files"),
+        ("POST", "/v1/chat/completions"),
+        ("DELETE", "/v1/files/file-1"),
+    ]
+    assert [(request.method, request.url.path) for request in second] == [
+        ("POST", "/v1/chat/completions"),
+    ]
@@ -0,0 +1,44 @@
+"""Tests for offloading work on large payloads from the event loop."""
+
+import threading
+
+import pytest
+from homeassistant.core import HomeAssistant
+
+from custom_components.vicuna_conversation.offload import (
+    OFFLOAD_MIN_SIZE,
+    async_get_offload_stats,
+    async_offload,
+    payload_size,
+)
+
+
+@pytest.mark.parametrize(
+    ("value", "size"),
+    [
+        (None, 8),
+        ("abc", 6),
+        ({"key": [1, "value"]}, 26),
+        ({"state": "x" * OFFLOAD_MIN_SIZE}, OFFLOAD_MIN_SIZE),
+        ([[0] * 1_000_000] * 1_000, OFFLOAD_MIN_SIZE),
+    ],
+)
+def test_payload_size(value: object, size: int) -> None:
+    """Test measuring the size of a payload up to the limit."""
+    assert payload_size(value) == size
+
+
+async def test_offload(hass: HomeAssistant) -> None:
+    """Test that only work on large payloads runs in the executor."""
+    assert await async_offload(hass, "test", 10, threading.current_thread) is (
+        threading.current_thread()
+    )
+    assert await async_offload(
+        hass, "test", OFFLOAD_MIN_SIZE, threading.current_thread
+    ) is not (threading.current_thread())
+
+    stats = async_get_offload_stats(hass)["test"]
+    assert stats.inline_calls == 1
+    assert stats.offloaded_calls == 1
+    assert stats.offloaded_size == OFFLOAD_MIN_SIZE
+    assert 0 < stats.max_offloaded_seconds <= stats.offloaded_seconds
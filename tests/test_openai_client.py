@@ -0,0 +1,253 @@
+"""Tests for creating the OpenAI client."""
+
+import asyncio
+from collections.abc import AsyncGenerator
+from contextlib import ExitStack
+from unittest.mock import AsyncMock, patch
+
+import httpx
+import openai
+import pytest
+from homeassistant.core import HomeAssistant
+from homeassistant.exceptions import HomeAssistantError
+
+from custom_components.vicuna_conversation.const import DOMAIN
+from custom_components.vicuna_conversation.openai_client import (
+    PHASE_FIRST_TOKEN,
+    PHASE_STALL,
+    CircuitBreaker,
+    RequestDeadlines,
+    RequestTimeouts,
+    RetryBudget,
+    async_create_client,
+    async_retry_request,
+    timeout_error,
+)
+
+from .conftest import CONFIG_ENTRY_DATA
+
+
+@pytest.mark.parametrize(
+    ("base_url", "expected_url", "socket_path"),
+    [
+        ("unix:///run/llama.sock", "http://localhost", "/run/llama.sock"),
+        ("unix:///run/llama.sock:/v1", "http://localhost/v1/", "/run/llama.sock"),
+        (
+            "unix:///run/vllm/api.sock:/v1/",
+            "http://localhost/v1/",
+            "/run/vllm/api.sock",
+        ),
+    ],
+)
+async def test_unix_socket(
+    hass: HomeAssistant, base_url: str, expected_url: str, socket_path: str
+) -> None:
+    """Test a server on a Unix socket."""
+    client = await async_create_client(
+        hass, {**CONFIG_ENTRY_DATA, "base_url": base_url}
+    )
+
+    assert str(client.base_url) == expected_url
+    assert client._client._transport._pool._uds == socket_path
+    await client.close()
+
+
+@pytest.mark.parametrize(
+    "base_url", ["unix://", "unix://run/llama.sock", "unix:///run/llama.sock:v1"]
+)
+async def test_invalid_unix_socket(hass: HomeAssistant, base_url: str) -> None:
+    """Test an invalid Unix socket URL."""
+    with pytest.raises(HomeAssistantError) as exc_info:
+        await async_create_client(hass, {**CONFIG_ENTRY_DATA, "base_url": base_url})
+    assert exc_info.value.translation_key == "invalid_base_url"
+
+
+@pytest.mark.parametrize(
+    ("timeouts", "delays", "phase"),
+    [
+        (RequestTimeouts(first_token=0.05), [1], "first_token"),
+        (RequestTimeouts(stall=0.05), [0, 0, 1], "stall"),
+        (RequestTimeouts(stall=0.15, total=0.25), [0, 0.1, 0.1, 0.1], "total"),
+    ],
+)
+async def test_request_deadlines(
+    timeouts: RequestTimeouts, delays: list[float], phase: str
+) -> None:
+    """Test that a stalled stream times out in the phase it stalled in."""
+    closed = False
+
+    async def stream() -> AsyncGenerator[int]:
+        nonlocal closed
+        try:
+            for index, delay in enumerate(delays):
+                await asyncio.sleep(delay)
+                yield index
+        finally:
+            closed = True
+
+    received = []
+    with pytest.raises(HomeAssistantError) as exc_info:
+        async for item in RequestDeadlines(timeouts).async_stream(stream()):
+            received.append(item)
+
+    assert exc_info.value.translation_key == "timeout"
+    assert exc_info.value.translation_placeholders["phase"] == phase
+    assert received == list(range(len(delays) - 1))
+    assert closed
+
+
+_REQUEST = httpx.Request("POST", "http://llama-cublas.llama:8000/v1/chat/completions")
+
+
+def _status_error(status_code: int, headers: dict[str, str] | None = None):
+    """Create the error of a response with a status code."""
+    response = httpx.Response(status_code, headers=headers, request=_REQUEST)
+    return openai.APIStatusError("error", response=response, body=None)
+
+
+@pytest.mark.parametrize(
+    ("error", "sleeps"),
+    [
+        (openai.APIConnectionError(request=_REQUEST), 2),
+        (_status_error(429), 2),
+        (_status_error(503), 2),
+        (_status_error(400), 0),
+        (openai.APITimeoutError(request=_REQUEST), 0),
+        (_status_error(429, {"retry-after": "600"}), 0),
+    ],
+)
+async def test_retry_request(error: openai.OpenAIError, sleeps: int) -> None:
+    """Test which failures are retried before giving up."""
+    request = AsyncMock(side_effect=error)
+
+    with (
+        patch(
+            "custom_components.vicuna_conversation.openai_client.RETRY_BUDGET",
+            RetryBudget(),
+        ),
+        patch("asyncio.sleep") as mock_sleep,
+        pytest.raises(type(error)),
+    ):
+        await async_retry_request(2, request, "/chat/completions", stream=True)
+
+    assert request.call_count == sleeps + 1
+    request.assert_called_with("/chat/completions", stream=True)
+    assert mock_sleep.call_count == sleeps
+
+
+async def test_retry_request_retry_after() -> None:
+    """Test that the server can set the delay before a retry."""
+    request = AsyncMock(
+        side_effect=[_status_error(429, {"retry-after-ms": "1500"}), "response"]
+    )
+
+    with patch("asyncio.sleep") as mock_sleep:
+        assert await async_retry_request(2, request) == "response"
+
+    mock_sleep.assert_called_once_with(1.5)
+
+
+async def test_retry_budget() -> None:
+    """Test that retries stop when the budget is exhausted."""
+    budget = RetryBudget(max_balance=1.0, balance=1.0)
+    request = AsyncMock(side_effect=_status_error(503))
+
+    with (
+        patch(
+            "custom_components.vicuna_conversation.openai_client.RETRY_BUDGET",
+            budget,
+        ),
+        patch("asyncio.sleep"),
+    ):
+        for _ in range(2):
+            with pytest.raises(openai.APIStatusError):
+                await async_retry_request(5, request)
+
+    # The first request spends the only retry, the second can't retry
+    assert request.call_count == 3
+    assert budget.retries == 1
+    assert budget.exhausted == 2
+
+
+def _fail(breaker: CircuitBreaker, error: Exception) -> None:
+    """Send a request through the breaker that fails with an error."""
+    with pytest.raises(type(error)), breaker.guard():
+        raise error
+
+
+def test_circuit_breaker() -> None:
+    """Test that the breaker opens on failures and closes after a probe."""
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=30)
+
+    # Errors of requests that the server answered are not failures
+    _fail(breaker, _status_error(400))
+    _fail(breaker, openai.APIConnectionError(request=_REQUEST))
+    assert breaker.state == "closed"
+    _fail(breaker, _status_error(500))
+    assert breaker.state == "open"
+
+    with pytest.raises(HomeAssistantError) as exc_info, breaker.guard():
+        pass
+    assert exc_info.value.translation_key == "server_unavailable"
+
+    with patch("time.monotonic", return_value=breaker.opened_at + 31):
+        # The probe fails and the breaker opens again
+        _fail(breaker, openai.APIConnectionError(request=_REQUEST))
+        assert breaker.state == "open"
+        assert breaker.trips == 2
+
+    with patch("time.monotonic", return_value=breaker.opened_at + 31):
+        with breaker.guard():
+            # Other requests fail while the probe is in progress
+            assert breaker.state == "half_open"
+            with pytest.raises(HomeAssistantError), breaker.guard():
+                pass
+        assert breaker.state == "closed"
+
+    assert breaker.rejected == 2
+
+
+@pytest.mark.parametrize(
+    ("error", "state"),
+    [
+        (timeout_error(PHASE_STALL, "No data received for 30 seconds"), "open"),
+        (httpx.ReadError("Connection reset by peer", request=_REQUEST), "open"),
+        (
+            HomeAssistantError(
+                translation_domain=DOMAIN,
+                translation_key="cannot_connect",
+                translation_placeholders={"message": "peer closed connection"},
+            ),
+            "open",
+        ),
+        # The request may be too large for the server to answer it quickly
+        (timeout_error(PHASE_FIRST_TOKEN, "No data received for 60 seconds"), "closed"),
+        # Error events are about the request, such as its context length
+        (openai.APIError("Context length exceeded", _REQUEST, body=None), "closed"),
+    ],
+)
+def test_circuit_breaker_stream_failure(error: Exception, state: str) -> None:
+    """Test which failures while a response is streamed open the breaker."""
+    breaker = CircuitBreaker(failure_threshold=1)
+
+    _fail(breaker, error)
+    assert breaker.state == state
+
+
+def test_circuit_breaker_cancelled() -> None:
+    """Test that a cancelled request only frees the probe slot if it is the probe."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    probe = ExitStack()
+
+    # A request sent before the breaker opened is cancelled during the probe
+    with pytest.raises(asyncio.CancelledError), breaker.guard():
+        _fail(breaker, openai.APIConnectionError(request=_REQUEST))
+        with patch("time.monotonic", return_value=breaker.opened_at + 31):
+            probe.enter_context(breaker.guard())
+        raise asyncio.CancelledError
+
+    with pytest.raises(HomeAssistantError), breaker.guard():
+        pass
+    probe.close()
+    assert breaker.state == "closed"
+    assert not breaker.probing